@@ -1,5 +1,6 @@
 import os
 import re
+import asyncio
 import uvicorn
 import logging
 import traceback
@@ -10,11 +11,20 @@ from pydantic import BaseModel
 from dotenv import load_dotenv
 from db.auth import verify_token
 from db.auth import conditional_auth
+from db.auth import admin_auth
+from app.executor import InferenceExecutor, ExecutorSaturatedError
+from app.batcher import MicroBatcher
+from app.metrics import REGISTRY, PrometheusMiddleware
+from app.profiling import PROFILER, request_metadata
+from app.schema import BatchPredictionRequest, ModelReloadRequest, ProfilingConfigRequest, BATCH_MAX_TEXTS
+from app.registry import ModelRegistry, ReloadInProgressError
 
-from pymongo import MongoClient
 from db.engine import MONGO_URI, MONGO_DB
+from db.engine import init_mongo_client, close_mongo_client
+from db.engine import LOG_WRITE_MODE, start_log_writer, stop_log_writer, log_writer_stats
 from contextlib import asynccontextmanager
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
 from intent_classifier import IntentClassifier
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi import FastAPI, HTTPException, Request, Depends
@@ -29,6 +39,22 @@ ENV = os.getenv("ENV", "prod").lower()
 logger.info(f"Running in {ENV} mode")
 
 MODELS = {}
+# Versões dos modelos em produção; cada troca a quente publica um novo dict em MODELS
+MODEL_REGISTRY = ModelRegistry()
+# Trocas de modelo rodando em segundo plano
+_RELOAD_TASKS: set = set()
+# True depois que os modelos foram carregados e aquecidos (ver /ready)
+READY = False
+# Erro do warm-up no startup; enquanto definido, o /ready responde 503
+WARM_UP_ERROR = None
+# Pool limitado onde rodam a inferência e o log no MongoDB (ambos bloqueantes)
+INFERENCE_EXECUTOR = InferenceExecutor()
+# Junta requisições concorrentes num único batch de inferência (ativo se MICRO_BATCH_MAX_SIZE > 1)
+BATCHER = MicroBatcher(lambda texts: services.predict_intents(texts, MODELS), INFERENCE_EXECUTOR)
+REGISTRY.gauge("inference_in_flight", "Tarefas aceitas pelo pool de inferência (em execução + na fila).",
+               collect=lambda: INFERENCE_EXECUTOR.in_flight)
+REGISTRY.gauge("inference_queue_depth", "Tarefas esperando por uma thread livre do pool de inferência.",
+               collect=lambda: INFERENCE_EXECUTOR.queue_depth)
 
 def get_model_urls() -> str:
     """
@@ -42,26 +68,74 @@ def get_model_urls() -> str:
     
     return f"{confusion_url},{clair_url}"
 
+def get_warm_up_batch_sizes() -> list:
+    """
+    Tamanhos de batch aquecidos no startup: WARM_UP_BATCH_SIZES, ou os usados pelo
+    servidor (1 texto no /predict, o tamanho máximo do micro-batch e o de um lote típico
+    do /predict/batch).
+    """
+    if services.WARM_UP_BATCH_SIZES:
+        return [int(size) for size in services.WARM_UP_BATCH_SIZES.split(",") if size.strip()]
+    sizes = {1, min(32, BATCH_MAX_TEXTS)}
+    if BATCHER.enabled:
+        sizes.add(BATCHER.max_batch_size)
+    return sorted(sizes)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """
     Inicialização do app. Atualmente, apenas carrega modelos do W&B.
     """
-    global MODELS
+    global MODELS, READY, WARM_UP_ERROR
     logger.info("Carregando modelos do W&B durante a inicialização do app...")
     try:
         model_urls_str = get_model_urls()
-        MODELS = services.load_all_classifiers(model_urls_str)
+        MODELS = MODEL_REGISTRY.publish(services.load_all_classifiers(model_urls_str),
+                                        {services.model_name_from_url(url.strip()): url.strip()
+                                         for url in model_urls_str.split(',') if url.strip()})
         logger.info("Modelos do W&B carregados com sucesso.")
+        # Tempo de cada fase do carregamento (download, deserialize, warm_up) no /stats
+        REGISTRY.register_collector("model_loading", lambda: services.LOAD_TIMINGS)
+        REGISTRY.register_collector("prediction_cache", services.PREDICTION_CACHE.stats)
     except Exception as e:
         logger.error(f"Falha crítica ao carregar modelos do W&B: {str(e)}")
         logger.error(traceback.format_exc())
         raise Exception(f"Falha crítica ao carregar modelos do W&B: {str(e)}")
+    # Traça os grafos antes de aceitar requisições (evita picos de latência após cada deploy)
+    WARM_UP_ERROR = None
+    if services.WARM_UP_ENABLED and MODELS:
+        try:
+            services.warm_up_classifiers(MODELS, get_warm_up_batch_sizes())
+        except Exception as e:
+            # O app continua no ar (para diagnóstico), mas nunca se declara pronto sem warm-up
+            WARM_UP_ERROR = str(e)
+            logger.error(f"Falha no warm-up dos modelos: {str(e)}")
+            logger.error(traceback.format_exc())
+    # Cliente MongoDB compartilhado (pool de conexões) por todo o processo
+    if MONGO_URI and MONGO_DB:
+        init_mongo_client()
+    else:
+        logger.warning("MONGO_URI/MONGO_DB não definidos: o cliente MongoDB não foi iniciado.")
+    # Logs de predição gravados em segundo plano (write-behind)
+    if LOG_WRITE_MODE == "async":
+        start_log_writer()
+        REGISTRY.register_collector("prediction_log_writer", log_writer_stats)
+    INFERENCE_EXECUTOR.start()
+    if BATCHER.enabled:
+        BATCHER.start()
     # This is the point where the app is ready to handle requests
+    READY = WARM_UP_ERROR is None
     yield
     # Código para ser executado no shutdown (opcional)
+    READY = False
     logger.info("Descarregando modelos e limpando recursos...")
-    MODELS.clear()
+    if _RELOAD_TASKS:
+        await asyncio.gather(*_RELOAD_TASKS, return_exceptions=True)
+    await BATCHER.stop()
+    INFERENCE_EXECUTOR.shutdown()
+    stop_log_writer()
+    close_mongo_client()
+    MODELS = MODEL_REGISTRY.publish({}, {})
 
 
 # Inicializando a aplicação FastAPI
@@ -84,6 +158,8 @@ app.add_middleware(
     allow_methods=["*"],              # permite todos os métodos: GET, POST, etc
     allow_headers=["*"],              # permite todos os headers (Authorization, Content-Type...)
 )
+# Latência, contagem e requisições em andamento por rota (ver /metrics)
+app.add_middleware(PrometheusMiddleware)
 
 """
 Routes
@@ -92,26 +168,194 @@ Routes
 async def root():
     return {"message": f"Aplicação Básica de ML está executando no modo {ENV}."}
 
+@app.get("/ready")
+async def ready():
+    """
+    Readiness: 200 somente depois que os modelos foram carregados e aquecidos; 503 antes
+    disso, durante o shutdown e se o warm-up falhou.
+    """
+    if WARM_UP_ERROR is not None:
+        return JSONResponse(status_code=503, content={"status": "warm_up_failed", "error": WARM_UP_ERROR,
+                                                      "models": list(MODELS)})
+    if not READY or not MODELS:
+        return JSONResponse(status_code=503, content={"status": "starting", "models": list(MODELS)})
+    return {"status": "ready", "models": list(MODELS)}
+
+@app.get("/stats")
+async def stats():
+    """
+    Retorna as métricas internas do serviço (ex.: tamanho dos micro-batches e tempo de fila).
+    """
+    return REGISTRY.snapshot()
+
+@app.get("/metrics")
+async def metrics():
+    """
+    As mesmas métricas do /stats no formato de texto do Prometheus (para scraping).
+    """
+    return PlainTextResponse(REGISTRY.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+async def authenticated_owner(request: Request) -> str:
+    """`conditional_auth`, com o tempo da autenticação medido no estágio "auth"."""
+    with services.stage_seconds("auth").time():
+        return await conditional_auth(request)
+
 @app.post("/predict")
-async def predict(text: str, owner: str = Depends(conditional_auth)):
+async def predict(text: str, owner: str = Depends(authenticated_owner)):
     """
     Endpoint de predição.
     Este é um 'Controller' enxuto. 
     Ele apenas delega a lógica de negócio para o services.py.
     """
     try:
-        # 1. O Controller delega TODA a lógica de negócio para o services.py
-        results = services.predict_and_log_intent(
-            text=text, 
-            owner=owner, 
-            models=MODELS
-        )
+        # 1. O Controller delega TODA a lógica de negócio para o services.py,
+        #    executada no pool de inferência para não bloquear o event loop
+        if PROFILER.should_sample():
+            # Amostra perfilada: roda sozinha (fora do micro-batch) para o profile ser só desta requisição
+            results = await INFERENCE_EXECUTOR.run(
+                PROFILER.run,
+                services.predict_and_log_intent,
+                request_metadata("/predict", owner, 1, MODELS),
+                text=text,
+                owner=owner,
+                models=MODELS
+            )
+        elif BATCHER.enabled:
+            predictions = await BATCHER.submit(text)
+            results = await INFERENCE_EXECUTOR.run(services.log_intent, text, owner, predictions)
+        else:
+            results = await INFERENCE_EXECUTOR.run(
+                services.predict_and_log_intent,
+                text=text, 
+                owner=owner, 
+                models=MODELS
+            )
         # 2. O Controller retorna a resposta (Lógica de View) no formato JSON
         return JSONResponse(content=results)
+    except ExecutorSaturatedError as e:
+        logger.warning(f"Requisição recusada: {str(e)}")
+        raise HTTPException(status_code=503, detail="Servidor sobrecarregado, tente novamente.",
+                            headers={"Retry-After": "1"})
     except Exception as e:
         logger.error(f"Erro ao processar a predição: {str(e)}")
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"Erro interno ao processar a predição: {str(e)}")
 
+@app.post("/predict/batch")
+async def predict_batch(body: BatchPredictionRequest, owner: str = Depends(authenticated_owner)):
+    """
+    Endpoint de predição em lote.
+    Recebe até BATCH_MAX_TEXTS textos num JSON ({"texts": [...]}) e retorna uma lista
+    de predições, na mesma ordem, com uma única inferência por modelo e um único log no BD.
+    Com "compact": true, retorna por modelo os códigos e a matriz de probabilidades.
+    """
+    try:
+        if body.compact:
+            fn, kwargs = services.predict_and_log_intents_compact, {"top_k": body.top_k}
+        else:
+            fn, kwargs = services.predict_and_log_intents, {}
+        if PROFILER.should_sample():
+            results = await INFERENCE_EXECUTOR.run(
+                PROFILER.run,
+                fn,
+                request_metadata("/predict/batch", owner, len(body.texts), MODELS),
+                texts=body.texts,
+                owner=owner,
+                models=MODELS,
+                **kwargs
+            )
+        else:
+            results = await INFERENCE_EXECUTOR.run(
+                fn,
+                texts=body.texts,
+                owner=owner,
+                models=MODELS,
+                **kwargs
+            )
+        return JSONResponse(content=results)
+    except ExecutorSaturatedError as e:
+        logger.warning(f"Requisição recusada: {str(e)}")
+        raise HTTPException(status_code=503, detail="Servidor sobrecarregado, tente novamente.",
+                            headers={"Retry-After": "1"})
+    except Exception as e:
+        logger.error(f"Erro ao processar a predição em lote: {str(e)}")
+        logger.error(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=f"Erro interno ao processar a predição em lote: {str(e)}")
+
+"""
+Admin routes
+"""
+async def _reload_model(url: str) -> None:
+    """
+    Carrega e aquece a nova versão fora do event loop e publica o novo dict de modelos.
+    A troca já deve ter sido reservada com `MODEL_REGISTRY.begin_reload`.
+    """
+    global MODELS
+    MODELS = await run_in_threadpool(MODEL_REGISTRY.reload, url.strip(), get_warm_up_batch_sizes(), reserved=True)
+
+def _on_reload_done(task: asyncio.Task) -> None:
+    _RELOAD_TASKS.discard(task)
+    # Falhas já ficam registradas em MODEL_REGISTRY.last_reload e nos logs
+    if not task.cancelled():
+        task.exception()
+
+@app.get("/admin/models")
+async def admin_models(admin: str = Depends(admin_auth)):
+    """
+    Versões ativas (URL e hash de cada modelo), versões anteriores disponíveis para
+    rollback e o estado da última troca.
+    """
+    return MODEL_REGISTRY.status()
+
+@app.post("/admin/models/reload")
+async def admin_reload_model(body: ModelReloadRequest, admin: str = Depends(admin_auth)):
+    """
+    Carrega uma nova versão de um modelo em produção (ex.: confusion-clf:v2), aquece e
+    troca atomicamente, sem derrubar as requisições em andamento. Por padrão responde 202
+    e a troca acontece em segundo plano (acompanhe em GET /admin/models).
+    """
+    model_name = services.model_name_from_url(body.url.strip())
+    if model_name not in MODEL_REGISTRY.models:
+        raise HTTPException(status_code=404, detail=f"Modelo '{model_name}' não está em produção.")
+    # A troca é reservada antes de responder: uma segunda troca concorrente recebe 409 na hora
+    try:
+        MODEL_REGISTRY.begin_reload()
+    except ReloadInProgressError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if body.wait:
+        try:
+            await _reload_model(body.url)
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"Falha ao trocar o modelo: {str(e)}")
+        return MODEL_REGISTRY.status()
+    task = asyncio.ensure_future(_reload_model(body.url))
+    _RELOAD_TASKS.add(task)
+    task.add_done_callback(_on_reload_done)
+    return JSONResponse(status_code=202, content={"status": "reloading", "model": model_name, "url": body.url})
+
+@app.post("/admin/models/{model_name}/rollback")
+async def admin_rollback_model(model_name: str, admin: str = Depends(admin_auth)):
+    """Volta instantaneamente para a versão anterior do modelo (mantida em memória)."""
+    global MODELS
+    try:
+        MODELS = MODEL_REGISTRY.rollback(model_name)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Não há versão anterior do modelo '{model_name}'.")
+    return MODEL_REGISTRY.status()
+
+@app.get("/admin/profiling")
+async def admin_profiling(admin: str = Depends(admin_auth)):
+    """Configuração do profiling amostrado e as últimas amostras gravadas."""
+    return PROFILER.status()
+
+@app.post("/admin/profiling")
+async def admin_configure_profiling(body: ProfilingConfigRequest, admin: str = Depends(admin_auth)):
+    """
+    Liga, desliga ou ajusta o profiling amostrado das predições sem redeploy
+    (ex.: {"sample_rate": 0.01, "tf_trace": true}; {"sample_rate": 0} desliga).
+    """
+    PROFILER.configure(sample_rate=body.sample_rate, tf_trace=body.tf_trace)
+    return PROFILER.status()
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
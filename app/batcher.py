@@ -0,0 +1,131 @@
+"""
+Micro-batching dinâmico das predições.
+
+Cada `/predict` classifica um único texto, mas uma passada do sentence encoder custa
+quase o mesmo para 1 ou para dezenas de textos. O `MicroBatcher` junta as requisições
+que chegam ao mesmo tempo num único batch (até `max_batch_size` textos ou
+`max_wait_ms` milissegundos de espera), executa uma única predição no
+`InferenceExecutor` e devolve a cada requisição o seu resultado.
+
+A fila do batcher é limitada ao que o executor consegue aceitar (`max_batch_size` textos
+por tarefa em execução ou na fila): com o executor saturado ou a fila cheia, `submit`
+recusa o texto na hora com `ExecutorSaturatedError` (HTTP 503), em vez de deixá-lo esperar.
+"""
+
+import os
+import time
+import asyncio
+import logging
+from typing import Any, Callable, List, Optional, Tuple
+
+from app.executor import InferenceExecutor, ExecutorSaturatedError
+from app.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+class MicroBatcher:
+    """
+    Agrupa chamadas concorrentes de `submit` em batches processados por `process_batch`.
+
+    :param process_batch: Função síncrona que recebe uma lista de itens e devolve
+                          uma lista de resultados na mesma ordem.
+    :param executor: Executor onde `process_batch` roda (fora do event loop).
+    :param max_batch_size: Tamanho máximo de um batch. Com 1, o micro-batching fica desativado.
+    :param max_wait_ms: Tempo máximo que o primeiro item de um batch espera por outros itens.
+    """
+    def __init__(self, process_batch: Callable[[List[Any]], List[Any]],
+                 executor: InferenceExecutor,
+                 max_batch_size: Optional[int] = None,
+                 max_wait_ms: Optional[float] = None):
+        self.process_batch = process_batch
+        self.executor = executor
+        self.max_batch_size = max_batch_size or int(os.getenv("MICRO_BATCH_MAX_SIZE", 1))
+        self.max_wait_ms = max_wait_ms if max_wait_ms is not None else float(os.getenv("MICRO_BATCH_MAX_WAIT_MS", 5))
+        self._queue: Optional[asyncio.Queue] = None
+        self._collector: Optional[asyncio.Task] = None
+        self._running_batches: set = set()
+        self.batch_size = REGISTRY.histogram("micro_batch_size", "Número de textos por batch executado.",
+                                             buckets=BATCH_SIZE_BUCKETS)
+        self.queue_wait = REGISTRY.histogram("micro_batch_queue_wait_seconds",
+                                             "Tempo entre a chegada do texto e o início do seu batch.")
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_batch_size > 1
+
+    @property
+    def max_queue_size(self) -> int:
+        """Textos que podem esperar na fila: um batch cheio por tarefa que o executor aceita."""
+        return self.max_batch_size * (self.executor.max_workers + self.executor.max_queue)
+
+    def start(self) -> None:
+        """Inicia a tarefa que coleta os batches. Deve ser chamado com o event loop rodando."""
+        if self._collector is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+            self._collector = asyncio.get_running_loop().create_task(self._collect())
+            logger.info(f"Micro-batching ativo (até {self.max_batch_size} textos ou {self.max_wait_ms} ms).")
+
+    async def stop(self) -> None:
+        """Para a coleta e espera os batches em execução terminarem."""
+        if self._collector is not None:
+            self._collector.cancel()
+            try:
+                await self._collector
+            except asyncio.CancelledError:
+                pass
+            self._collector = None
+        if self._running_batches:
+            await asyncio.gather(*self._running_batches, return_exceptions=True)
+
+    async def submit(self, item: Any) -> Any:
+        """
+        Enfileira um item e aguarda o resultado do batch em que ele for executado.
+
+        :raises ExecutorSaturatedError: Se o executor estiver saturado ou a fila do batcher cheia.
+        """
+        self.start()
+        if self.executor.saturated:
+            raise ExecutorSaturatedError(
+                f"Executor de inferência saturado ({self.executor.in_flight} tarefas em andamento).")
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((item, future, time.perf_counter()))
+        except asyncio.QueueFull:
+            raise ExecutorSaturatedError(f"Fila do micro-batching cheia ({self._queue.qsize()} textos).")
+        return await future
+
+    async def _collect(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            deadline = time.perf_counter() + self.max_wait_ms / 1000
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+                except asyncio.TimeoutError:
+                    break
+            # O batch roda em paralelo com a coleta do próximo
+            task = asyncio.ensure_future(self._run_batch(batch))
+            self._running_batches.add(task)
+            task.add_done_callback(self._running_batches.discard)
+
+    async def _run_batch(self, batch: List[Tuple[Any, asyncio.Future, float]]) -> None:
+        started = time.perf_counter()
+        self.batch_size.observe(len(batch))
+        for _, _, enqueued_at in batch:
+            self.queue_wait.observe(started - enqueued_at)
+        try:
+            results = await self.executor.run(self.process_batch, [item for item, _, _ in batch])
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future, _), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
@@ -0,0 +1,176 @@
+"""
+Cache dos resultados de predição.
+
+O tráfego do chat é muito repetitivo ("oi", "ping", "are you there?"), então o resultado
+de cada modelo é guardado com a chave `modelo:versão:texto pré-processado`. Um acerto
+no cache pula a inferência por completo.
+
+O valor guardado é a linha de probabilidades do texto (float32, na ordem de `codes` do
+modelo, que é fixa para uma versão), sem montar nem serializar um dict por texto.
+
+Há dois backends:
+- `LocalLRUBackend`: LRU em memória, limitado em bytes (padrão);
+- `RedisBackend`: compartilhado entre processos, com qualquer cliente compatível com Redis
+  (`mget`/`set`/`delete`/`scan_iter`), ativado por PREDICTION_CACHE_REDIS_URL.
+
+A versão do modelo (hash do arquivo) faz parte da chave, então um modelo recarregado
+com outro conteúdo nunca lê resultados antigos; `clear` também remove as entradas.
+"""
+
+import os
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+from app.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Memória máxima (MB) do cache local; 0 desativa o cache
+PREDICTION_CACHE_MAX_MB = float(os.getenv("PREDICTION_CACHE_MAX_MB", 32))
+# Se definido, usa um Redis compartilhado em vez do LRU local (ex.: redis://localhost:6379/0)
+PREDICTION_CACHE_REDIS_URL = os.getenv("PREDICTION_CACHE_REDIS_URL")
+# Tempo de vida (s) das entradas no Redis
+PREDICTION_CACHE_TTL_SECONDS = int(os.getenv("PREDICTION_CACHE_TTL_SECONDS", 3600))
+
+# O "v2" separa as entradas de probabilidades das antigas (JSON de `SinglePrediction`) no Redis
+KEY_PREFIX = "intent-prediction:v2:"
+
+
+def make_key(model_name: str, model_version: str, preprocessed_text: str) -> str:
+    return f"{KEY_PREFIX}{model_name}:{model_version}:{preprocessed_text}"
+
+
+class LocalLRUBackend:
+    """
+    LRU em memória limitado pelo tamanho aproximado (chave + bytes do valor) das entradas.
+
+    :param max_bytes: Tamanho máximo do cache em bytes.
+    """
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    found[key] = entry[0]
+        return found
+
+    def set_many(self, items: Dict[str, np.ndarray]) -> None:
+        with self._lock:
+            for key, value in items.items():
+                # Cópia própria: uma linha da matriz do lote manteria a matriz inteira em memória
+                value = np.array(value, dtype=np.float32)
+                size = len(key) + value.nbytes
+                if size > self.max_bytes:
+                    continue
+                if key in self._entries:
+                    self._bytes -= self._entries.pop(key)[1]
+                self._entries[key] = (value, size)
+                self._bytes += size
+                while self._bytes > self.max_bytes:
+                    _, (_, evicted_size) = self._entries.popitem(last=False)
+                    self._bytes -= evicted_size
+                    self.evictions += 1
+
+    def clear(self, prefix: str = KEY_PREFIX) -> None:
+        with self._lock:
+            for key in [k for k in self._entries if k.startswith(prefix)]:
+                self._bytes -= self._entries.pop(key)[1]
+
+    def stats(self) -> Dict:
+        return {"backend": "local", "entries": len(self._entries), "bytes": self._bytes,
+                "max_bytes": self.max_bytes, "evictions": self.evictions}
+
+
+class RedisBackend:
+    """
+    Backend compartilhado sobre um cliente compatível com Redis.
+
+    :param client: Cliente com `mget`, `set(key, value, ex=...)`, `delete` e `scan_iter(match=...)`.
+    :param ttl_seconds: Tempo de vida das entradas.
+    """
+    def __init__(self, client, ttl_seconds: int = PREDICTION_CACHE_TTL_SECONDS):
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, np.ndarray]:
+        keys = list(keys)
+        values = self.client.mget(keys) if keys else []
+        return {key: np.frombuffer(value, dtype=np.float32)
+                for key, value in zip(keys, values) if value is not None}
+
+    def set_many(self, items: Dict[str, np.ndarray]) -> None:
+        for key, value in items.items():
+            self.client.set(key, np.asarray(value, dtype=np.float32).tobytes(), ex=self.ttl_seconds)
+
+    def clear(self, prefix: str = KEY_PREFIX) -> None:
+        keys = list(self.client.scan_iter(match=f"{prefix}*"))
+        if keys:
+            self.client.delete(*keys)
+
+    def stats(self) -> Dict:
+        return {"backend": "redis", "ttl_seconds": self.ttl_seconds}
+
+
+class PredictionCache:
+    """
+    Cache das probabilidades de cada texto por modelo, versão do modelo e texto
+    pré-processado, com contadores de acertos e faltas.
+
+    :param backend: `LocalLRUBackend`, `RedisBackend` ou None (cache desativado).
+    """
+    def __init__(self, backend=None):
+        self.backend = backend
+        self.hits = REGISTRY.counter("prediction_cache_hits", "Textos respondidos pelo cache de predições.")
+        self.misses = REGISTRY.counter("prediction_cache_misses", "Textos que precisaram de inferência.")
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, np.ndarray]:
+        try:
+            return self.backend.get_many(keys)
+        except Exception as e:
+            # O cache nunca deve derrubar uma predição
+            logger.warning(f"Falha ao ler o cache de predições: {e}")
+            return {}
+
+    def set_many(self, items: Dict[str, np.ndarray]) -> None:
+        try:
+            self.backend.set_many(items)
+        except Exception as e:
+            logger.warning(f"Falha ao gravar no cache de predições: {e}")
+
+    def clear(self, model_name: Optional[str] = None) -> None:
+        """Remove as entradas de um modelo (ou de todos, se `model_name` for None)."""
+        if self.enabled:
+            self.backend.clear(f"{KEY_PREFIX}{model_name}:" if model_name else KEY_PREFIX)
+
+    def stats(self) -> Dict:
+        lookups = self.hits.value + self.misses.value
+        return {**(self.backend.stats() if self.enabled else {"backend": None}),
+                "hit_ratio": self.hits.value / lookups if lookups else 0.0}
+
+
+def create_prediction_cache() -> PredictionCache:
+    """Cria o cache a partir das variáveis de ambiente (Redis, LRU local ou desativado)."""
+    if PREDICTION_CACHE_REDIS_URL:
+        # Dependência opcional: só é necessária com um cache compartilhado
+        import redis
+        return PredictionCache(RedisBackend(redis.Redis.from_url(PREDICTION_CACHE_REDIS_URL)))
+    if PREDICTION_CACHE_MAX_MB > 0:
+        return PredictionCache(LocalLRUBackend(int(PREDICTION_CACHE_MAX_MB * 1024 * 1024)))
+    return PredictionCache(None)
@@ -0,0 +1,91 @@
+"""
+Executor dedicado para a inferência dos modelos.
+
+O TensorFlow (`model.predict`) e o pymongo são síncronos. Executá-los direto numa
+rota `async def` bloqueia o event loop e trava todas as outras requisições (inclusive `/`).
+Este módulo move esse trabalho para um pool de threads limitado, com uma fila de
+tamanho máximo: quando o pool satura, a requisição é recusada na hora (HTTP 503)
+em vez de se acumular e degradar a latência de todo mundo.
+"""
+
+import os
+import asyncio
+import logging
+import functools
+from typing import Any, Callable, Optional
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+def default_max_workers() -> int:
+    """
+    Número padrão de threads de inferência: INFERENCE_WORKERS, ou o mesmo número de
+    threads intra-op configurado para o TensorFlow (TF_NUM_INTRAOP_THREADS), ou o número de CPUs.
+    """
+    return int(os.getenv("INFERENCE_WORKERS") or os.getenv("TF_NUM_INTRAOP_THREADS") or os.cpu_count() or 1)
+
+
+class ExecutorSaturatedError(Exception):
+    """Exceção lançada quando o executor já tem o máximo de tarefas em execução e na fila."""
+    pass
+
+
+class InferenceExecutor:
+    """
+    Pool de threads limitado para rodar funções bloqueantes fora do event loop.
+
+    :param max_workers: Número de threads que executam tarefas em paralelo.
+    :param max_queue: Número máximo de tarefas esperando por uma thread livre.
+    """
+    def __init__(self, max_workers: Optional[int] = None, max_queue: Optional[int] = None):
+        self.max_workers = max_workers or default_max_workers()
+        self.max_queue = max_queue if max_queue is not None else int(os.getenv("INFERENCE_MAX_QUEUE", 64))
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending = 0
+
+    @property
+    def in_flight(self) -> int:
+        """Tarefas aceitas e ainda não concluídas (em execução + na fila)."""
+        return self._pending
+
+    @property
+    def saturated(self) -> bool:
+        """Se o pool e a fila já estão cheios (a próxima tarefa seria recusada)."""
+        return self._pending >= self.max_workers + self.max_queue
+
+    @property
+    def queue_depth(self) -> int:
+        """Tarefas aceitas esperando por uma thread livre."""
+        return max(0, self._pending - self.max_workers)
+
+    def start(self) -> "InferenceExecutor":
+        """Cria o pool de threads. Chamado no startup do app."""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="inference")
+            logger.info(f"Executor de inferência iniciado ({self.max_workers} thread(s), fila de {self.max_queue}).")
+        return self
+
+    def shutdown(self) -> None:
+        """Espera as tarefas em andamento terminarem e encerra o pool. Chamado no shutdown do app."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Executa `fn(*args, **kwargs)` numa thread do pool e aguarda o resultado sem bloquear o event loop.
+
+        :raises ExecutorSaturatedError: Se o pool e a fila já estiverem cheios.
+        """
+        if self.saturated:
+            raise ExecutorSaturatedError(
+                f"Executor de inferência saturado ({self._pending} tarefas em andamento)."
+            )
+        self.start()
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+        finally:
+            self._pending -= 1
@@ -0,0 +1,289 @@
+"""
+Métricas internas do serviço (contadores, gauges e histogramas em memória).
+
+Cada componente registra as suas métricas em `REGISTRY`. O endpoint `/stats` devolve
+um retrato (snapshot) de todas elas em JSON e o `/metrics`, o mesmo conteúdo no formato
+de texto do Prometheus. Uma métrica pode ter labels (ex.: `{"model": "confusion-clf"}`):
+cada combinação de labels é uma série separada da mesma família.
+"""
+
+import time
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Limites (em segundos) usados por padrão nos histogramas de latência
+DEFAULT_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Optional[Dict[str, str]]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in (labels or {}).items()))
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in labels)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(labels, escaped)) + "}"
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value == value else "NaN"
+
+
+class Counter:
+    """Contador monotônico."""
+    type = "counter"
+
+    def __init__(self, name: str, description: str = "", labels: Labels = ()):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> float:
+        return self._value
+
+    def snapshot(self) -> Dict:
+        return {"type": "counter", "value": self._value}
+
+    def samples(self) -> List[Tuple[str, Labels, float]]:
+        return [(self.name, self.labels, self._value)]
+
+
+class Gauge:
+    """
+    Valor que sobe e desce (ex.: requisições em andamento). Com `collect`, o valor é
+    lido dessa função no momento do snapshot.
+    """
+    type = "gauge"
+
+    def __init__(self, name: str, description: str = "", labels: Labels = (),
+                 collect: Optional[Callable[[], float]] = None):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.collect = collect
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def set(self, value: float) -> None:
+        with self._lock:
+            self._value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.inc(-amount)
+
+    @contextmanager
+    def track_in_progress(self) -> Iterator[None]:
+        """Soma 1 enquanto o bloco executa."""
+        self.inc()
+        try:
+            yield
+        finally:
+            self.dec()
+
+    @property
+    def value(self) -> float:
+        return float(self.collect()) if self.collect is not None else self._value
+
+    def snapshot(self) -> Dict:
+        return {"type": "gauge", "value": self.value}
+
+    def samples(self) -> List[Tuple[str, Labels, float]]:
+        return [(self.name, self.labels, self.value)]
+
+
+class Histogram:
+    """
+    Histograma cumulativo (no estilo do Prometheus): conta quantas observações
+    ficaram abaixo de cada limite, além do total e da soma.
+    """
+    type = "histogram"
+
+    def __init__(self, name: str, description: str = "", buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+                 labels: Labels = ()):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.buckets: List[float] = sorted(buckets)
+        self._counts = [0] * len(self.buckets)
+        self._count = 0
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            self._count += 1
+            self._sum += value
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self._counts[i] += 1
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        """Observa a duração (s) do bloco, mesmo se ele lançar uma exceção."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    @property
+    def count(self) -> int:
+        return self._count
+
+    @property
+    def sum(self) -> float:
+        return self._sum
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "type": "histogram",
+                "count": self._count,
+                "sum": self._sum,
+                "mean": self._sum / self._count if self._count else 0.0,
+                "buckets": {str(bound): count for bound, count in zip(self.buckets, self._counts)},
+            }
+
+    def samples(self) -> List[Tuple[str, Labels, float]]:
+        with self._lock:
+            counts, count, total = list(self._counts), self._count, self._sum
+        samples = [(f"{self.name}_bucket", self.labels + (("le", repr(float(bound))),), n)
+                   for bound, n in zip(self.buckets, counts)]
+        samples.append((f"{self.name}_bucket", self.labels + (("le", "+Inf"),), count))
+        samples.append((f"{self.name}_sum", self.labels, total))
+        samples.append((f"{self.name}_count", self.labels, count))
+        return samples
+
+
+class MetricsRegistry:
+    """Registro das métricas do processo, indexadas pelo nome e pelos labels."""
+    def __init__(self):
+        self._metrics: Dict[Tuple[str, Labels], object] = {}
+        self._collectors: Dict[str, Callable[[], Dict]] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, labels: Optional[Dict[str, str]] = None, **kwargs):
+        key = (name, _labels(labels))
+        metric = self._metrics.get(key)
+        if metric is not None:
+            return metric
+        with self._lock:
+            if key not in self._metrics:
+                self._metrics[key] = cls(name, labels=key[1], **kwargs)
+            return self._metrics[key]
+
+    def counter(self, name: str, description: str = "", labels: Optional[Dict[str, str]] = None) -> Counter:
+        return self._get_or_create(Counter, name, labels, description=description)
+
+    def gauge(self, name: str, description: str = "", labels: Optional[Dict[str, str]] = None,
+              collect: Optional[Callable[[], float]] = None) -> Gauge:
+        return self._get_or_create(Gauge, name, labels, description=description, collect=collect)
+
+    def histogram(self, name: str, description: str = "",
+                  buckets: Optional[Sequence[float]] = None,
+                  labels: Optional[Dict[str, str]] = None) -> Histogram:
+        return self._get_or_create(Histogram, name, labels, description=description,
+                                   buckets=buckets or DEFAULT_LATENCY_BUCKETS)
+
+    def register_collector(self, name: str, collect: Callable[[], Dict]) -> None:
+        """
+        Registra uma função que devolve métricas de um componente externo
+        (ex.: os contadores do writer de logs) no momento do snapshot.
+        No `/metrics`, os valores numéricos do dict viram gauges `<name>_<chave>`.
+        """
+        with self._lock:
+            self._collectors[name] = collect
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            metrics = dict(self._metrics)
+            collectors = dict(self._collectors)
+        result = {f"{name}{_format_labels(labels)}": metric.snapshot()
+                  for (name, labels), metric in sorted(metrics.items())}
+        for name, collect in sorted(collectors.items()):
+            result[name] = {"type": "collector", "values": collect()}
+        return result
+
+    def render_prometheus(self) -> str:
+        """Todas as métricas no formato de texto do Prometheus (versão 0.0.4)."""
+        with self._lock:
+            metrics = dict(self._metrics)
+            collectors = dict(self._collectors)
+        families: Dict[str, List] = {}
+        for (name, _), metric in sorted(metrics.items()):
+            families.setdefault(name, []).append(metric)
+        lines = []
+        for name, family in families.items():
+            lines.append(f"# HELP {name} {family[0].description}".rstrip())
+            lines.append(f"# TYPE {name} {family[0].type}")
+            for metric in family:
+                for sample_name, labels, value in metric.samples():
+                    lines.append(f"{sample_name}{_format_labels(labels)} {_format_value(value)}")
+        for name, collect in sorted(collectors.items()):
+            try:
+                values = collect()
+            except Exception:
+                continue
+            for key, value in sorted(values.items()):
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    metric_name = "".join(c if c.isalnum() else "_" for c in f"{name}_{key}")
+                    lines.append(f"# TYPE {metric_name} gauge")
+                    lines.append(f"{metric_name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class PrometheusMiddleware:
+    """
+    Middleware ASGI que mede cada requisição HTTP: requisições em andamento
+    (`http_requests_in_flight`), total por rota e status (`http_requests_total`) e
+    duração por rota (`http_request_duration_seconds`). A rota é o modelo do caminho
+    (ex.: "/admin/models/{model_name}/rollback"), para não criar uma série por URL.
+    """
+    def __init__(self, app, registry: Optional[MetricsRegistry] = None):
+        self.app = app
+        self.registry = registry or REGISTRY
+        self.in_flight = self.registry.gauge("http_requests_in_flight", "Requisições HTTP em andamento.")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        self.in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.in_flight.dec()
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            self.registry.histogram("http_request_duration_seconds", "Duração das requisições HTTP.",
+                                    labels={"method": scope["method"], "path": path}
+                                    ).observe(time.perf_counter() - started)
+            self.registry.counter("http_requests_total", "Requisições HTTP por rota e status.",
+                                  labels={"method": scope["method"], "path": path,
+                                          "status": str(status["code"])}).inc()
+
+
+REGISTRY = MetricsRegistry()
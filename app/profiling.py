@@ -0,0 +1,202 @@
+"""
+Profiling amostrado das requisições de predição, para diagnosticar picos de latência
+em produção sem redeploy.
+
+Com `PROFILE_SAMPLE_RATE` > 0 (ou via `POST /admin/profiling`), essa fração das
+requisições de `/predict` e `/predict/batch` roda sob o `cProfile` e, opcionalmente,
+sob o profiler do TensorFlow (`PROFILE_TF_TRACE`). Cada amostra é gravada numa pasta
+própria em `PROFILE_DIR`:
+
+- `profile.prof`: estatísticas do `cProfile` (abra com `snakeviz` ou `pstats`);
+- `profile.txt`: as funções com maior tempo acumulado, em texto;
+- `metadata.json`: rota, dono do token, número de textos, versões dos modelos e duração;
+- `tf_trace/`: o trace do TensorFlow (abra no TensorBoard, aba "Profile"), se ativado.
+
+Os profilers do Python (a partir do 3.12) e do TensorFlow são globais ao processo, então
+só uma requisição é perfilada por vez: amostras sorteadas enquanto outra está em
+andamento rodam normalmente e são contadas em `profiles_skipped_total`.
+"""
+
+import os
+import io
+import json
+import time
+import uuid
+import random
+import shutil
+import pstats
+import cProfile
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from app.metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Fração das requisições de predição perfiladas (0 desativa)
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0))
+# Pasta local onde as amostras são gravadas
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+# Quando "true", grava também um trace do profiler do TensorFlow em cada amostra
+PROFILE_TF_TRACE = os.getenv("PROFILE_TF_TRACE", "false").lower() == "true"
+# Número máximo de amostras mantidas em disco (as mais antigas são apagadas)
+PROFILE_MAX_SAMPLES = int(os.getenv("PROFILE_MAX_SAMPLES", 100))
+# Linhas do resumo em texto (`profile.txt`)
+PROFILE_TOP_FUNCTIONS = 50
+
+
+class RequestProfiler:
+    """
+    Sorteia requisições e roda a função de predição delas sob o `cProfile`.
+
+    :param sample_rate: Fração (0 a 1) das requisições perfiladas.
+    :param output_dir: Pasta onde as amostras são gravadas.
+    :param tf_trace: Grava também o trace do profiler do TensorFlow.
+    :param max_samples: Número máximo de amostras mantidas em `output_dir`.
+    """
+    def __init__(self, sample_rate: float = PROFILE_SAMPLE_RATE, output_dir: str = PROFILE_DIR,
+                 tf_trace: bool = PROFILE_TF_TRACE, max_samples: int = PROFILE_MAX_SAMPLES):
+        self.configure(sample_rate=sample_rate, output_dir=output_dir, tf_trace=tf_trace, max_samples=max_samples)
+        self.recent: List[Dict] = []
+        self._lock = threading.Lock()
+        self.captured = REGISTRY.counter("profiles_captured_total", "Requisições perfiladas e gravadas em disco.")
+        self.skipped = REGISTRY.counter("profiles_skipped_total",
+                                        "Requisições sorteadas e não perfiladas (outro profiling em andamento).")
+
+    def configure(self, sample_rate: Optional[float] = None, output_dir: Optional[str] = None,
+                  tf_trace: Optional[bool] = None, max_samples: Optional[int] = None) -> None:
+        """Altera a configuração em tempo de execução (parâmetros None ficam como estão)."""
+        if sample_rate is not None:
+            if not 0 <= sample_rate <= 1:
+                raise ValueError(f"sample_rate deve estar entre 0 e 1, recebido {sample_rate}.")
+            self.sample_rate = sample_rate
+        if output_dir is not None:
+            self.output_dir = output_dir
+        if tf_trace is not None:
+            self.tf_trace = tf_trace
+        if max_samples is not None:
+            self.max_samples = max_samples
+
+    @property
+    def enabled(self) -> bool:
+        return self.sample_rate > 0
+
+    def should_sample(self) -> bool:
+        """Sorteia se a próxima requisição será perfilada."""
+        return self.enabled and random.random() < self.sample_rate
+
+    def run(self, fn: Callable[..., Any], metadata: Dict, *args, **kwargs) -> Any:
+        """
+        Executa `fn(*args, **kwargs)` sob o profiler e grava a amostra com `metadata`.
+        Bloqueante: deve rodar na mesma thread da inferência (o `cProfile` só vê a thread
+        em que foi ativado). Se outra requisição já estiver sendo perfilada, só executa `fn`.
+        """
+        if not self._lock.acquire(blocking=False):
+            self.skipped.inc()
+            return fn(*args, **kwargs)
+        try:
+            sample_dir = os.path.join(self.output_dir, datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+                                      + f"_{uuid.uuid4().hex[:8]}")
+            try:
+                os.makedirs(sample_dir, exist_ok=True)
+            except OSError as e:
+                logger.error(f"Falha ao criar a pasta de profiling {sample_dir}: {e}")
+                self.skipped.inc()
+                return fn(*args, **kwargs)
+            tf_trace = self.tf_trace and self._start_tf_trace(os.path.join(sample_dir, "tf_trace"))
+            profiler = cProfile.Profile()
+            error = None
+            started = time.perf_counter()
+            profiler.enable()
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                error = repr(e)
+                raise
+            finally:
+                profiler.disable()
+                duration_ms = (time.perf_counter() - started) * 1000
+                if tf_trace:
+                    self._stop_tf_trace()
+                self._write(sample_dir, profiler, {**metadata, "duration_ms": duration_ms, "error": error,
+                                                   "tf_trace": bool(tf_trace), "sample_rate": self.sample_rate})
+        finally:
+            self._lock.release()
+
+    def _start_tf_trace(self, logdir: str) -> bool:
+        import tensorflow as tf
+        try:
+            tf.profiler.experimental.start(logdir)
+            return True
+        except Exception as e:
+            logger.warning(f"Não foi possível iniciar o trace do TensorFlow: {e}")
+            return False
+
+    def _stop_tf_trace(self) -> None:
+        import tensorflow as tf
+        try:
+            tf.profiler.experimental.stop()
+        except Exception as e:
+            logger.warning(f"Não foi possível encerrar o trace do TensorFlow: {e}")
+
+    def _write(self, sample_dir: str, profiler: cProfile.Profile, metadata: Dict) -> None:
+        # Falhas ao gravar a amostra nunca afetam a resposta da requisição
+        try:
+            profiler.dump_stats(os.path.join(sample_dir, "profile.prof"))
+            summary = io.StringIO()
+            pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCTIONS)
+            with open(os.path.join(sample_dir, "profile.txt"), "w") as f:
+                f.write(summary.getvalue())
+            metadata = {"id": os.path.basename(sample_dir),
+                        "timestamp": int(datetime.now(timezone.utc).timestamp()), **metadata}
+            with open(os.path.join(sample_dir, "metadata.json"), "w") as f:
+                json.dump(metadata, f, indent=2, default=str)
+            self.captured.inc()
+            self.recent = (self.recent + [{**metadata, "path": sample_dir}])[-10:]
+            self._prune()
+            logger.info(f"Profiling da requisição gravado em {sample_dir} ({metadata['duration_ms']:.1f}ms).")
+        except Exception as e:
+            logger.error(f"Falha ao gravar o profiling em {sample_dir}: {e}")
+
+    def _prune(self) -> None:
+        """
+        Apaga as amostras mais antigas além de `max_samples`. Só conta como amostra uma pasta
+        com `metadata.json` (outras pastas em `output_dir` nunca são apagadas), e a ordem é a
+        da gravação desse arquivo.
+        """
+        samples = []
+        for entry in os.scandir(self.output_dir):
+            metadata_path = os.path.join(entry.path, "metadata.json")
+            if entry.is_dir() and os.path.isfile(metadata_path):
+                samples.append((os.stat(metadata_path).st_mtime_ns, entry.path))
+        samples.sort()
+        for _, path in samples[:max(0, len(samples) - self.max_samples)]:
+            shutil.rmtree(path, ignore_errors=True)
+
+    def status(self) -> Dict:
+        """Configuração atual e as últimas amostras gravadas."""
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "tf_trace": self.tf_trace,
+            "output_dir": os.path.abspath(self.output_dir),
+            "max_samples": self.max_samples,
+            "captured": int(self.captured.value),
+            "skipped": int(self.skipped.value),
+            "recent": self.recent,
+        }
+
+
+def request_metadata(endpoint: str, owner: str, n_texts: int, models: Dict) -> Dict:
+    """Dados da requisição gravados junto do profile (sem o texto, que pode ser sensível)."""
+    return {
+        "endpoint": endpoint,
+        "owner": owner,
+        "n_texts": n_texts,
+        "models": {name: getattr(model, "model_version", None) for name, model in models.items()},
+    }
+
+
+PROFILER = RequestProfiler()
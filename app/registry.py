@@ -0,0 +1,154 @@
+"""
+Registro versionado dos modelos em produção, com troca a quente (hot reload).
+
+Uma nova versão é carregada e aquecida em segundo plano enquanto a versão atual continua
+atendendo. Só então o dicionário de modelos ativos é substituído por um novo (troca
+atômica de referência): requisições em andamento terminam com os modelos que já tinham
+em mãos. A versão anterior de cada modelo fica carregada para um rollback instantâneo.
+"""
+
+import time
+import logging
+import threading
+from typing import Callable, Dict, List, Optional
+
+from app import services
+from intent_classifier import IntentClassifier
+
+logger = logging.getLogger(__name__)
+
+
+class ReloadInProgressError(Exception):
+    """Já existe uma troca de modelo em andamento."""
+
+
+class ModelRegistry:
+    """
+    Guarda os modelos ativos (`models`), a URL de cada um e a versão anterior para rollback.
+
+    Os dicionários de modelos nunca são alterados depois de publicados: cada troca
+    publica um dicionário novo.
+    """
+    def __init__(self):
+        self.models: Dict[str, IntentClassifier] = {}
+        self.urls: Dict[str, str] = {}
+        self.previous: Dict[str, Dict] = {}
+        self.loaded_at: Dict[str, float] = {}
+        self.last_reload: Optional[Dict] = None
+        self._reload_lock = threading.Lock()
+        self._swap_lock = threading.Lock()
+
+    def publish(self, models: Dict[str, IntentClassifier], urls: Dict[str, str]) -> Dict[str, IntentClassifier]:
+        """Publica o conjunto inicial de modelos (startup)."""
+        with self._swap_lock:
+            self.models = dict(models)
+            self.urls = dict(urls)
+            self.previous = {}
+            self.loaded_at = {name: time.time() for name in models}
+        return self.models
+
+    @property
+    def reloading(self) -> bool:
+        return self._reload_lock.locked()
+
+    def begin_reload(self) -> None:
+        """
+        Reserva a próxima troca de modelo, sem bloquear: a rota de reload a reserva antes de
+        responder 202, e a troca em segundo plano (`reload(..., reserved=True)`) a libera.
+
+        :raises ReloadInProgressError: Se outra troca estiver em andamento.
+        """
+        if not self._reload_lock.acquire(blocking=False):
+            raise ReloadInProgressError("Já existe uma troca de modelo em andamento.")
+
+    def reload(self, url: str, warm_up_batch_sizes: List[int],
+               load: Optional[Callable[[str], IntentClassifier]] = None,
+               reserved: bool = False) -> Dict[str, IntentClassifier]:
+        """
+        Carrega e aquece a versão de `url` e a troca pela versão atual do mesmo modelo.
+        Bloqueante: deve rodar fora do event loop.
+
+        :param url: URL do artefato da nova versão (ex.: "entidade/projeto/confusion-clf:v2").
+        :param warm_up_batch_sizes: Tamanhos de batch aquecidos antes da troca.
+        :param load: Função que carrega o modelo (padrão: `services.load_classifier`).
+        :param reserved: Se a troca já foi reservada com `begin_reload`.
+        :return: O novo dicionário de modelos ativos.
+        :raises KeyError: Se o modelo não estiver em produção.
+        :raises ReloadInProgressError: Se outra troca estiver em andamento.
+        """
+        model_name = services.model_name_from_url(url)
+        if not reserved:
+            if model_name not in self.models:
+                raise KeyError(model_name)
+            self.begin_reload()
+        try:
+            if model_name not in self.models:
+                raise KeyError(model_name)
+            started = time.perf_counter()
+            self.last_reload = {"model": model_name, "url": url, "status": "loading", "error": None}
+            try:
+                new_model = (load or services.load_classifier)(url)
+                self.last_reload["status"] = "warming_up"
+                # Aquece junto com os demais modelos, pelo mesmo caminho das requisições (encoder
+                # compartilhado); o tempo fica nas fases do próprio modelo, não no warm-up do startup
+                if services.WARM_UP_ENABLED:
+                    warm_up = services.warm_up_classifiers({**self.models, model_name: new_model},
+                                                           warm_up_batch_sizes, record=False)
+                    new_model.load_timings["warm_up"] = sum(warm_up.values())
+                models = self._swap(model_name, new_model, url)
+                services.record_load_timings(model_name, new_model.load_timings)
+                self.last_reload.update(status="done", seconds=time.perf_counter() - started)
+                logger.info(f"Modelo '{model_name}' trocado para {url} em {self.last_reload['seconds']:.2f}s.")
+                return models
+            except Exception as e:
+                self.last_reload.update(status="failed", error=str(e))
+                logger.error(f"Falha ao trocar o modelo '{model_name}' para {url}: {e}")
+                raise
+        finally:
+            self._reload_lock.release()
+
+    def rollback(self, model_name: str) -> Dict[str, IntentClassifier]:
+        """
+        Volta instantaneamente para a versão anterior de `model_name` (a versão atual
+        passa a ser a "anterior", permitindo desfazer o rollback).
+
+        :raises KeyError: Se não houver versão anterior desse modelo.
+        """
+        previous = self.previous.get(model_name)
+        if previous is None:
+            raise KeyError(model_name)
+        started = time.perf_counter()
+        models = self._swap(model_name, previous["model"], previous["url"])
+        # Mesmo registro de um reload: /stats e /admin/models passam a descrever a versão restaurada
+        services.record_load_timings(model_name, getattr(previous["model"], "load_timings", {}))
+        self.last_reload = {"model": model_name, "url": previous["url"], "status": "done", "error": None,
+                            "rollback": True, "seconds": time.perf_counter() - started}
+        logger.info(f"Rollback do modelo '{model_name}' para {previous['url']}.")
+        return models
+
+    def _swap(self, model_name: str, model: IntentClassifier, url: str) -> Dict[str, IntentClassifier]:
+        with self._swap_lock:
+            self.previous[model_name] = {"model": self.models[model_name], "url": self.urls.get(model_name)}
+            # Mantém a ordem dos modelos (ordem das respostas)
+            self.models = {name: model if name == model_name else current for name, current in self.models.items()}
+            self.urls = {**self.urls, model_name: url}
+            self.loaded_at[model_name] = time.time()
+        # O cache de predições não é limpo: as chaves levam a versão do modelo, e limpar o
+        # prefixo do modelo no Redis compartilhado apagaria as entradas das outras réplicas
+        return self.models
+
+    def status(self) -> Dict:
+        """URL, versão (hash) e horário de carga de cada modelo ativo e da sua versão anterior."""
+        def describe(model, url):
+            return {"url": url, "model_version": getattr(model, "model_version", None)}
+        return {
+            "models": {
+                name: {**describe(model, self.urls.get(name)),
+                       "loaded_at": self.loaded_at.get(name),
+                       "previous": describe(self.previous[name]["model"], self.previous[name]["url"])
+                                   if name in self.previous else None}
+                for name, model in self.models.items()
+            },
+            "reloading": self.reloading,
+            "last_reload": self.last_reload,
+        }
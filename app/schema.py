@@ -13,8 +13,12 @@ Eles são usados diretamente pelo FastAPI para:
     em JSON formatado para o cliente.
 """
 
-from pydantic import BaseModel
-from typing import Dict, Optional
+import os
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
+
+# Número máximo de textos aceitos numa única chamada de /predict/batch
+BATCH_MAX_TEXTS = int(os.getenv("BATCH_MAX_TEXTS", 256))
 
 class SinglePrediction(BaseModel):
     top_intent: str
@@ -25,4 +29,17 @@ class PredictionResponse(BaseModel):
     text: str
     owner: str
     predictions: Dict[str, SinglePrediction]
-    timestamp: int
\ No newline at end of file
+    timestamp: int
+
+class BatchPredictionRequest(BaseModel):
+    texts: List[str] = Field(..., min_length=1, max_length=BATCH_MAX_TEXTS)
+    compact: bool = Field(False, description="Se True, responde com os códigos e a matriz de probabilidades de cada modelo")
+    top_k: Optional[int] = Field(None, ge=1, description="Com `compact`, lista também as k intenções mais prováveis de cada texto")
+
+class ModelReloadRequest(BaseModel):
+    url: str = Field(..., description="URL do artefato da nova versão (ex.: entidade/projeto/confusion-clf:v2)")
+    wait: bool = Field(False, description="Se True, responde só depois da troca (ou da falha)")
+
+class ProfilingConfigRequest(BaseModel):
+    sample_rate: Optional[float] = Field(None, ge=0, le=1, description="Fração das predições perfiladas (0 desativa)")
+    tf_trace: Optional[bool] = Field(None, description="Grava também o trace do profiler do TensorFlow")
@@ -1,35 +1,399 @@
-from typing import Dict
+import os
+import csv
+import glob
+import time
+from typing import Callable, Dict, List, Optional, Tuple, Union
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
-from intent_classifier import IntentClassifier
-from db.engine import log_prediction
+import numpy as np
+from intent_classifier import IntentClassifier, BatchPredictions, group_by_encoder, predict_with_shared_encoder
+from db.engine import log_prediction, log_predictions
 from app.schema import SinglePrediction, PredictionResponse
+from app.cache import create_prediction_cache, make_key
+from app.metrics import REGISTRY, Histogram
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Quando "true", modelos que usam o mesmo sentence encoder calculam o embedding uma única vez
+SHARED_ENCODER = os.getenv("SHARED_ENCODER", "true").lower() == "true"
+
+# Cache de resultados por modelo, versão do modelo e texto pré-processado (ver app/cache.py)
+PREDICTION_CACHE = create_prediction_cache()
+
+# Número de modelos carregados em paralelo no startup (0 = todos ao mesmo tempo)
+MODEL_LOAD_WORKERS = int(os.getenv("MODEL_LOAD_WORKERS", 0))
+# Warm-up: textos de exemplo passam por todos os modelos antes do app ficar pronto,
+# para que o traçado dos grafos do TensorFlow não recaia sobre as primeiras requisições
+WARM_UP_ENABLED = os.getenv("WARM_UP_ENABLED", "true").lower() == "true"
+# Arquivos CSV (coluna "utterance") com os textos usados no warm-up
+WARM_UP_DATA = os.getenv("WARM_UP_DATA", os.path.join(
+    os.path.dirname(__file__), "..", "intent_classifier", "data", "test_data", "*.csv"))
+# Tamanhos de batch aquecidos (ex.: "1,8,32"); vazio = tamanhos usados pelo servidor
+WARM_UP_BATCH_SIZES = os.getenv("WARM_UP_BATCH_SIZES", "")
+WARM_UP_TEXT = "olá, tudo bem?"
+# Quando "true", carrega o SavedModel de serving exportado junto do modelo (se houver)
+# em vez do modelo Keras: sobe mais rápido e não reconstrói as camadas de treino
+PREFER_SERVING_ARTIFACT = os.getenv("PREFER_SERVING_ARTIFACT", "true").lower() == "true"
+# Cabeça quantizada (TFLite) usada por modelo, ex.: "confusion-clf=int8,clair-clf=dynamic" (ver
+# `IntentClassifier.export_quantized_head`); modelos fora da lista usam a cabeça em float32
+QUANTIZED_HEADS = dict(item.split("=", 1) for item in os.getenv("QUANTIZED_HEADS", "").replace(" ", "").split(",") if item)
+# Fração das predições executadas estágio a estágio para medir "preprocess" e "encode" em
+# `model_stage_seconds`; as demais usam a chamada única (mais rápida) e só reportam "inference"
+STAGE_TIMING_SAMPLE_RATE = float(os.getenv("STAGE_TIMING_SAMPLE_RATE", 0.01))
+
+# Tempo (s) de cada fase do startup: download e deserialize por modelo, e warm_up por tamanho de batch
+LOAD_TIMINGS: Dict[str, Dict[str, float]] = {}
+
+
+def stage_seconds(stage: str) -> Histogram:
+    """Histograma de um estágio da requisição: "auth", "cache", "inference", "format" ou "log"."""
+    return REGISTRY.histogram("prediction_stage_seconds", "Tempo de cada estágio de uma predição.",
+                              labels={"stage": stage})
+
+
+def model_stage_observer(model_name: str) -> Callable[[str, float], None]:
+    """
+    Callback para `IntentClassifier.stage_observer`: registra o tempo de cada estágio do
+    modelo ("preprocess", "encode", "inference", "format") em `model_stage_seconds`.
+    "preprocess" e "encode" só aparecem nas predições amostradas (STAGE_TIMING_SAMPLE_RATE).
+    """
+    def observe(stage: str, seconds: float) -> None:
+        REGISTRY.histogram("model_stage_seconds", "Tempo de cada estágio da inferência, por modelo.",
+                           labels={"model": model_name, "stage": stage}).observe(seconds)
+    return observe
+
+
+def record_load_timings(model_name: str, timings: Dict[str, float]) -> None:
+    """Guarda o tempo (s) de cada fase do carregamento de um modelo no /stats e no /metrics."""
+    LOAD_TIMINGS[model_name] = dict(timings)
+    for phase, seconds in timings.items():
+        REGISTRY.gauge("model_load_seconds", "Tempo de cada fase do carregamento do modelo ativo.",
+                       labels={"model": model_name, "phase": phase}).set(seconds)
+
+
+def load_classifier(url: str) -> IntentClassifier:
+    """
+    Baixa e desserializa um único modelo, registrando o tempo de cada fase
+    em `model.load_timings`.
+    """
+    model_name = model_name_from_url(url)
+    model = IntentClassifier.for_inference(url, prefer_serving=PREFER_SERVING_ARTIFACT,
+                                           quantization=QUANTIZED_HEADS.get(model_name))
+    model.stage_observer = model_stage_observer(model_name)
+    model.stage_sample_rate = STAGE_TIMING_SAMPLE_RATE
+    return model
+
+
+def model_name_from_url(url: str) -> str:
+    """Nome do modelo a partir da URL do artefato (ex.: "entidade/projeto/confusion-clf:v2" -> "confusion-clf")."""
+    return url.split('/')[-1].split(':')[0]
+
+
+def load_warm_up_texts(pattern: Optional[str] = None) -> List[str]:
+    """
+    Lê os textos (coluna "utterance") dos arquivos CSV de `pattern` (padrão WARM_UP_DATA).
+    Sem arquivos, usa um único texto fixo.
+    """
+    texts = []
+    for path in sorted(glob.glob(pattern or WARM_UP_DATA)):
+        with open(path, newline="", encoding="utf-8") as f:
+            texts += [row["utterance"] for row in csv.DictReader(f) if row.get("utterance")]
+    return texts or [WARM_UP_TEXT]
+
+
+def warm_up_classifiers(
+    models: Dict[str, IntentClassifier],
+    batch_sizes: List[int],
+    texts: Optional[List[str]] = None,
+    record: bool = True
+) -> Dict[str, float]:
+    """
+    Executa os modelos com textos representativos em cada tamanho de batch, pelo
+    mesmo caminho das requisições (incluindo o encoder compartilhado, mas sem o cache
+    de predições), para traçar os grafos antes do app ficar pronto.
+
+    Retorna o tempo (s) gasto em cada tamanho de batch. Com `record` (warm-up do startup),
+    também o grava em LOAD_TIMINGS["warm_up"] e em `model_warm_up_seconds`.
+    """
+    texts = texts or load_warm_up_texts()
+    timings = {}
+    for batch_size in batch_sizes:
+        # Repete os textos se houver menos exemplos do que o tamanho do batch
+        batch = [texts[i % len(texts)] for i in range(batch_size)]
+        started = time.perf_counter()
+        # Um texto isolado segue o caminho do /predict (str); os demais, o de listas
+        _run_models(batch[0] if batch_size == 1 else batch, models)
+        timings[f"batch_{batch_size}"] = time.perf_counter() - started
+        if record:
+            REGISTRY.gauge("model_warm_up_seconds", "Tempo do warm-up de todos os modelos, por tamanho de batch.",
+                           labels={"batch_size": batch_size}).set(timings[f"batch_{batch_size}"])
+        logger.info(f"Warm-up com batch de {batch_size} texto(s) em {timings[f'batch_{batch_size}']:.2f}s.")
+    if record:
+        LOAD_TIMINGS["warm_up"] = timings
+    return timings
+
+
 # services.py
-def load_all_classifiers(models_to_load_str) -> dict:
+def load_all_classifiers(models_to_load_str, max_workers: Optional[int] = None) -> dict:
     """
     Carrega todos os modelos de ML especificados na variável de ambiente
     WANDB_MODELS a partir do registro do Weights & Biases.
+
+    Os modelos são carregados em paralelo (até `max_workers` ao mesmo tempo, padrão
+    MODEL_LOAD_WORKERS). Modelos com o mesmo sentence encoder compartilham uma única
+    cópia dele, que é baixada e desserializada uma única vez.
     """
     MODELS = {}
     model_urls = [url.strip() for url in models_to_load_str.split(',') if url.strip()]
-    logger.info(f"Carregando {len(model_urls)} modelo(s) do W&B...")
-    for url in model_urls:
-        try:
+    if not model_urls:
+        return MODELS
+    max_workers = max_workers or MODEL_LOAD_WORKERS or len(model_urls)
+    logger.info(f"Carregando {len(model_urls)} modelo(s) do W&B ({max_workers} em paralelo)...")
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="model-loader") as pool:
+        futures = {url: pool.submit(load_classifier, url) for url in model_urls}
+        # Mantém a ordem das URLs, que define a ordem dos modelos nas respostas
+        for url, future in futures.items():
             # 2. Extrair o nome do modelo da URL
-            model_name = url.split('/')[-1].split(':')[0]
-            # 3. Carregar o modelo usando o IntentClassifier
-            logger.info(f"Carregando modelo: '{model_name}' (de {url})")
-            MODELS[model_name] = IntentClassifier(load_model=url)
-            logger.info(f"Modelo '{model_name}' carregado com sucesso.")
-        except Exception as e:
-            logger.error(f"Falha ao carregar o modelo de '{url}': {e}")
-            # Parar a inicialização do app se falhar ao carregar um modelo.
-            raise Exception(f"Falha ao carregar o modelo de '{url}': {e}")
+            model_name = model_name_from_url(url)
+            try:
+                # 3. Carregar o modelo usando o IntentClassifier
+                MODELS[model_name] = future.result()
+            except Exception as e:
+                logger.error(f"Falha ao carregar o modelo de '{url}': {e}")
+                for pending in futures.values():
+                    pending.cancel()
+                # Parar a inicialização do app se falhar ao carregar um modelo.
+                raise Exception(f"Falha ao carregar o modelo de '{url}': {e}")
+            record_load_timings(model_name, MODELS[model_name].load_timings)
+            timings = ", ".join(f"{phase}={seconds:.2f}s" for phase, seconds in LOAD_TIMINGS[model_name].items())
+            logger.info(f"Modelo '{model_name}' carregado com sucesso ({timings}).")
+    LOAD_TIMINGS["total"] = {"wall_clock": time.perf_counter() - started}
+    # O cache de predições não é limpo aqui: as chaves levam a versão do modelo, e limpar o
+    # prefixo do Redis compartilhado a cada startup apagaria as entradas das outras réplicas
+    logger.info(f"{len(MODELS)} modelo(s) carregados em {LOAD_TIMINGS['total']['wall_clock']:.2f}s.")
     return MODELS
 
+def predict_intents(
+    input_text: Union[str, List[str]],
+    models: Dict[str, IntentClassifier]
+) -> Union[Dict[str, SinglePrediction], List[Dict[str, SinglePrediction]]]:
+    """
+    Executa todos os modelos sobre um texto ou uma lista de textos.
+    Com SHARED_ENCODER ativo, os modelos que compartilham o mesmo `embedding_model`
+    reutilizam um único embedding e rodam apenas a sua "cabeça" de classificação.
+    Textos já respondidos por todos os modelos (mesma versão e mesmo texto
+    pré-processado) saem do PREDICTION_CACHE, sem inferência.
+
+    Retorna um dict {modelo: SinglePrediction} para um texto, ou uma lista desses
+    dicts (um por texto, na mesma ordem) para uma lista de textos.
+    """
+    original_input_is_string = isinstance(input_text, str)
+    texts = [input_text] if original_input_is_string else list(input_text)
+    cache_keys = _cache_keys(texts, models) if PREDICTION_CACHE.enabled else None
+    if cache_keys is None:
+        return _run_models(input_text, models)
+    keys, preprocessed = cache_keys
+
+    with stage_seconds("cache").time():
+        cached = PREDICTION_CACHE.get_many([key for row in keys for key in row.values()])
+    missing = [i for i, row in enumerate(keys) if any(key not in cached for key in row.values())]
+    missing_rows = set(missing)
+    hits = [i for i in range(len(texts)) if i not in missing_rows]
+    PREDICTION_CACHE.hits.inc(len(hits))
+    PREDICTION_CACHE.misses.inc(len(missing))
+
+    predictions = [{} for _ in texts]
+    if hits:
+        with stage_seconds("format").time():
+            for model_name, model in models.items():
+                batch = BatchPredictions(model.codes, _cached_probs(cached, keys, hits, model_name, len(model.codes)))
+                for i, (top_intent, all_probs) in zip(hits, batch.rows()):
+                    predictions[i][model_name] = SinglePrediction.model_construct(top_intent=top_intent,
+                                                                                  all_probs=all_probs)
+    if missing:
+        fresh = _run_models(input_text if original_input_is_string else [texts[i] for i in missing], models,
+                            _select_rows(preprocessed, missing))
+        fresh = [fresh] if original_input_is_string else fresh
+        for i, row in zip(missing, fresh):
+            predictions[i] = row
+        PREDICTION_CACHE.set_many({
+            keys[i][model_name]: [predictions[i][model_name].all_probs[code] for code in model.codes]
+            for i in missing for model_name, model in models.items()
+        })
+    return predictions[0] if original_input_is_string else predictions
+
+
+def _cached_probs(cached: Dict[str, np.ndarray], keys: List[Dict[str, str]], rows: List[int],
+                  model_name: str, n_codes: int) -> np.ndarray:
+    """A matriz de probabilidades de `model_name` nas linhas `rows`, lida das entradas do cache."""
+    probs = np.empty((len(rows), n_codes), dtype=np.float32)
+    for j, i in enumerate(rows):
+        probs[j] = cached[keys[i][model_name]]
+    return probs
+
+
+def _cache_keys(
+    texts: List[str],
+    models: Dict[str, IntentClassifier]
+) -> Optional[Tuple[List[Dict[str, str]], Dict[str, List[str]]]]:
+    """
+    Chaves do cache de cada texto para cada modelo, a partir da saída do pré-processamento,
+    e os textos pré-processados por modelo (repassados à inferência dos textos fora do cache,
+    para não pré-processá-los de novo).
+    Retorna None se algum modelo não tiver versão (ex.: treinado no próprio processo).
+    """
+    versions = {name: getattr(model, "model_version", None) for name, model in models.items()}
+    if not models or not all(isinstance(version, str) for version in versions.values()):
+        return None
+    preprocessed = {name: [t.decode("utf-8") for t in model.preprocess_batch(texts).numpy()]
+                    for name, model in models.items()}
+    keys = [{name: make_key(name, versions[name], preprocessed[name][i]) for name in models}
+            for i in range(len(texts))]
+    return keys, preprocessed
+
+
+def _select_rows(preprocessed: Dict[str, List[str]], rows: List[int]) -> Dict[str, List[str]]:
+    """Os textos pré-processados das linhas `rows`, por modelo."""
+    return {name: [texts[i] for i in rows] for name, texts in preprocessed.items()}
+
+
+def _select_models(preprocessed: Dict[str, List[str]], names: List[str]) -> Dict[str, List[str]]:
+    """Os textos pré-processados dos modelos `names`."""
+    return {name: preprocessed[name] for name in names}
+
+
+def _run_models(
+    input_text: Union[str, List[str]],
+    models: Dict[str, IntentClassifier],
+    preprocessed: Optional[Dict[str, List[str]]] = None
+) -> Union[Dict[str, SinglePrediction], List[Dict[str, SinglePrediction]]]:
+    """
+    Executa a inferência de todos os modelos (sem cache). `preprocessed` traz, por modelo,
+    os textos já pré-processados (ver `_cache_keys`).
+    """
+    original_input_is_string = isinstance(input_text, str)
+    raw_predictions = {}
+    with stage_seconds("inference").time():
+        for group in _encoder_groups(models):
+            if len(group) > 1:
+                raw_predictions.update(predict_with_shared_encoder(
+                    {name: models[name] for name in group}, input_text,
+                    preprocessed=None if preprocessed is None else _select_models(preprocessed, group)))
+            elif preprocessed is None:
+                raw_predictions[group[0]] = models[group[0]].predict(input_text)
+            else:
+                texts = preprocessed[group[0]]
+                raw_predictions[group[0]] = models[group[0]].predict(texts[0] if original_input_is_string else texts,
+                                                                     preprocessed=True)
+
+    if original_input_is_string:
+        raw_predictions = {model_name: [raw] for model_name, raw in raw_predictions.items()}
+    n_texts = 1 if original_input_is_string else len(input_text)
+    # Mantém a ordem original dos modelos na resposta
+    # Os tipos já vêm garantidos pelo classificador: `model_construct` pula a validação do Pydantic
+    with stage_seconds("format").time():
+        predictions = [
+            {model_name: SinglePrediction.model_construct(top_intent=raw_predictions[model_name][i][0],
+                                                          all_probs=raw_predictions[model_name][i][1])
+             for model_name in models}
+            for i in range(n_texts)
+        ]
+    return predictions[0] if original_input_is_string else predictions
+
+
+def _encoder_groups(models: Dict[str, IntentClassifier]) -> List[List[str]]:
+    """Grupos de modelos que compartilham o sentence encoder (um grupo por modelo se SHARED_ENCODER estiver desligado)."""
+    if SHARED_ENCODER and len(models) > 1:
+        return group_by_encoder(models)
+    return [[model_name] for model_name in models]
+
+
+def predict_intents_compact(texts: List[str], models: Dict[str, IntentClassifier]) -> Dict[str, BatchPredictions]:
+    """
+    Versão compacta de `predict_intents` para lotes: devolve, por modelo, um
+    `BatchPredictions` (códigos + matriz de probabilidades), sem montar um dict por texto.
+    Textos já respondidos saem do PREDICTION_CACHE, como em `predict_intents`.
+    """
+    texts = list(texts)
+    cache_keys = _cache_keys(texts, models) if PREDICTION_CACHE.enabled else None
+    if cache_keys is None:
+        return _run_models_compact(texts, models)
+    keys, preprocessed = cache_keys
+
+    with stage_seconds("cache").time():
+        cached = PREDICTION_CACHE.get_many([key for row in keys for key in row.values()])
+    missing = [i for i, row in enumerate(keys) if any(key not in cached for key in row.values())]
+    PREDICTION_CACHE.hits.inc(len(texts) - len(missing))
+    PREDICTION_CACHE.misses.inc(len(missing))
+    fresh = {}
+    if missing:
+        fresh = _run_models_compact([texts[i] for i in missing], models, _select_rows(preprocessed, missing))
+
+    results = {}
+    missing_rows = set(missing)
+    hits = [i for i in range(len(texts)) if i not in missing_rows]
+    for model_name, model in models.items():
+        codes = list(model.codes)
+        probs = np.empty((len(texts), len(codes)), dtype=np.float32)
+        if hits:
+            probs[hits] = _cached_probs(cached, keys, hits, model_name, len(codes))
+        if missing:
+            probs[missing] = fresh[model_name].probs
+        results[model_name] = BatchPredictions(codes, probs)
+    if missing:
+        # O cache guarda as linhas da matriz de probabilidades: nenhum dict por texto
+        PREDICTION_CACHE.set_many({keys[i][model_name]: batch.probs[j]
+                                   for model_name, batch in fresh.items() for j, i in enumerate(missing)})
+    return results
+
+
+def _run_models_compact(texts: List[str], models: Dict[str, IntentClassifier],
+                        preprocessed: Optional[Dict[str, List[str]]] = None) -> Dict[str, BatchPredictions]:
+    """Executa a inferência compacta de todos os modelos (sem cache); `preprocessed` como em `_run_models`."""
+    predictions = {}
+    with stage_seconds("inference").time():
+        for group in _encoder_groups(models):
+            if len(group) > 1:
+                predictions.update(predict_with_shared_encoder(
+                    {name: models[name] for name in group}, texts, compact=True,
+                    preprocessed=None if preprocessed is None else _select_models(preprocessed, group)))
+            elif preprocessed is None:
+                predictions[group[0]] = models[group[0]].predict_batch(texts)
+            else:
+                predictions[group[0]] = models[group[0]].predict_batch(preprocessed[group[0]], preprocessed=True)
+    # Mantém a ordem original dos modelos na resposta
+    return {model_name: predictions[model_name] for model_name in models}
+
+
+def log_intent(text: str, owner: str, predictions: Dict[str, SinglePrediction]) -> Dict:
+    """
+    Formata o documento de log de uma predição, salva no banco de dados
+    e retorna o resultado final formatado.
+    """
+    # Formata o documento de log (Lógica de Dados)
+    with stage_seconds("format").time():
+        log_document = PredictionResponse(text=text, 
+                                          owner=owner, 
+                                          predictions=predictions, 
+                                          timestamp=int(datetime.now(timezone.utc).timestamp()))
+    # Salva no BD (Lógica de Persistência) usando a engine.py
+    with stage_seconds("log").time():
+        final_result = log_prediction(log_document)
+    count_predictions(owner, predictions, 1)
+
+    if final_result and "_id" in final_result:
+        final_result["_id"] = str(final_result["_id"])
+    return final_result
+
+
+def count_predictions(owner: str, predictions: Dict[str, SinglePrediction], n_texts: int) -> None:
+    """Conta os textos classificados por modelo e por dono do token."""
+    for model_name in predictions:
+        REGISTRY.counter("predictions_total", "Textos classificados, por modelo e dono do token.",
+                         labels={"model": model_name, "owner": owner}).inc(n_texts)
+
 
 def predict_and_log_intent(
     text: str, 
@@ -43,19 +407,80 @@ def predict_and_log_intent(
     4. Retorna o resultado final formatado.
     """
     # 1. Executa predições (Lógica de ML)
-    predictions = {}
-    for model_name, model in models.items():
-        top_intent, all_probs = model.predict(text)
-        predictions[model_name] = SinglePrediction(top_intent=top_intent, all_probs=all_probs)
-    # 2. Formata o documento de log (Lógica de Dados)
-    log_document = PredictionResponse(text=text, 
-                                      owner=owner, 
-                                      predictions=predictions, 
-                                      timestamp=int(datetime.now(timezone.utc).timestamp()))
+    predictions = predict_intents(text, models)
+    # 2-4. Formata, salva no BD e retorna o resultado final
+    return log_intent(text, owner, predictions)
+
+
+def predict_and_log_intents(
+    texts: List[str],
+    owner: str,
+    models: Dict[str, IntentClassifier]
+) -> List[Dict]:
+    """
+    Versão em lote de `predict_and_log_intent`:
+    1. Executa as predições de ML com uma única chamada vetorizada por modelo.
+    2. Formata um documento de log por texto.
+    3. Salva todos os documentos com um único `insert_many`.
+    4. Retorna os resultados na mesma ordem dos textos.
+    """
+    # 1. Executa predições (Lógica de ML)
+    predictions = predict_intents(list(texts), models)
+    # 2. Formata os documentos de log (Lógica de Dados)
+    timestamp = int(datetime.now(timezone.utc).timestamp())
+    with stage_seconds("format").time():
+        log_documents = [PredictionResponse(text=text,
+                                            owner=owner,
+                                            predictions=text_predictions,
+                                            timestamp=timestamp)
+                         for text, text_predictions in zip(texts, predictions)]
     # 3. Salva no BD (Lógica de Persistência) usando a engine.py
-    final_result = log_prediction(log_document)
+    with stage_seconds("log").time():
+        final_results = log_predictions(log_documents)
+    if predictions:
+        count_predictions(owner, predictions[0], len(predictions))
 
-    if final_result and "_id" in final_result:
-        final_result["_id"] = str(final_result["_id"])
-    # 4. Retorna o resultado final formatado
-    return final_result
\ No newline at end of file
+    for final_result in final_results:
+        if "_id" in final_result:
+            final_result["_id"] = str(final_result["_id"])
+    # 4. Retorna os resultados finais formatados
+    return final_results
+
+
+def predict_and_log_intents_compact(
+    texts: List[str],
+    owner: str,
+    models: Dict[str, IntentClassifier],
+    top_k: Optional[int] = None
+) -> Dict:
+    """
+    Versão compacta de `predict_and_log_intents`: a resposta traz, por modelo, a lista de
+    códigos, a intenção principal de cada texto e a matriz de probabilidades (e as `top_k`
+    intenções de cada texto, se pedido), em vez de um `PredictionResponse` por texto.
+
+    Só a resposta é compacta: o log no BD tem um documento por texto com o mesmo schema de
+    `predict_and_log_intents` (o `model_dump` de um `PredictionResponse`, lido por ex. pelo
+    `view/streamlit_app.py`), montado direto da matriz, sem passar pelo Pydantic.
+    """
+    predictions = predict_intents_compact(texts, models)
+    timestamp = int(datetime.now(timezone.utc).timestamp())
+    with stage_seconds("format").time():
+        rows = {model_name: batch.rows() for model_name, batch in predictions.items()}
+        log_documents = [
+            {"id": None, "text": text, "owner": owner,
+             "predictions": {model_name: {"top_intent": rows[model_name][i][0], "all_probs": rows[model_name][i][1]}
+                             for model_name in predictions},
+             "timestamp": timestamp}
+            for i, text in enumerate(texts)
+        ]
+    with stage_seconds("log").time():
+        final_results = log_predictions(log_documents)
+    count_predictions(owner, predictions, len(texts))
+
+    with stage_seconds("format").time():
+        return {
+            "owner": owner,
+            "timestamp": timestamp,
+            "ids": [final_result.get("id") for final_result in final_results],
+            "predictions": {model_name: batch.to_dict(top_k) for model_name, batch in predictions.items()},
+        }
@@ -0,0 +1,97 @@
+"""
+Benchmark do tempo de importação (e da memória inicial) dos módulos da API.
+
+Cada repetição roda num processo Python novo, como um worker do uvicorn, e mede:
+- o tempo de `import <módulo>`;
+- o RSS máximo do processo depois do import;
+- quais dependências pesadas de treino foram carregadas.
+
+Uso:
+```bash
+python benchmarks/import_time.py run --module=app.app --repeat=3
+python benchmarks/import_time.py run --max_seconds=15 --output=import_time.json
+```
+Sai com código 1 se uma dependência proibida for importada ou se a mediana passar de `max_seconds`.
+"""
+
+import os
+import sys
+import json
+import statistics
+import subprocess
+from typing import Dict, List, Optional, Sequence
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+# Dependências que só os caminhos de treino, validação cruzada e W&B devem carregar.
+# (pandas e sklearn ficam de fora: o próprio Keras os importa quando estão instalados.)
+FORBIDDEN_MODULES = ("wandb", "tensorflow_text")
+
+_PROBE = """
+import sys, json, time, resource
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+print(json.dumps({{"seconds": elapsed, "max_rss_mb": rss_mb,
+                  "loaded": [m for m in {watched!r} if m in sys.modules]}}))
+"""
+
+
+def measure_import(module: str = "app.app",
+                   watched: Sequence[str] = ("pandas", "sklearn", "wandb", "tensorflow_text")) -> Dict:
+    """
+    Importa `module` num processo novo e devolve o tempo (s), o RSS máximo (MB)
+    e quais dos módulos `watched` foram carregados.
+    """
+    env = {**os.environ, "TF_CPP_MIN_LOG_LEVEL": os.environ.get("TF_CPP_MIN_LOG_LEVEL", "3")}
+    code = _PROBE.format(module=module, watched=tuple(watched))
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT_DIR, env=env,
+                            capture_output=True, text=True, check=True)
+    # A última linha é o JSON; o resto é log das bibliotecas
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def run(module: str = "app.app", repeat: int = 3,
+        max_seconds: Optional[float] = None,
+        forbid: Sequence[str] = FORBIDDEN_MODULES,
+        output: Optional[str] = None) -> None:
+    """
+    Mede o import de `module` `repeat` vezes e imprime um resumo em JSON.
+
+    :param module: Módulo importado (padrão: a aplicação FastAPI).
+    :param repeat: Número de processos medidos.
+    :param max_seconds: Limite para a mediana do tempo de import (opcional).
+    :param forbid: Módulos que não podem ser carregados pelo import.
+    :param output: Arquivo onde o resumo em JSON também é gravado (opcional).
+    """
+    samples: List[Dict] = [measure_import(module) for _ in range(repeat)]
+    seconds = [s["seconds"] for s in samples]
+    loaded = sorted({m for s in samples for m in s["loaded"]})
+    summary = {
+        "module": module,
+        "repeat": repeat,
+        "seconds_median": statistics.median(seconds),
+        "seconds_min": min(seconds),
+        "max_rss_mb_median": statistics.median(s["max_rss_mb"] for s in samples),
+        "loaded": loaded,
+        "forbidden_loaded": [m for m in loaded if m in forbid],
+    }
+    print(json.dumps(summary, indent=2))
+    if output:
+        with open(output, "w") as f:
+            json.dump(summary, f, indent=2)
+
+    failed = bool(summary["forbidden_loaded"])
+    if max_seconds is not None and summary["seconds_median"] > max_seconds:
+        print(f"Import de {module} levou {summary['seconds_median']:.2f}s (limite: {max_seconds}s).")
+        failed = True
+    if summary["forbidden_loaded"]:
+        print(f"Import de {module} carregou dependências de treino: {summary['forbidden_loaded']}.")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    import fire
+    fire.Fire({"run": run}, serialize=False)
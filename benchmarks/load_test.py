@@ -0,0 +1,369 @@
+"""
+Teste de carga do /predict e do /predict/batch: reproduz um corpus de textos contra o app
+FastAPI, variando a concorrência e o tamanho do lote, e mede vazão, latência
+(p50/p95/p99) e memória de cada cenário.
+
+Modos:
+- `inprocess`: requisições ASGI direto no app (httpx + ASGITransport), sem rede;
+- `http`: requisições HTTP reais, contra um uvicorn iniciado aqui (porta livre) ou contra
+  um servidor já rodando (`--url`, nesse caso a memória não é medida).
+
+Nos modos com o app local, o MongoDB é substituído por uma coleção em memória e a
+autenticação roda em modo dev. Os modelos são os substitutos offline de
+`benchmarks/stand_in.py` (`--models=stand_in`) ou os do ambiente, como no app (`--models=env`).
+
+Uso:
+```bash
+python benchmarks/load_test.py run --mode=inprocess --concurrency=1,4,16 --batch_size=1,8 --requests=200
+python benchmarks/load_test.py run --mode=http --models=env --output=load_test.json
+python benchmarks/load_test.py run --baseline=benchmarks/baselines/load_test.json --update_baseline
+python benchmarks/load_test.py run --baseline=benchmarks/baselines/load_test.json --tolerance=0.2
+```
+Com `--baseline`, sai com código 1 se algum cenário piorar mais que `tolerance` (p95 maior
+ou vazão menor) em relação à baseline gravada.
+"""
+
+import os
+import sys
+import csv
+import glob
+import json
+import time
+import socket
+import asyncio
+import resource
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Union
+from unittest import mock
+
+import numpy as np
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT_DIR)
+
+import httpx
+
+from benchmarks.stand_in import InMemoryCollection, save_stand_in_encoder, make_stand_in_classifiers
+from intent_classifier import DATA_DIR
+
+CORPUS_DATA = os.path.join(DATA_DIR, "*_intents.yml")
+CORPUS_TEST_DATA = os.path.join(DATA_DIR, "test_data", "*.csv")
+
+
+def build_corpus(data: Optional[str] = CORPUS_DATA, test_data: Optional[str] = CORPUS_TEST_DATA,
+                 jsonl: Optional[str] = None) -> List[str]:
+    """
+    Junta os textos do corpus: exemplos dos arquivos YAML de `data`, a coluna "utterance"
+    dos CSVs de `test_data` e o campo "text" (ou "texts") de cada linha dos arquivos JSONL de `jsonl`.
+    """
+    import yaml
+    texts = []
+    for path in sorted(glob.glob(data)) if data else []:
+        with open(path, "r") as f:
+            texts += [str(example) for intent in yaml.safe_load(f) for example in intent["examples"]]
+    for path in sorted(glob.glob(test_data)) if test_data else []:
+        with open(path, newline="", encoding="utf-8") as f:
+            texts += [row["utterance"] for row in csv.DictReader(f) if row.get("utterance")]
+    for path in sorted(glob.glob(jsonl)) if jsonl else []:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    row = json.loads(line)
+                    texts += [row["text"]] if "text" in row else list(row.get("texts", []))
+    if not texts:
+        raise ValueError("O corpus está vazio.")
+    return texts
+
+
+def load_models(models: str = "stand_in") -> Dict:
+    """Modelos do benchmark: `stand_in` (offline) ou `env` (mesmas URLs e carregamento do app)."""
+    from app import services
+    if models == "stand_in":
+        encoder_path = save_stand_in_encoder(os.path.join(tempfile.gettempdir(), "intent_stand_in_encoder"))
+        return make_stand_in_classifiers(encoder_path)
+    if models == "env":
+        from app.app import get_model_urls
+        return services.load_all_classifiers(get_model_urls())
+    raise ValueError(f"Modelos desconhecidos: '{models}' (use 'stand_in' ou 'env').")
+
+
+@contextmanager
+def local_app(models: Dict, mongo_latency_ms: float = 0.0, cache: bool = False) -> Iterator:
+    """
+    Prepara o app para o benchmark: os modelos dados no lugar dos do W&B, o MongoDB em
+    memória, a autenticação em modo dev e, sem `cache`, o cache de predições desativado
+    (o corpus se repete, então o cache mediria só acertos).
+    """
+    from app import app as app_module
+    from app import services
+    from app.cache import PredictionCache
+    collection = InMemoryCollection(latency_ms=mongo_latency_ms)
+    urls = ",".join(f"benchmark/benchmark/{name}:v0" for name in models)
+    patches = [
+        mock.patch.object(app_module, "get_model_urls", lambda: urls),
+        mock.patch.object(services, "load_all_classifiers", lambda *args, **kwargs: dict(models)),
+        mock.patch("db.engine.get_mongo_collection", lambda name: collection),
+        mock.patch("db.auth.ENV", "dev"),
+        mock.patch.object(app_module, "ENV", "dev"),
+    ]
+    if not cache:
+        patches.append(mock.patch.object(services, "PREDICTION_CACHE", PredictionCache(None)))
+    for patch in patches:
+        patch.start()
+    try:
+        yield app_module.app
+    finally:
+        for patch in reversed(patches):
+            patch.stop()
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    return float(np.percentile(values, q)) if len(values) else 0.0
+
+
+def memory_mb() -> Dict[str, float]:
+    """RSS atual e máximo do processo, em MB (o atual só no Linux)."""
+    rss = None
+    try:
+        with open("/proc/self/statm") as f:
+            rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+    except (OSError, ValueError):
+        pass
+    return {"rss_mb": rss, "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+
+
+async def run_scenario(client: httpx.AsyncClient, corpus: List[str], concurrency: int,
+                       batch_size: int, n_requests: int) -> Dict:
+    """
+    Dispara `n_requests` requisições com `concurrency` clientes em laço fechado (cada um
+    espera a resposta antes de enviar a próxima). Com `batch_size` 1 usa o /predict;
+    acima disso, o /predict/batch com `batch_size` textos por requisição.
+    """
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    next_request = iter(range(n_requests))
+
+    async def send(i: int) -> None:
+        start = (i * batch_size) % len(corpus)
+        texts = (corpus * (batch_size // len(corpus) + 2))[start:start + batch_size]
+        started = time.perf_counter()
+        try:
+            if batch_size == 1:
+                response = await client.post("/predict", params={"text": texts[0]})
+            else:
+                response = await client.post("/predict/batch", json={"texts": texts})
+            status = str(response.status_code)
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        if status == "200":
+            latencies.append(time.perf_counter() - started)
+        else:
+            errors[status] = errors.get(status, 0) + 1
+
+    async def worker() -> None:
+        for i in next_request:
+            await send(i)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    seconds = time.perf_counter() - started
+    latencies_ms = [latency * 1000 for latency in latencies]
+    return {
+        "concurrency": concurrency,
+        "batch_size": batch_size,
+        "requests": n_requests,
+        "errors": errors,
+        "seconds": seconds,
+        "requests_per_second": len(latencies) / seconds,
+        "texts_per_second": len(latencies) * batch_size / seconds,
+        "latency_ms": {
+            "p50": percentile(latencies_ms, 50),
+            "p95": percentile(latencies_ms, 95),
+            "p99": percentile(latencies_ms, 99),
+            "mean": float(np.mean(latencies_ms)) if latencies_ms else 0.0,
+            "max": max(latencies_ms, default=0.0),
+        },
+    }
+
+
+async def sweep(client: httpx.AsyncClient, corpus: List[str], concurrencies: Sequence[int],
+                batch_sizes: Sequence[int], n_requests: int, measure_memory: bool = True) -> List[Dict]:
+    """Roda todos os cenários (concorrência x tamanho do lote), cada um depois de um breve aquecimento."""
+    results = []
+    for batch_size in batch_sizes:
+        for concurrency in concurrencies:
+            await run_scenario(client, corpus, concurrency, batch_size, n_requests=2 * concurrency)
+            result = await run_scenario(client, corpus, concurrency, batch_size, n_requests)
+            if measure_memory:
+                result["memory"] = memory_mb()
+            results.append(result)
+            print(format_result(result))
+    return results
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextmanager
+def serve_in_thread(app, port: int, timeout: float = 120.0) -> Iterator[str]:
+    """Sobe o app num uvicorn (em uma thread) e devolve a URL base quando o /ready responde 200."""
+    import uvicorn
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + timeout
+    try:
+        while True:
+            try:
+                if httpx.get(f"{base_url}/ready").status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if time.monotonic() > deadline or not thread.is_alive():
+                raise RuntimeError(f"O servidor não ficou pronto em {timeout}s.")
+            time.sleep(0.1)
+        yield base_url
+    finally:
+        server.should_exit = True
+        thread.join(timeout=30)
+
+
+def benchmark(mode: str = "inprocess", url: Optional[str] = None, models: str = "stand_in",
+              concurrency: Sequence[int] = (1, 4, 16), batch_size: Sequence[int] = (1, 8),
+              requests: int = 200, corpus: Optional[List[str]] = None, cache: bool = False,
+              mongo_latency_ms: float = 0.0) -> Dict:
+    """
+    Roda a varredura num dos modos e devolve o relatório (ver `run`).
+    """
+    corpus = corpus or build_corpus()
+    timeout = httpx.Timeout(60.0)
+    limits = httpx.Limits(max_connections=max(concurrency))
+
+    if mode == "http" and url:
+        async def against_url():
+            async with httpx.AsyncClient(base_url=url, timeout=timeout, limits=limits) as client:
+                return await sweep(client, corpus, concurrency, batch_size, requests, measure_memory=False)
+        results = asyncio.run(against_url())
+    elif mode in ("inprocess", "http"):
+        with local_app(load_models(models), mongo_latency_ms=mongo_latency_ms, cache=cache) as app:
+            if mode == "inprocess":
+                async def in_process():
+                    async with app.router.lifespan_context(app):
+                        transport = httpx.ASGITransport(app=app)
+                        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark",
+                                                     timeout=timeout) as client:
+                            return await sweep(client, corpus, concurrency, batch_size, requests)
+                results = asyncio.run(in_process())
+            else:
+                with serve_in_thread(app, _free_port()) as base_url:
+                    async def over_http():
+                        async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+                            return await sweep(client, corpus, concurrency, batch_size, requests)
+                    results = asyncio.run(over_http())
+    else:
+        raise ValueError(f"Modo desconhecido: '{mode}' (use 'inprocess' ou 'http').")
+
+    for result in results:
+        result["mode"] = mode
+    return {"mode": mode, "url": url, "models": models if not url else None, "cache": cache,
+            "corpus_size": len(corpus), "results": results}
+
+
+def scenario_key(result: Dict) -> str:
+    return f"{result['mode']}:c{result['concurrency']}:b{result['batch_size']}"
+
+
+def find_regressions(results: List[Dict], baseline: Dict, tolerance: float = 0.2) -> List[str]:
+    """
+    Compara cada cenário com o mesmo cenário da baseline: é regressão um p95 acima de
+    `(1 + tolerance)` vezes o da baseline ou uma vazão (textos/s) abaixo de `(1 - tolerance)` vezes.
+    """
+    baseline_results = {scenario_key(r): r for r in baseline.get("results", [])}
+    regressions = []
+    for result in results:
+        base = baseline_results.get(scenario_key(result))
+        if base is None:
+            continue
+        p95, base_p95 = result["latency_ms"]["p95"], base["latency_ms"]["p95"]
+        if p95 > base_p95 * (1 + tolerance):
+            regressions.append(f"{scenario_key(result)}: p95 {p95:.1f}ms (baseline {base_p95:.1f}ms)")
+        throughput, base_throughput = result["texts_per_second"], base["texts_per_second"]
+        if throughput < base_throughput * (1 - tolerance):
+            regressions.append(f"{scenario_key(result)}: {throughput:.1f} textos/s (baseline {base_throughput:.1f})")
+        if result["errors"] and not base["errors"]:
+            regressions.append(f"{scenario_key(result)}: erros {result['errors']}")
+    return regressions
+
+
+def format_result(result: Dict) -> str:
+    latency = result["latency_ms"]
+    memory = result.get("memory") or {}
+    rss = f" rss={memory['rss_mb']:.0f}MB" if memory.get("rss_mb") is not None else ""
+    return (f"c={result['concurrency']:<3} batch={result['batch_size']:<3} "
+            f"{result['requests_per_second']:8.1f} req/s {result['texts_per_second']:8.1f} textos/s "
+            f"p50={latency['p50']:.1f}ms p95={latency['p95']:.1f}ms p99={latency['p99']:.1f}ms"
+            f"{rss} erros={sum(result['errors'].values())}")
+
+
+def _as_ints(values: Union[int, str, Sequence]) -> List[int]:
+    if isinstance(values, str):
+        values = values.split(",")
+    elif isinstance(values, int):
+        values = [values]
+    return [int(v) for v in values]
+
+
+def run(mode: str = "inprocess", url: Optional[str] = None, models: str = "stand_in",
+        concurrency: Union[str, Sequence[int]] = "1,4,16", batch_size: Union[str, Sequence[int]] = "1,8",
+        requests: int = 200, corpus: Optional[str] = None, cache: bool = False,
+        mongo_latency_ms: float = 0.0, output: Optional[str] = None,
+        baseline: Optional[str] = None, update_baseline: bool = False, tolerance: float = 0.2) -> None:
+    """
+    Roda o teste de carga e imprime uma linha por cenário.
+
+    :param mode: "inprocess" (ASGI, sem rede) ou "http" (uvicorn local ou `url`).
+    :param url: URL de um servidor já rodando (modo http).
+    :param models: "stand_in" (offline) ou "env" (modelos do ambiente, como no app).
+    :param concurrency: Números de clientes simultâneos (ex.: "1,4,16").
+    :param batch_size: Textos por requisição (1 = /predict; acima disso, /predict/batch).
+    :param requests: Requisições medidas por cenário.
+    :param corpus: Arquivos JSONL (campo "text" ou "texts") somados aos exemplos e dados de teste.
+    :param cache: Mantém o cache de predições ativo.
+    :param mongo_latency_ms: Latência simulada de cada escrita no MongoDB em memória.
+    :param output: Arquivo onde o relatório em JSON é gravado (opcional).
+    :param baseline: Arquivo de baseline para detectar regressões.
+    :param update_baseline: Grava o resultado como a nova baseline (em vez de comparar).
+    :param tolerance: Piora relativa tolerada antes de acusar regressão.
+    """
+    report = benchmark(mode=mode, url=url, models=models, concurrency=_as_ints(concurrency),
+                       batch_size=_as_ints(batch_size), requests=requests,
+                       corpus=build_corpus(jsonl=corpus) if corpus else None,
+                       cache=cache, mongo_latency_ms=mongo_latency_ms)
+    if output:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+    if not baseline:
+        return
+    if update_baseline or not os.path.exists(baseline):
+        os.makedirs(os.path.dirname(os.path.abspath(baseline)), exist_ok=True)
+        with open(baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline gravada em {baseline}.")
+        return
+    with open(baseline) as f:
+        regressions = find_regressions(report["results"], json.load(f), tolerance)
+    for regression in regressions:
+        print(f"Regressão: {regression}")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    import fire
+    fire.Fire({"run": run}, serialize=False)
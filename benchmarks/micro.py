@@ -0,0 +1,213 @@
+"""
+Micro-benchmarks dos caminhos quentes do `IntentClassifier`, para saber onde o tempo de
+uma predição é gasto:
+
+- `preprocess_text` (um texto por vez) vs `preprocess_batch` (lote inteiro);
+- `model.predict` e o caminho rápido (`predict`) com lotes de 1 a 256 textos;
+- o pós-processamento que monta o `probs_dict` de cada linha e a saída compacta
+  (`BatchPredictions`, com argmax e top-k sobre a matriz inteira) do `predict_batch`;
+- o `/predict/batch` de ponta a ponta, sem o HTTP (inferência de todos os modelos,
+  formatação e log num MongoDB em memória), por texto e compacto, com e sem cache;
+- a criação do `OneHotEncoder` do treino;
+- `tf.keras.models.load_model` e o `for_inference` com o SavedModel de serving.
+
+Roda offline, com o encoder substituto de `benchmarks/stand_in.py`, e grava o resultado em
+JSON (mediana, mínimo e p95 em ms de cada medida) para acompanhar regressões entre commits.
+
+Uso:
+```bash
+python benchmarks/micro.py run --output=micro.json
+python benchmarks/micro.py run --batch_sizes=1,32,256 --repeat=50
+python benchmarks/micro.py run --baseline=benchmarks/baselines/micro.json --update_baseline
+python benchmarks/micro.py run --baseline=benchmarks/baselines/micro.json --tolerance=0.25
+```
+Com `--baseline`, sai com código 1 se a mediana de alguma medida piorar mais que `tolerance`.
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import tempfile
+import subprocess
+from contextlib import ExitStack
+from unittest import mock
+from typing import Callable, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT_DIR)
+
+import tensorflow as tf
+
+from benchmarks.stand_in import InMemoryCollection, save_stand_in_encoder, make_stand_in_classifiers
+from benchmarks.load_test import build_corpus
+from intent_classifier import IntentClassifier, BatchPredictions
+
+DEFAULT_BATCH_SIZES = (1, 8, 32, 128, 256)
+
+
+def measure(fn: Callable[[], object], repeat: int = 20, warm_up: int = 1) -> Dict[str, float]:
+    """Roda `fn` `warm_up` vezes sem medir e depois `repeat` vezes; devolve mediana, mínimo e p95 em ms."""
+    for _ in range(warm_up):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return {"median_ms": float(np.median(samples)), "min_ms": float(np.min(samples)),
+            "p95_ms": float(np.percentile(samples, 95)), "repeat": repeat}
+
+
+def _texts(corpus: List[str], n: int) -> List[str]:
+    return (corpus * (n // len(corpus) + 1))[:n]
+
+
+def endpoint_benchmarks(models: Dict[str, IntentClassifier], texts: List[str],
+                        repeat: int = 20) -> Dict[str, Dict[str, float]]:
+    """
+    Mede o `/predict/batch` sem o HTTP: `predict_and_log_intents` (um `PredictionResponse`
+    por texto) e `predict_and_log_intents_compact`, com o MongoDB em memória e o log síncrono.
+    Sem cache, e com todos os textos já no cache (sufixo `_cached`).
+    """
+    from app import services
+    from app.cache import PredictionCache, LocalLRUBackend
+    results = {}
+    for cached in (False, True):
+        with ExitStack() as stack:
+            stack.enter_context(mock.patch("db.engine.get_mongo_collection", lambda name: InMemoryCollection()))
+            stack.enter_context(mock.patch("db.engine._log_writer", None))
+            backend = LocalLRUBackend(max_bytes=64 * 1024 * 1024) if cached else None
+            stack.enter_context(mock.patch.object(services, "PREDICTION_CACHE", PredictionCache(backend)))
+            if cached:
+                # Os modelos do stand-in não têm versão (e sem versão não há cache)
+                for name, model in models.items():
+                    stack.enter_context(mock.patch.object(model, "model_version", f"stand-in-{name}"))
+            suffix = "_cached" if cached else ""
+            results[f"predict_and_log{suffix}[{len(texts)}]"] = measure(
+                lambda: services.predict_and_log_intents(texts, "benchmark", models), repeat)
+            results[f"predict_and_log_compact{suffix}[{len(texts)}]"] = measure(
+                lambda: services.predict_and_log_intents_compact(texts, "benchmark", models), repeat)
+    return results
+
+
+def benchmark(batch_sizes: Sequence[int] = DEFAULT_BATCH_SIZES, repeat: int = 20,
+              work_dir: Optional[str] = None) -> Dict[str, Dict[str, float]]:
+    """
+    Roda todos os micro-benchmarks e devolve `{nome: estatísticas}`. Os nomes com lote
+    terminam em `[<tamanho>]` (ex.: "model_predict[32]").
+    """
+    work_dir = work_dir or tempfile.mkdtemp(prefix="intent_micro_")
+    encoder_path = save_stand_in_encoder(os.path.join(work_dir, "encoder"))
+    classifiers = make_stand_in_classifiers(encoder_path)
+    classifier = next(iter(classifiers.values()))
+    classifier.wandb_project = None
+    corpus = build_corpus()
+    results = {}
+
+    for batch_size in batch_sizes:
+        texts = _texts(corpus, batch_size)
+        text_tensors = [tf.constant(t) for t in texts]
+        results[f"preprocess_text_scalar[{batch_size}]"] = measure(
+            lambda: [classifier.preprocess_text(t) for t in text_tensors], repeat)
+        results[f"preprocess_batch[{batch_size}]"] = measure(lambda: classifier.preprocess_batch(texts), repeat)
+
+        preprocessed = classifier.preprocess_batch(texts)
+        results[f"model_predict[{batch_size}]"] = measure(
+            lambda: classifier.model.predict(preprocessed, verbose=0), repeat)
+        results[f"predict_fast[{batch_size}]"] = measure(lambda: classifier.predict(texts), repeat)
+
+        probs = np.random.default_rng(0).dirichlet(np.ones(len(classifier.codes)), size=batch_size).astype(np.float32)
+        results[f"postprocess[{batch_size}]"] = measure(lambda: classifier._format_predictions(probs), repeat)
+        results[f"postprocess_compact[{batch_size}]"] = measure(
+            lambda: BatchPredictions(classifier.codes, probs).to_dict(top_k=3), repeat)
+        results[f"predict_batch[{batch_size}]"] = measure(lambda: classifier.predict_batch(texts), repeat)
+        results.update(endpoint_benchmarks(classifiers, texts, repeat))
+
+    results["onehot_encoder_setup"] = measure(classifier._setup_onehot_encoder, repeat)
+
+    model_path = os.path.join(work_dir, "model", "stand_in.keras")
+    classifier.save_model(model_path)
+    # Carregar é lento: menos repetições
+    load_repeat = max(1, repeat // 4)
+    results["keras_load_model"] = measure(lambda: tf.keras.models.load_model(model_path), load_repeat)
+    config_path = model_path.replace(".keras", "_config.yml")
+    results["for_inference_serving"] = measure(
+        lambda: IntentClassifier.for_inference(model_path, config=config_path), load_repeat)
+    return results
+
+
+def find_regressions(results: Dict[str, Dict], baseline: Dict, tolerance: float = 0.25) -> List[str]:
+    """Medidas cuja mediana passou de `(1 + tolerance)` vezes a mediana da baseline."""
+    regressions = []
+    for name, stats in results.items():
+        base = baseline.get("results", {}).get(name)
+        if base and stats["median_ms"] > base["median_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: {stats['median_ms']:.3f}ms (baseline {base['median_ms']:.3f}ms)")
+    return regressions
+
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _as_ints(values: Union[int, str, Sequence]) -> List[int]:
+    if isinstance(values, str):
+        values = values.split(",")
+    elif isinstance(values, int):
+        values = [values]
+    return [int(v) for v in values]
+
+
+def run(batch_sizes: Union[str, Sequence[int]] = DEFAULT_BATCH_SIZES, repeat: int = 20,
+        output: Optional[str] = None, baseline: Optional[str] = None,
+        update_baseline: bool = False, tolerance: float = 0.25) -> None:
+    """
+    Roda os micro-benchmarks e imprime uma linha por medida.
+
+    :param batch_sizes: Tamanhos de lote medidos (ex.: "1,8,32,128,256").
+    :param repeat: Repetições medidas de cada caso.
+    :param output: Arquivo onde o relatório em JSON é gravado (opcional).
+    :param baseline: Arquivo de baseline para detectar regressões.
+    :param update_baseline: Grava o resultado como a nova baseline (em vez de comparar).
+    :param tolerance: Piora relativa da mediana tolerada antes de acusar regressão.
+    """
+    results = benchmark(_as_ints(batch_sizes), repeat)
+    report = {
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "tensorflow": tf.__version__,
+        "machine": platform.machine(),
+        "results": results,
+    }
+    for name, stats in results.items():
+        print(f"{name:<36} median={stats['median_ms']:9.3f}ms min={stats['min_ms']:9.3f}ms p95={stats['p95_ms']:9.3f}ms")
+    if output:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+    if not baseline:
+        return
+    if update_baseline or not os.path.exists(baseline):
+        os.makedirs(os.path.dirname(os.path.abspath(baseline)), exist_ok=True)
+        with open(baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline gravada em {baseline}.")
+        return
+    with open(baseline) as f:
+        regressions = find_regressions(results, json.load(f), tolerance)
+    for regression in regressions:
+        print(f"Regressão: {regression}")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    import fire
+    fire.Fire({"run": run}, serialize=False)
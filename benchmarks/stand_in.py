@@ -0,0 +1,88 @@
+"""
+Substitutos locais para rodar os benchmarks sem rede: um sentence encoder leve (SavedModel),
+classificadores com pesos aleatórios sobre ele e uma coleção do MongoDB em memória.
+
+O encoder substituto só faz o hash das palavras, então é muito mais barato que o USE: os
+números medem o overhead do app e do TensorFlow em volta do encoder, não o encoder em si.
+"""
+
+import os
+import glob
+import time
+import threading
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+import yaml
+import tensorflow as tf
+from bson import ObjectId
+
+from intent_classifier import IntentClassifier, Config, DATA_DIR
+
+# Mesma dimensão dos embeddings do USE multilíngue
+STAND_IN_DIM = 512
+DATA_GLOB = os.path.join(DATA_DIR, "*_intents.yml")
+
+
+class StandInEncoder(tf.Module):
+    """Encoder determinístico: média dos one-hots do hash de cada palavra (zeros para texto vazio)."""
+    def __init__(self, dim: int = STAND_IN_DIM):
+        super().__init__()
+        self.dim = dim
+
+    @tf.function(input_signature=[tf.TensorSpec([None], tf.string)])
+    def __call__(self, texts):
+        words = tf.strings.split(texts)
+        one_hots = tf.one_hot(tf.strings.to_hash_bucket_fast(words, self.dim), self.dim)
+        counts = tf.cast(tf.maximum(words.row_lengths(), 1), tf.float32)
+        return tf.reduce_sum(one_hots, axis=1) / counts[:, tf.newaxis]
+
+
+def save_stand_in_encoder(path: str, dim: int = STAND_IN_DIM) -> str:
+    """Salva o encoder substituto como SavedModel em `path` (usável como `embedding_model`)."""
+    if not os.path.isfile(os.path.join(path, "saved_model.pb")):
+        tf.saved_model.save(StandInEncoder(dim), path)
+    return path
+
+
+def make_stand_in_classifiers(encoder_path: str, data: str = DATA_GLOB) -> Dict[str, IntentClassifier]:
+    """
+    Cria um classificador sem treino (pesos aleatórios) por arquivo de exemplos, com os
+    mesmos códigos e o mesmo nome que o app usaria (ex.: "confusion-clf").
+    """
+    classifiers = {}
+    for path in sorted(glob.glob(data)):
+        with open(path, "r") as f:
+            codes = sorted({intent["intent"] for intent in yaml.safe_load(f)})
+        dataset_name = os.path.basename(path).replace("_intents.yml", "")
+        config = Config(dataset_name=dataset_name, embedding_model=encoder_path, codes=codes)
+        classifier = IntentClassifier(config=config)
+        classifier.model = classifier.make_model(config)
+        classifiers[f"{dataset_name}-clf"] = classifier
+    return classifiers
+
+
+class InMemoryCollection:
+    """
+    Coleção do MongoDB em memória (`insert_one`/`insert_many`), com uma latência
+    opcional por escrita para simular a ida ao banco.
+
+    :param latency_ms: Atraso de cada escrita, em milissegundos.
+    """
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency_ms = latency_ms
+        self.documents: List[dict] = []
+        self._lock = threading.Lock()
+
+    def _write(self, documents: List[dict]) -> List[ObjectId]:
+        if self.latency_ms:
+            time.sleep(self.latency_ms / 1000)
+        with self._lock:
+            self.documents.extend(documents)
+        return [ObjectId() for _ in documents]
+
+    def insert_one(self, document: dict) -> SimpleNamespace:
+        return SimpleNamespace(inserted_id=self._write([document])[0])
+
+    def insert_many(self, documents: List[dict], ordered: Optional[bool] = True) -> SimpleNamespace:
+        return SimpleNamespace(inserted_ids=self._write(list(documents)))
@@ -6,18 +6,128 @@ python db/auth.py create --owner="alguem" --expires_in_days=365
 # Ler todos os tokens
 python db/auth.py read_all
 
+# Desativar ou remover um token (invalida o cache de tokens do app)
+python db/auth.py deactivate --token="..."
+python db/auth.py delete --token="..."
+
 """
 
 import os
 import fire
+import time
 import uuid
+import secrets
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
 from dotenv import load_dotenv
 from datetime import datetime, timedelta
 from db.engine import get_mongo_collection
 from fastapi import Request, HTTPException
+from starlette.concurrency import run_in_threadpool
 
 load_dotenv()
 ENV = os.getenv("ENV", "prod").lower()
+# Token das rotas de administração (/admin/...); sem ele, essas rotas ficam desativadas em prod
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# Cache de tokens: evita um find_one no MongoDB a cada requisição autenticada
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", 1024))
+TOKEN_CACHE_TTL_SECONDS = float(os.getenv("TOKEN_CACHE_TTL_SECONDS", 60))
+TOKEN_CACHE_VERSION_CHECK_SECONDS = float(os.getenv("TOKEN_CACHE_VERSION_CHECK_SECONDS", 5))
+
+# Documento com o "carimbo de versão" dos tokens: incrementado sempre que um token
+# é desativado ou removido, para que os processos do app descartem o seu cache.
+TOKENS_META_COLLECTION = "api_tokens_meta"
+TOKENS_VERSION_ID = "version"
+
+
+class TokenCache:
+    """
+    Cache LRU com TTL para as entradas de token (`owner` e `expires_at`).
+
+    A expiração do token continua sendo verificada a cada requisição; o TTL só
+    limita por quanto tempo uma entrada é reaproveitada sem consultar o MongoDB.
+    O cache inteiro é descartado quando o carimbo de versão dos tokens muda.
+
+    :param max_size: Número máximo de tokens no cache.
+    :param ttl_seconds: Tempo de vida de cada entrada.
+    :param version_check_seconds: Intervalo mínimo entre duas consultas ao carimbo de versão.
+    """
+    def __init__(self, max_size: int = TOKEN_CACHE_SIZE,
+                 ttl_seconds: float = TOKEN_CACHE_TTL_SECONDS,
+                 version_check_seconds: float = TOKEN_CACHE_VERSION_CHECK_SECONDS):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.version_check_seconds = version_check_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._version = None
+        self._version_checked_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[Dict]:
+        with self._lock:
+            item = self._entries.get(token)
+            if item is None:
+                return None
+            entry, cached_at = item
+            if time.monotonic() - cached_at > self.ttl_seconds:
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return entry
+
+    def set(self, token: str, entry: Dict) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[token] = (entry, time.monotonic())
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, token: Optional[str] = None) -> None:
+        """Remove um token do cache, ou todos se `token` for None."""
+        with self._lock:
+            if token is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(token, None)
+
+    def sync_version(self, read_version: Callable[[], Optional[int]]) -> None:
+        """
+        Consulta o carimbo de versão (no máximo uma vez a cada `version_check_seconds`)
+        e esvazia o cache se ele mudou desde a última consulta.
+        """
+        now = time.monotonic()
+        if now - self._version_checked_at < self.version_check_seconds:
+            return
+        version = read_version()
+        with self._lock:
+            if version != self._version:
+                self._entries.clear()
+                self._version = version
+            self._version_checked_at = now
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+TOKEN_CACHE = TokenCache()
+
+
+def read_tokens_version() -> Optional[int]:
+    """Lê o carimbo de versão dos tokens no MongoDB."""
+    doc = get_mongo_collection(TOKENS_META_COLLECTION).find_one({"_id": TOKENS_VERSION_ID})
+    return doc.get("value") if doc else None
+
+
+def bump_tokens_version() -> None:
+    """Incrementa o carimbo de versão dos tokens, invalidando o cache de todos os processos."""
+    get_mongo_collection(TOKENS_META_COLLECTION).update_one(
+        {"_id": TOKENS_VERSION_ID}, {"$inc": {"value": 1}}, upsert=True
+    )
+    TOKEN_CACHE.invalidate()
 
 class TokenManager:
     """
@@ -69,8 +179,33 @@ class TokenManager:
         """
         tokens_collection = get_mongo_collection("api_tokens")
         result = tokens_collection.delete_many({"expires_at": {"$lt": datetime.utcnow()}})
+        bump_tokens_version()
         print(f"🧹 Tokens expirados removidos: {result.deleted_count}")
 
+    def deactivate(self, token: str):
+        """
+        Desativa um token, sem removê-lo da base.
+
+        Args:
+            token (str): O token a ser desativado.
+        """
+        tokens_collection = get_mongo_collection("api_tokens")
+        result = tokens_collection.update_one({"token": token}, {"$set": {"active": False}})
+        bump_tokens_version()
+        print(f"⛔ Tokens desativados: {result.modified_count}")
+
+    def delete(self, token: str):
+        """
+        Remove um token da base.
+
+        Args:
+            token (str): O token a ser removido.
+        """
+        tokens_collection = get_mongo_collection("api_tokens")
+        result = tokens_collection.delete_one({"token": token})
+        bump_tokens_version()
+        print(f"🗑️ Tokens removidos: {result.deleted_count}")
+
 
 
 def verify_token(request: Request):
@@ -79,11 +214,18 @@ def verify_token(request: Request):
         raise HTTPException(status_code=401, detail="Missing Authorization header")
 
     token = token.replace("Bearer ", "")
-    tokens_collection = get_mongo_collection("api_tokens")
-    token_entry = tokens_collection.find_one({"token": token, "active": True})
+    # Descarta o cache se algum token foi desativado/removido em outro processo
+    TOKEN_CACHE.sync_version(read_tokens_version)
+    token_entry = TOKEN_CACHE.get(token)
+    if token_entry is None:
+        tokens_collection = get_mongo_collection("api_tokens")
+        token_entry = tokens_collection.find_one({"token": token, "active": True})
 
-    if not token_entry:
-        raise HTTPException(status_code=403, detail="Invalid or inactive token")
+        if not token_entry:
+            raise HTTPException(status_code=403, detail="Invalid or inactive token")
+
+        token_entry = {"owner": token_entry["owner"], "expires_at": token_entry["expires_at"]}
+        TOKEN_CACHE.set(token, token_entry)
 
     if datetime.utcnow() > token_entry["expires_at"]:
         raise HTTPException(status_code=403, detail="Token expired")
@@ -100,13 +242,28 @@ async def conditional_auth(request: Request):
         return "dev_user"
     else:
         try:
-            return verify_token(request)
+            # verify_token consulta o MongoDB de forma síncrona: roda fora do event loop
+            return await run_in_threadpool(verify_token, request)
         except HTTPException as he:
             raise he
         except Exception as e:
             raise HTTPException(status_code=401, detail="Authentication failed")
 
-            
+
+async def admin_auth(request: Request):
+    """
+    Autorização das rotas de administração: em prod, exige `Authorization: Bearer <ADMIN_TOKEN>`.
+    """
+    if ENV == "dev":
+        return "dev_admin"
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled (ADMIN_TOKEN not set)")
+    token = request.headers.get("Authorization", "").replace("Bearer ", "")
+    if not secrets.compare_digest(token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+    return "admin"
+
+
 if __name__ == "__main__":
     import fire
     fire.Fire(TokenManager)
\ No newline at end of file
@@ -1,7 +1,11 @@
 import os
+import threading
+from typing import Optional
 from dotenv import load_dotenv
+from bson import ObjectId
 from pymongo import MongoClient
 from datetime import datetime, timezone
+from db.log_writer import PredictionLogWriter
 
 load_dotenv()
 
@@ -9,27 +13,123 @@ MONGO_URI = os.getenv("MONGO_URI", None)
 MONGO_DB = os.getenv("MONGO_DB", None)
 ENV = os.getenv("ENV", "prod").lower()
 
-# --- Funções de Coleções ---
+# Configuração do pool de conexões compartilhado pelo processo
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", 50))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", 0))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000))
+MONGO_CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", 5000))
+MONGO_SOCKET_TIMEOUT_MS = int(os.getenv("MONGO_SOCKET_TIMEOUT_MS", 10000))
 
-def get_mongo_collection(collection_name: str):
+# Gravação dos logs de predição: "sync" (insert_one antes da resposta) ou
+# "async" (write-behind: fila em memória + insert_many em segundo plano)
+LOG_WRITE_MODE = os.getenv("LOG_WRITE_MODE", "sync").lower()
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", 10000))
+LOG_FLUSH_SIZE = int(os.getenv("LOG_FLUSH_SIZE", 100))
+LOG_FLUSH_INTERVAL_SECONDS = float(os.getenv("LOG_FLUSH_INTERVAL_SECONDS", 1.0))
+LOG_SPILL_FILE = os.getenv("LOG_SPILL_FILE", "logs/prediction_log_spill.jsonl") or None
+LOG_FLUSH_ON_SHUTDOWN = os.getenv("LOG_FLUSH_ON_SHUTDOWN", "true").lower() == "true"
+
+# --- Cliente compartilhado ---
+
+_client: Optional[MongoClient] = None
+_client_lock = threading.Lock()
+
+def init_mongo_client() -> MongoClient:
+    """
+    Cria (uma única vez) o MongoClient compartilhado pelo processo.
+    O app chama esta função no startup; scripts de linha de comando
+    recebem o cliente de forma preguiçosa em `get_mongo_client`.
+    """
+    global _client
     if MONGO_URI is None or MONGO_DB is None:
         raise ValueError("MONGO_URI and MONGO_DB must be set")
-    
-    client = MongoClient(MONGO_URI)
+    with _client_lock:
+        if _client is None:
+            _client = MongoClient(
+                MONGO_URI,
+                maxPoolSize=MONGO_MAX_POOL_SIZE,
+                minPoolSize=MONGO_MIN_POOL_SIZE,
+                serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+                connectTimeoutMS=MONGO_CONNECT_TIMEOUT_MS,
+                socketTimeoutMS=MONGO_SOCKET_TIMEOUT_MS,
+            )
+        return _client
+
+def get_mongo_client() -> MongoClient:
+    """Retorna o MongoClient compartilhado, criando-o se necessário."""
+    return _client if _client is not None else init_mongo_client()
+
+def close_mongo_client() -> None:
+    """Fecha o MongoClient compartilhado. O app chama esta função no shutdown."""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+# --- Funções de Coleções ---
+
+def get_mongo_collection(collection_name: str):
+    client = get_mongo_client()
     db = client[MONGO_DB]
     return db[collection_name]
 
 # --- Funções de Log de Previsão ---
 
+_log_writer: Optional[PredictionLogWriter] = None
+
+def start_log_writer() -> PredictionLogWriter:
+    """
+    Inicia o writer assíncrono dos logs de predição (LOG_WRITE_MODE="async").
+    O app chama esta função no startup.
+    """
+    global _log_writer
+    if _log_writer is None:
+        _log_writer = PredictionLogWriter(
+            get_collection=lambda: get_mongo_collection(f"{ENV.upper()}_intent_logs"),
+            max_queue=LOG_QUEUE_SIZE,
+            flush_size=LOG_FLUSH_SIZE,
+            flush_interval_seconds=LOG_FLUSH_INTERVAL_SECONDS,
+            spill_file=LOG_SPILL_FILE,
+            flush_on_shutdown=LOG_FLUSH_ON_SHUTDOWN,
+        ).start()
+    return _log_writer
+
+def stop_log_writer() -> None:
+    """Para o writer assíncrono, gravando o que estiver na fila. O app chama esta função no shutdown."""
+    global _log_writer
+    if _log_writer is not None:
+        _log_writer.stop()
+        _log_writer = None
+
+def log_writer_stats() -> dict:
+    """Contadores do writer assíncrono (vazio se ele não estiver ativo)."""
+    return _log_writer.stats() if _log_writer is not None else {}
+
+def _enqueue_predictions(prediction_dicts: list) -> list:
+    """
+    Gera os IDs no cliente e entrega os documentos ao writer assíncrono,
+    de modo que a resposta já sai com o ID definitivo do documento.
+    """
+    for prediction_dict in prediction_dicts:
+        prediction_dict["_id"] = ObjectId()
+        prediction_dict["id"] = str(prediction_dict["_id"])
+        # Uma cópia vai para a fila: o dicionário retornado ainda será formatado para JSON
+        _log_writer.enqueue(dict(prediction_dict))
+    return prediction_dicts
+
 def log_prediction(prediction_data) -> dict:
     """
     Insere um log de predição no banco de dados e retorna o
     documento inserido com o ID formatado para resposta JSON.
+    Com o writer assíncrono ativo, o documento apenas entra na fila de gravação.
     """
-    collection = get_mongo_collection(f"{ENV.upper()}_intent_logs")
-    
     # Converte o modelo Pydantic para um dicionário antes de inserir
     prediction_dict = prediction_data.model_dump()
+    if _log_writer is not None:
+        return _enqueue_predictions([prediction_dict])[0]
+
+    collection = get_mongo_collection(f"{ENV.upper()}_intent_logs")
 
     # Log the prediction to the database
     try:
@@ -43,4 +143,28 @@ def log_prediction(prediction_data) -> dict:
         # If insert_one fails, log the error and continue
         raise Exception(f"Failed to log prediction to database. Error: {e}")
 
-    return prediction_dict
\ No newline at end of file
+    return prediction_dict
+
+def log_predictions(predictions_data: list) -> list:
+    """
+    Insere vários logs de predição com um único `insert_many` e retorna os
+    documentos inseridos com os IDs formatados para resposta JSON.
+    Aceita modelos Pydantic ou documentos já prontos (dicts, ex.: o log compacto).
+    Com o writer assíncrono ativo, os documentos apenas entram na fila de gravação.
+    """
+    prediction_dicts = [prediction_data if isinstance(prediction_data, dict) else prediction_data.model_dump()
+                        for prediction_data in predictions_data]
+    if _log_writer is not None:
+        return _enqueue_predictions(prediction_dicts)
+
+    collection = get_mongo_collection(f"{ENV.upper()}_intent_logs")
+
+    try:
+        result = collection.insert_many(prediction_dicts)
+        for prediction_dict, inserted_id in zip(prediction_dicts, result.inserted_ids):
+            prediction_dict["id"] = str(inserted_id)
+
+    except Exception as e:
+        raise Exception(f"Failed to log predictions to database. Error: {e}")
+
+    return prediction_dicts
\ No newline at end of file
@@ -0,0 +1,196 @@
+"""
+Gravação assíncrona (write-behind) dos logs de predição no MongoDB.
+
+Em vez de um `insert_one` síncrono antes de cada resposta, os documentos vão para
+uma fila em memória e uma thread em segundo plano os grava com `insert_many`,
+sempre que a fila junta `flush_size` documentos ou a cada `flush_interval_seconds`.
+Se o MongoDB estiver fora do ar (ou a fila estiver cheia), os documentos são
+gravados num arquivo JSONL local ("spill") e reenviados quando o banco voltar.
+"""
+
+import json
+import time
+import queue
+import logging
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+class PredictionLogWriter:
+    """
+    Fila limitada + thread que grava os documentos de log em lote.
+
+    :param get_collection: Função sem argumentos que retorna a coleção de destino.
+    :param max_queue: Número máximo de documentos esperando para serem gravados.
+    :param flush_size: Número de documentos que dispara uma gravação.
+    :param flush_interval_seconds: Tempo máximo que um documento espera na fila.
+    :param spill_file: Arquivo JSONL usado quando o MongoDB falha ou a fila enche. None desativa o spill.
+    :param flush_on_shutdown: Se True, `stop` grava tudo o que ainda estiver na fila.
+    """
+    def __init__(self, get_collection: Callable,
+                 max_queue: int = 10000,
+                 flush_size: int = 100,
+                 flush_interval_seconds: float = 1.0,
+                 spill_file: Optional[str] = None,
+                 flush_on_shutdown: bool = True):
+        self.get_collection = get_collection
+        self.flush_size = flush_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self.spill_file = Path(spill_file) if spill_file else None
+        self.flush_on_shutdown = flush_on_shutdown
+        self._queue: "queue.Queue[Dict]" = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._spill_lock = threading.Lock()
+        self._counters = {"written": 0, "dropped": 0, "spilled": 0, "replayed": 0, "failed_flushes": 0}
+        self._counters_lock = threading.Lock()
+
+    # --- Ciclo de vida ---
+
+    def start(self) -> "PredictionLogWriter":
+        """Inicia a thread de gravação (e reenvia o que tiver ficado no arquivo de spill)."""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="prediction-log-writer", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """Para a thread de gravação. Com `flush_on_shutdown`, grava (ou faz spill de) toda a fila antes."""
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+        remaining = self._drain()
+        if remaining:
+            if self.flush_on_shutdown:
+                self._flush(remaining)
+            else:
+                self._count("dropped", len(remaining))
+
+    # --- API pública ---
+
+    def enqueue(self, document: Dict) -> bool:
+        """
+        Coloca um documento na fila sem bloquear.
+        Se a fila estiver cheia, o documento vai para o arquivo de spill (ou é descartado).
+
+        :return: True se o documento entrou na fila.
+        """
+        try:
+            self._queue.put_nowait(document)
+            return True
+        except queue.Full:
+            if not self._spill([document]):
+                self._count("dropped", 1)
+            return False
+
+    def stats(self) -> Dict[str, int]:
+        """Contadores do writer: profundidade da fila e documentos gravados, descartados e em spill."""
+        return {"queue_depth": self._queue.qsize(), **self._counters}
+
+    # --- Implementação ---
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._counters_lock:
+            self._counters[name] += amount
+
+    def _run(self) -> None:
+        self.replay_spill()
+        while not self._stop.is_set():
+            batch = self._next_batch()
+            if batch and self._flush(batch) and self._has_spill():
+                self.replay_spill()
+
+    def _next_batch(self) -> List[Dict]:
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval_seconds)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval_seconds
+        while len(batch) < self.flush_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _drain(self) -> List[Dict]:
+        documents = []
+        while True:
+            try:
+                documents.append(self._queue.get_nowait())
+            except queue.Empty:
+                return documents
+
+    def _insert(self, documents: List[Dict]) -> None:
+        try:
+            self.get_collection().insert_many(documents, ordered=False)
+        except BulkWriteError as e:
+            # Documentos já gravados numa tentativa anterior (mesmo _id) não são erro
+            errors = e.details.get("writeErrors", [])
+            if any(error.get("code") != DUPLICATE_KEY_ERROR for error in errors):
+                raise
+
+    def _flush(self, documents: List[Dict]) -> bool:
+        try:
+            self._insert(documents)
+            self._count("written", len(documents))
+            return True
+        except Exception as e:
+            self._count("failed_flushes", 1)
+            logger.error(f"Falha ao gravar {len(documents)} log(s) de predição no MongoDB: {e}")
+            if not self._spill(documents):
+                self._count("dropped", len(documents))
+            return False
+
+    def _has_spill(self) -> bool:
+        return self.spill_file is not None and self.spill_file.exists()
+
+    def _spill(self, documents: List[Dict]) -> bool:
+        if self.spill_file is None:
+            return False
+        with self._spill_lock:
+            self.spill_file.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.spill_file, "a", encoding="utf-8") as f:
+                for document in documents:
+                    f.write(json.dumps(document, default=str, ensure_ascii=False) + "\n")
+        self._count("spilled", len(documents))
+        return True
+
+    def replay_spill(self) -> int:
+        """
+        Reenvia para o MongoDB os documentos do arquivo de spill e remove o arquivo se der certo.
+
+        :return: O número de documentos reenviados.
+        """
+        if not self._has_spill():
+            return 0
+        with self._spill_lock:
+            with open(self.spill_file, "r", encoding="utf-8") as f:
+                documents = [json.loads(line) for line in f if line.strip()]
+            for document in documents:
+                if "_id" in document:
+                    document["_id"] = ObjectId(document["_id"])
+            try:
+                if documents:
+                    self._insert(documents)
+            except Exception as e:
+                logger.warning(f"MongoDB ainda indisponível, {len(documents)} log(s) continuam em {self.spill_file}: {e}")
+                return 0
+            self.spill_file.unlink()
+        self._count("replayed", len(documents))
+        logger.info(f"{len(documents)} log(s) de predição reenviados a partir de {self.spill_file}.")
+        return len(documents)
@@ -32,46 +32,85 @@ python intent_classifier.py predict \
     --input_text="teste teste" \
     --wandb_project="intent-classifier"
 
+python intent_classifier.py warm_cache \
+    --models="adaj/intent-classifier-2025-2/confusion-clf:v1,adaj/intent-classifier-2025-2/clair-clf:v1"
+
 # TODO: Fix CV implementation...
 python intent_classifier.py cross_validation \
     --config="models/confusion_config.yml" \
     --training_data="data/confusion_intents.yml" \
     --n_splits=5 \
+    --n_jobs=5 \
     --wandb_project="intent-classifier"
 
 """
 # instalar alguns pacotes auxiliares
 
 import os
+import json
+import time
+import random
+import csv
+import glob
+import shutil
+import hashlib
+import multiprocessing
 import logging
+import threading
 from pathlib import Path
-from typing import List, Optional, Union, Tuple, Dict, Any
+from typing import List, Optional, Union, Tuple, Dict, Any, Callable, TYPE_CHECKING
+from datetime import datetime, timezone
 from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor
 import yaml
 from pprint import pprint
 import re
 
-import pandas as pd
 import numpy as np
 
-from sklearn.preprocessing import OneHotEncoder
-from sklearn.model_selection import train_test_split, StratifiedKFold
-from sklearn.metrics import classification_report, cohen_kappa_score
-
 import tensorflow as tf
 from tensorflow.keras import regularizers
-import tensorflow_text
 import tensorflow_hub as hub
 from tensorflow.keras.saving import register_keras_serializable
 
-import wandb
-from wandb.integration.keras import WandbMetricsLogger, WandbEvalCallback # WandbModelCheckpoint
+# Training, cross-validation and W&B dependencies (sklearn, wandb) and tensorflow_text
+# are imported inside the functions that use them, so that serving (`predict`) does
+# not pay for them at import time (guarded by benchmarks/import_time.py).
+if TYPE_CHECKING:
+    from sklearn.preprocessing import OneHotEncoder
 
 import dotenv
 dotenv.load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+# Hub modules already loaded in this process, keyed by URL. Every classifier built on
+# the same sentence encoder reuses a single copy of its graph and weights.
+_HUB_MODULES: Dict[str, Any] = {}
+_HUB_MODULES_LOCK = threading.Lock()
+# One lock per URL: different encoders load concurrently, the same encoder loads once
+_HUB_MODULE_LOCKS: Dict[str, threading.Lock] = {}
+
+def load_hub_module(hub_url: str) -> Any:
+    """
+    Loads a TensorFlow Hub module, reusing the instance already loaded for the same URL.
+
+    :param hub_url: The URL (or local path) of the TensorFlow Hub module.
+    :type hub_url: str
+    :return: The loaded Hub module.
+    :rtype: Any
+    """
+    with _HUB_MODULES_LOCK:
+        url_lock = _HUB_MODULE_LOCKS.setdefault(hub_url, threading.Lock())
+    with url_lock:
+        if hub_url not in _HUB_MODULES:
+            # Registers the SentencePiece ops used by the multilingual USE; must run before hub.load
+            import tensorflow_text  # noqa: F401
+            _HUB_MODULES[hub_url] = hub.load(hub_url)
+        return _HUB_MODULES[hub_url]
+
 @register_keras_serializable()
 class HubLayer(tf.keras.layers.Layer):
     """
@@ -91,7 +130,8 @@ class HubLayer(tf.keras.layers.Layer):
         Initializes the HubLayer.
         """
         super(HubLayer, self).__init__(**kwargs)
-        self.hub_module = hub.load(hub_url)
+        self.hub_url = hub_url
+        self.hub_module = load_hub_module(hub_url)
         self.hub_module.trainable = trainable
 
     def call(self, inputs: tf.Tensor) -> tf.Tensor:
@@ -143,6 +183,10 @@ class Config:
     """Initial learning rate for the optimizer."""
     validation_split: float = 0.2
     """Fraction of the training data to be used as validation data."""
+    cache_embeddings: bool = False
+    """If True, the (frozen) encoder embeds the training texts once and only the dense head is trained."""
+    embedding_cache_dir: Optional[str] = None
+    """Directory where cached embeddings are persisted, keyed by encoder URL. If None, they are kept in memory only."""
 
 def remove_duplicate_words(text: str) -> str:
     """
@@ -165,13 +209,322 @@ def remove_duplicate_words(text: str) -> str:
     return ' '.join(result)
 
 
-def fetch_artifact_from_wandb(model_full_name: str) -> Tuple[str, str]:
+def serving_dir_for(model_file: str) -> str:
+    """
+    Returns where the serving SavedModel of a Keras model file is stored
+    (e.g. "models/confusion-v1.keras" -> "models/confusion-v1_serving").
+
+    :param model_file: Path to the Keras model file.
+    :type model_file: str
+    :rtype: str
+    """
+    return re.sub(r"\.(keras|h5)$", "", str(model_file).rstrip("/")) + "_serving"
+
+
+def serving_model_path(model_file: str) -> Optional[str]:
+    """
+    Returns the serving SavedModel exported next to a Keras model file, if there is one.
+
+    :param model_file: Path to the Keras model file.
+    :type model_file: str
+    :return: The SavedModel directory, or None.
+    :rtype: str or None
+    """
+    serving_dir = serving_dir_for(model_file)
+    return serving_dir if os.path.isfile(os.path.join(serving_dir, "saved_model.pb")) else None
+
+
+# Post-training quantization modes of the classification head (see `IntentClassifier.export_quantized_head`)
+QUANTIZATION_MODES = ("dynamic", "int8", "float16")
+
+
+def quantized_head_path(model_file: str, mode: str) -> str:
+    """
+    Returns where the quantized head of a Keras model file is stored
+    (e.g. "models/confusion-v1.keras", "int8" -> "models/confusion-v1_head_int8.tflite").
+
+    :param model_file: Path to the Keras model file.
+    :type model_file: str
+    :param mode: One of `QUANTIZATION_MODES`.
+    :type mode: str
+    :rtype: str
+    """
+    return re.sub(r"\.(keras|h5)$", "", str(model_file).rstrip("/")) + f"_head_{mode}.tflite"
+
+
+def load_example_texts(paths: Union[str, List[str]]) -> List[str]:
+    """
+    Reads the example utterances of one or more YAML examples files (the `data/*.yml` format).
+
+    :param paths: A glob pattern, a comma-separated list of files, or a list of files.
+    :type paths: str or list[str]
+    :return: The examples, in file order.
+    :rtype: list[str]
+    """
+    if isinstance(paths, str):
+        paths = [match for pattern in paths.split(',') for match in sorted(glob.glob(pattern.strip()))]
+    texts = []
+    for path in paths:
+        with open(path, 'r') as f:
+            for intent in yaml.safe_load(f) or []:
+                texts += [str(example) for example in intent['examples']]
+    return texts
+
+
+class TFLiteHead:
+    """
+    A classification head converted to TensorFlow Lite (see `IntentClassifier.export_quantized_head`),
+    run with the TFLite interpreter. Calls are serialized, since an interpreter is not thread-safe.
+
+    :param path: Path to the `.tflite` file.
+    :type path: str
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.size_bytes = os.path.getsize(path)
+        self._interpreter = tf.lite.Interpreter(model_path=path)
+        self._input = self._interpreter.get_input_details()[0]["index"]
+        output = self._interpreter.get_output_details()[0]
+        self._output, self.n_outputs = output["index"], int(output["shape_signature"][-1])
+        self._batch_size = None
+        self._lock = threading.Lock()
+
+    def __call__(self, embeddings: Union[np.ndarray, tf.Tensor]) -> np.ndarray:
+        """
+        :param embeddings: A 2-D float array of shape (n_texts, embedding_dim).
+        :return: The class probabilities, of shape (n_texts, n_codes).
+        :rtype: np.ndarray
+        """
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if embeddings.shape[0] == 0:
+            return np.zeros((0, self.n_outputs), dtype=np.float32)
+        with self._lock:
+            # Reallocating is only needed when the batch size changes
+            if embeddings.shape[0] != self._batch_size:
+                self._interpreter.resize_tensor_input(self._input, embeddings.shape)
+                self._interpreter.allocate_tensors()
+                self._batch_size = embeddings.shape[0]
+            self._interpreter.set_tensor(self._input, embeddings)
+            self._interpreter.invoke()
+            return self._interpreter.get_tensor(self._output).copy()
+
+
+@dataclass
+class BatchPredictions:
+    """
+    Compact predictions for a batch of texts: the intent codes plus the probability
+    matrix, with the top intents computed over the whole matrix at once. Per-row
+    `(top_intent, all_probabilities)` tuples are only built by `rows`.
+    """
+    codes: List[str]
+    """Intent codes, in the column order of `probs`."""
+    probs: np.ndarray
+    """Class probabilities, of shape (n_texts, n_codes)."""
+
+    def __post_init__(self):
+        self.probs = np.asarray(self.probs).reshape(-1, len(self.codes))
+        self.top_indices = self.probs.argmax(axis=1)
+
+    def __len__(self) -> int:
+        return self.probs.shape[0]
+
+    @property
+    def top_intents(self) -> List[str]:
+        """The most probable intent of each text."""
+        return [self.codes[i] for i in self.top_indices.tolist()]
+
+    def top_k(self, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        The `k` most probable intents of each text, in decreasing order of probability.
+
+        :param k: Number of intents per text (capped at the number of codes).
+        :type k: int
+        :return: The code indices and their probabilities, both of shape (n_texts, k).
+        :rtype: tuple(np.ndarray, np.ndarray)
+        """
+        k = max(1, min(k, len(self.codes)))
+        if k == len(self.codes):
+            indices = np.argsort(-self.probs, axis=1, kind="stable")
+        else:
+            indices = np.argpartition(-self.probs, k - 1, axis=1)[:, :k]
+            order = np.argsort(-np.take_along_axis(self.probs, indices, axis=1), axis=1, kind="stable")
+            indices = np.take_along_axis(indices, order, axis=1)
+        return indices, np.take_along_axis(self.probs, indices, axis=1)
+
+    def rows(self) -> List[Tuple[str, Dict[str, float]]]:
+        """
+        The per-row `(top_intent, all_probabilities)` tuples, as `IntentClassifier.predict` returns them.
+
+        :rtype: list[tuple(str, dict(str, float))]
+        """
+        codes = self.codes
+        return [(top_intent, dict(zip(codes, row)))
+                for top_intent, row in zip(self.top_intents, self.probs.tolist())]
+
+    def to_dict(self, top_k: Optional[int] = None) -> Dict[str, Any]:
+        """
+        A JSON-serializable view: `codes`, `top_intents` and the `probs` matrix as nested
+        lists, plus `top_k` (`{"intents": ..., "probs": ...}`) if requested.
+
+        :param top_k: Number of most probable intents listed per text.
+        :type top_k: int, optional
+        :rtype: dict
+        """
+        result = {"codes": list(self.codes), "top_intents": self.top_intents, "probs": self.probs.tolist()}
+        if top_k:
+            indices, probs = self.top_k(top_k)
+            codes = np.asarray(self.codes, dtype=object)
+            result["top_k"] = {"intents": codes[indices].tolist(), "probs": probs.tolist()}
+        return result
+
+
+def _sha256_file(path: Union[str, Path], chunk_size: int = 1 << 20) -> str:
+    """
+    Computes the SHA-256 checksum of a file.
+
+    :param path: Path to the file.
+    :type path: str or Path
+    :return: The hex digest of the file contents.
+    :rtype: str
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ArtifactCache:
+    """
+    A content-addressed local cache of W&B model artifacts.
+
+    Files are stored once per content hash under `blobs/<sha256>/<file name>`, and each
+    artifact version (`entity/project/name:version`) has a `manifest.json` listing its
+    files and their checksums, plus a `files/` view of hard links to the blobs with the
+    artifact's original layout. A pinned version (e.g. `:v3`) that is already cached is
+    served from disk, with no network call.
+
+    :param root: The cache directory. Defaults to `ARTIFACT_CACHE_DIR` or `models/.artifact_cache`.
+    :type root: str, optional
+    """
+    def __init__(self, root: Optional[str] = None):
+        self.root = Path(root or os.environ.get("ARTIFACT_CACHE_DIR")
+                         or Path(os.path.dirname(__file__)) / "models" / ".artifact_cache")
+
+    @staticmethod
+    def is_pinned(model_full_name: str) -> bool:
+        """
+        Whether the artifact name points to an immutable version (`:v<N>`) rather than
+        a moving alias such as `:latest`.
+
+        :param model_full_name: The W&B artifact full name.
+        :type model_full_name: str
+        :rtype: bool
+        """
+        return re.fullmatch(r"v\d+", model_full_name.rsplit(":", 1)[-1]) is not None
+
+    def _manifest_path(self, model_full_name: str) -> Path:
+        entity, project, name_version = model_full_name.split("/")
+        name, version = name_version.rsplit(":", 1)
+        return self.root / "artifacts" / entity / project / name / version / "manifest.json"
+
+    def get(self, model_full_name: str) -> Optional[Tuple[str, str]]:
+        """
+        Returns the cached model and config files of an artifact, if every file is
+        present and matches its checksum.
+
+        :param model_full_name: The W&B artifact full name.
+        :type model_full_name: str
+        :return: A tuple `(model_file, config_file)`, or None on a cache miss.
+        :rtype: tuple[str, str] or None
+        """
+        manifest_path = self._manifest_path(model_full_name)
+        if not manifest_path.exists():
+            return None
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+        view_dir = manifest_path.parent / "files"
+        for relative_path, checksum in manifest["files"].items():
+            blob = self.root / "blobs" / checksum / Path(relative_path).name
+            if not blob.exists() or _sha256_file(blob) != checksum:
+                logger.warning(f"Cached file '{blob}' of '{model_full_name}' is missing or corrupted.")
+                return None
+            target = view_dir / relative_path
+            if not target.exists() or not os.path.samefile(target, blob):
+                target.parent.mkdir(parents=True, exist_ok=True)
+                tmp_target = target.with_name(target.name + ".tmp")
+                try:
+                    os.link(blob, tmp_target)
+                except OSError:
+                    shutil.copyfile(blob, tmp_target)
+                os.replace(tmp_target, target)
+        return str(view_dir / manifest["model_file"]), str(view_dir / manifest["config_file"])
+
+    def put(self, model_full_name: str, model_file: str, config_file: str,
+            digest: Optional[str] = None) -> Tuple[str, str]:
+        """
+        Stores the files of an artifact in the cache and writes its manifest. The serving
+        SavedModel (see `serving_model_path`) and the quantized heads (see `quantized_head_path`)
+        next to the model file, if any, are stored too.
+
+        :param model_full_name: The W&B artifact full name.
+        :type model_full_name: str
+        :param model_file: Path to the downloaded Keras model file.
+        :type model_file: str
+        :param config_file: Path to the downloaded config file.
+        :type config_file: str
+        :param digest: The W&B artifact digest, recorded in the manifest.
+        :type digest: str, optional
+        :return: A tuple `(model_file, config_file)` pointing to the cached copies.
+        :rtype: tuple[str, str]
+        """
+        paths = {Path(model_file).name: model_file, Path(config_file).name: config_file}
+        serving_dir = serving_model_path(model_file)
+        if serving_dir is not None:
+            for path in Path(serving_dir).rglob("*"):
+                if path.is_file():
+                    paths[f"{Path(serving_dir).name}/{path.relative_to(serving_dir).as_posix()}"] = str(path)
+        for mode in QUANTIZATION_MODES:
+            head_path = quantized_head_path(model_file, mode)
+            if os.path.isfile(head_path):
+                paths[Path(head_path).name] = head_path
+        files = {}
+        for relative_path, path in paths.items():
+            checksum = _sha256_file(path)
+            blob = self.root / "blobs" / checksum / Path(path).name
+            if not blob.exists() or _sha256_file(blob) != checksum:
+                blob.parent.mkdir(parents=True, exist_ok=True)
+                tmp_blob = blob.with_name(blob.name + ".tmp")
+                shutil.copyfile(path, tmp_blob)
+                os.replace(tmp_blob, blob)
+            files[relative_path] = checksum
+        manifest = {
+            "name": model_full_name,
+            "digest": digest,
+            "model_file": Path(model_file).name,
+            "config_file": Path(config_file).name,
+            "files": files,
+            "cached_at": datetime.now(timezone.utc).isoformat(),
+        }
+        manifest_path = self._manifest_path(model_full_name)
+        manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(manifest_path, "w") as f:
+            json.dump(manifest, f, indent=2)
+        return self.get(model_full_name)
+
+
+def fetch_artifact_from_wandb(model_full_name: str, use_cache: bool = True) -> Tuple[str, str]:
     """
     Download a model artifact from W&B and return the paths to the model and config files.
 
+    Downloads are stored in the local `ArtifactCache`. Pinned versions (e.g. `:v1`)
+    already in the cache are returned without contacting W&B.
+
     :param model_full_name: The W&B artifact full name (e.g., "adaj/intent-classifier-2025-2/confusion-clf:v1").
                            Must have format: "entity/project/artifact_name:version"
     :type model_full_name: str
+    :param use_cache: Whether to read from and write to the local artifact cache.
+    :type use_cache: bool, optional
     :return: A tuple containing the local file path to the Keras model file and the config file.
     :rtype: tuple[str, str]
     :raises ValueError: If format is invalid or files are not found in the artifact.
@@ -184,7 +537,16 @@ def fetch_artifact_from_wandb(model_full_name: str) -> Tuple[str, str]:
             f"Expected format: 'entity/project/artifact_name:version' (e.g., 'adaj/intent-classifier-2025-2/confusion-clf:v1')"
         )
     
+    # Pinned versions never change: serve them from the local cache when possible
+    cache = ArtifactCache() if use_cache else None
+    if cache is not None and ArtifactCache.is_pinned(model_full_name):
+        cached = cache.get(model_full_name)
+        if cached is not None:
+            print(f"Loaded artifact '{model_full_name}' from local cache {cache.root}.")
+            return cached
+
     # Download artifact from W&B
+    import wandb
     try:
         api = wandb.Api()
         artifact = api.artifact(model_full_name, type='model')
@@ -211,10 +573,136 @@ def fetch_artifact_from_wandb(model_full_name: str) -> Tuple[str, str]:
         raise ValueError(f"Model file (.keras or .h5) not found in W&B artifact '{model_full_name}'.")
     if not config_file:
         raise ValueError(f"Config file (_config.yml) not found in W&B artifact '{model_full_name}'.")
-        
+
+    if cache is not None:
+        # Cache under the resolved version too, so an alias like ':latest' also warms ':vN'
+        model_file, config_file = cache.put(model_full_name, model_file, config_file, digest=artifact.digest)
+        resolved_name = f"{parts[0]}/{parts[1]}/{parts[2].rsplit(':', 1)[0]}:{artifact.version}"
+        if resolved_name != model_full_name and ArtifactCache.is_pinned(resolved_name):
+            cache.put(resolved_name, model_file, config_file, digest=artifact.digest)
     return model_file, config_file
 
 
+def build_model(config: Config) -> tf.keras.Model:
+    """
+    Builds and returns a new Keras model based on the provided configuration.
+
+    The architecture consists of:
+    1. An input layer for string tensors.
+    2. A `HubLayer` for text embedding.
+    3. A Dense hidden layer with BatchNormalization, ReLU activation, and Dropout.
+    4. A final Dense output layer with softmax activation for classification.
+
+    :param config: The configuration object specifying model hyperparameters.
+    :type config: Config
+    :return: A compiled Keras model.
+    :rtype: tf.keras.Model
+    """
+    # Set the random seed for reproducibility
+    seed = 42
+    tf.random.set_seed(seed)  # Assuming you have a random_seed in your config
+    # Extract config values
+    sent_hl_units, sent_dropout = config.sent_hl_units, config.sent_dropout
+    l1_reg, l2_reg = config.l1_reg, config.l2_reg
+    output_size = len(config.codes)
+    # Build model
+    initializer = tf.keras.initializers.GlorotUniform(seed=seed)  # Set seed in initializer
+    text_input = tf.keras.layers.Input(shape=(), dtype=tf.string, name="inputs")
+    # Sentence encoder
+    encoder = HubLayer(config.embedding_model, trainable=False, name="sent_encoder")(text_input)
+    # Hidden layer
+    sent_hl = tf.keras.layers.Dense(sent_hl_units,
+                                    kernel_initializer=initializer,
+                                    kernel_regularizer=regularizers.l1_l2(l1=l1_reg, l2=l2_reg),
+                                    activation=None,  # No activation here yet
+                                    name='sent_hl')(encoder)
+    sent_hl_norm = tf.keras.layers.BatchNormalization()(sent_hl)  # Add batch normalization
+    sent_hl_activation = tf.keras.layers.Activation('relu')(sent_hl_norm)  # Activation after batch normalization
+    sent_hl_dropout = tf.keras.layers.Dropout(sent_dropout, seed=seed)(sent_hl_activation)  # Set seed in dropout
+    # Output layer
+    sent_output = tf.keras.layers.Dense(output_size,
+                                        kernel_initializer=initializer,
+                                        activation='softmax',
+                                        name="sent_output")(sent_hl_dropout)
+    model = tf.keras.Model(inputs=text_input, outputs=sent_output)
+    return model
+
+
+def compile_model(model: tf.keras.Model) -> tf.keras.Model:
+    """
+    Compiles a model (or its head) with the loss, optimizer and metrics used for training.
+
+    :param model: The Keras model to compile.
+    :type model: tf.keras.Model
+    :return: The compiled model.
+    :rtype: tf.keras.Model
+    """
+    model.compile(
+        loss='categorical_crossentropy',
+        optimizer=tf.keras.optimizers.Adam(), # LR is handled by callback
+        metrics=[tf.keras.metrics.F1Score(average='macro')])
+    return model
+
+
+def make_callbacks(config: Config, wandb_project: Optional[str] = None) -> list:
+    """
+    Constructs a list of Keras callbacks based on the configuration.
+
+    Includes EarlyStopping and WandbMetricsLogger if configured.
+    Also includes an ExponentialDecay learning rate scheduler.
+
+    :param config: The configuration with the callback settings.
+    :type config: Config
+    :param wandb_project: The W&B project; if set, a WandbMetricsLogger is added.
+    :type wandb_project: str, optional
+    :return: A list of Keras Callback instances.
+    :rtype: list
+    """
+    callbacks = []
+    if config.callback_patience > 0:
+        callbacks.append(
+            tf.keras.callbacks.EarlyStopping(monitor='val_f1_score',
+                patience=config.callback_patience,
+                restore_best_weights=True)
+        )
+    if wandb_project:
+        from wandb.integration.keras import WandbMetricsLogger
+        callbacks.append(WandbMetricsLogger())
+    
+    # Configure ExponentialDecay
+    if config.learning_rate is not None and not isinstance(config.learning_rate, str):
+        lr_schedule = tf.keras.optimizers.schedules.ExponentialDecay(
+            initial_learning_rate=config.learning_rate,
+            decay_steps=1000,
+            decay_rate=0.96,
+            staircase=False
+        )
+        
+        # Modified learning rate scheduler to properly handle epoch parameter
+        def lr_scheduler(epoch, lr):
+            """Internal LR scheduler function."""
+            return lr_schedule(epoch).numpy().astype(float)
+        
+        lr_scheduler_callback = tf.keras.callbacks.LearningRateScheduler(lr_scheduler)
+        callbacks.append(lr_scheduler_callback)
+    return callbacks
+
+
+def build_head(model: tf.keras.Model) -> tf.keras.Model:
+    """
+    Returns the classification head of a model built by `IntentClassifier.make_model`
+    (`sent_hl` -> BN -> `sent_output`), i.e. the sub-model that maps sentence embeddings
+    to class probabilities. The head shares its layers (and weights) with `model`.
+
+    :param model: A Keras model with a `sent_encoder` layer.
+    :type model: tf.keras.Model
+    :return: A Keras model that takes embeddings as input.
+    :rtype: tf.keras.Model
+    """
+    encoder = model.get_layer("sent_encoder")
+    return tf.keras.Model(inputs=encoder.output, outputs=model.output)
+
+
 class IntentClassifier:
     """
     A class for training, evaluating, and predicting text intents using a Keras model.
@@ -243,23 +731,13 @@ class IntentClassifier:
         """
         Initializes the IntentClassifier.
         """
-        self.model = None
-        local_model_path = None
+        self._init_inference_state()
         
         # Set up W&B project early
         self.wandb_project = wandb_project or os.environ.get("WANDB_PROJECT") or "intent-classifier"
 
         if load_model:
-            # Check if load_model is a local file path or a W&B artifact URL
-            if os.path.exists(load_model):
-                local_model_path = load_model
-            else:
-                # If not a local path, assume it's a W&B artifact and fetch it.
-                # The associated config path will be discovered and used automatically.
-                local_model_path, config = fetch_artifact_from_wandb(load_model)
-            
-            self.model = tf.keras.models.load_model(local_model_path)
-            print(f"Loaded Keras model from {local_model_path}.")
+            config = self._load_model(load_model, config)
 
         # Load config. If fetched from W&B, `config` is already the correct path.
         self._load_config(config)
@@ -278,6 +756,7 @@ class IntentClassifier:
         # Set up W&B run
         if self.wandb_project:
             print(f"Setting up W&B project: {self.wandb_project}")
+            import wandb
             wandb.login(key=os.environ.get("WANDB_API_KEY"))
             self.wandb_run = wandb.init(project=self.wandb_project, config=self.config.__dict__)
             if self.training_data:
@@ -288,6 +767,128 @@ class IntentClassifier:
             self.wandb_run = None
             print("W&B project not set. No W&B run will be created.")
 
+    @classmethod
+    def for_inference(cls, load_model: str,
+                      config: Optional[Union[str, Config]] = None,
+                      prefer_serving: bool = True,
+                      quantization: Optional[str] = None) -> 'IntentClassifier':
+        """
+        Creates a classifier that can only predict: it loads the model, the codes and
+        the preprocessing settings, but does not log in to W&B, create a run or fit the
+        one-hot encoder used for training.
+
+        A pinned W&B artifact version already in the local `ArtifactCache` is loaded
+        without contacting W&B. If the artifact has a serving SavedModel (see
+        `export_serving_model`), it is loaded instead of the Keras model.
+
+        :param load_model: A path to a saved Keras model (`.keras` file) or a W&B artifact URL.
+        :type load_model: str
+        :param config: A path to a YAML config file or a Config object. Required for local
+                       model files; inferred from the artifact for W&B URLs.
+        :type config: str, Config, optional
+        :param prefer_serving: Whether to load the serving SavedModel when there is one.
+        :type prefer_serving: bool, optional
+        :param quantization: If set (one of `QUANTIZATION_MODES`), runs the classification head
+                             with the quantized head exported next to the model, when there is one.
+        :type quantization: str, optional
+        :return: An inference-only IntentClassifier.
+        :rtype: IntentClassifier
+        """
+        self = cls.__new__(cls)
+        self._init_inference_state()
+        self.wandb_project = None
+        config = self._load_model(load_model, config, prefer_serving=prefer_serving,
+                                  quantization=quantization)
+        self._load_config(config)
+        self._load_intents(None)
+        self._validate_model_config_compatibility()
+        self._load_stop_words(self.config.stop_words_file)
+        return self
+
+    def _init_inference_state(self) -> None:
+        """
+        Sets the attributes shared by `__init__` and `for_inference` (the model and everything
+        loaded with it). New per-instance state used by prediction belongs here, so that both
+        construction paths always have it.
+        """
+        self.model = None
+        # Exported serving SavedModel, when loaded instead of the Keras model
+        self.serving_module = None
+        # Quantized TFLite head, when loaded (see `load_quantized_head`)
+        self.quantized_head = None
+        # Local path of the loaded model file
+        self.model_path: Optional[str] = None
+        # Optional callback `(stage, seconds)` told how long each prediction stage took
+        self.stage_observer: Optional[Callable[[str, float], None]] = None
+        # Fraction of `predict` calls run stage by stage to time "preprocess" and "encode"
+        # separately (slower than the fused call, see `_predict_proba`)
+        self.stage_sample_rate: float = 0.0
+        # Content hash of the loaded model file, plus the variant loaded ("+serving", and the
+        # quantized head's "+<mode>.<hash>"); None for models built in this process
+        self.model_version: Optional[str] = None
+        # `model_version` without the quantized head
+        self._file_version: Optional[str] = None
+        # Seconds spent in each loading phase ("download", "deserialize")
+        self.load_timings: Dict[str, float] = {}
+        # Guards the lazy setup of the preprocessing graph, the head and the serving functions:
+        # the first predictions may come from several threads at once (e.g. the app's executor)
+        self._lazy_init_lock = threading.RLock()
+        # Set up by `__init__` only (training); inference-only instances have neither
+        self.wandb_run = None
+        self.onehot_encoder = None
+
+    def _load_model(self, load_model: str,
+                    config: Optional[Union[str, Config]],
+                    prefer_serving: bool = False,
+                    quantization: Optional[str] = None) -> Optional[Union[str, Config]]:
+        """
+        Loads the Keras model from a local file or a W&B artifact, recording the
+        "download" and "deserialize" times in `self.load_timings`.
+
+        :param load_model: A path to a saved Keras model (`.keras` file) or a W&B artifact URL.
+        :type load_model: str
+        :param config: The config given by the caller.
+        :type config: str, Config, optional
+        :param prefer_serving: If True and a serving SavedModel was exported next to the
+                               model file, loads it instead of the Keras model.
+        :type prefer_serving: bool, optional
+        :param quantization: If set, also loads the quantized head of this mode exported next
+                             to the model file (see `quantized_head_path`), when there is one.
+        :type quantization: str, optional
+        :return: The config to use: the artifact's config file for W&B URLs, otherwise `config`.
+        :rtype: str, Config, optional
+        """
+        # Check if load_model is a local file path or a W&B artifact URL
+        if os.path.exists(load_model):
+            local_model_path = load_model
+        else:
+            # If not a local path, assume it's a W&B artifact and fetch it.
+            # The associated config path will be discovered and used automatically.
+            started = time.perf_counter()
+            local_model_path, config = fetch_artifact_from_wandb(load_model)
+            self.load_timings["download"] = time.perf_counter() - started
+
+        serving_path = serving_model_path(local_model_path) if prefer_serving else None
+        started = time.perf_counter()
+        if serving_path and self._load_serving_model(serving_path):
+            print(f"Loaded serving model from {serving_path}.")
+        else:
+            self.model = tf.keras.models.load_model(local_model_path)
+            print(f"Loaded Keras model from {local_model_path}.")
+        self.model_path = local_model_path
+        # The variant loaded is part of the version: results of the serving SavedModel or of a
+        # quantized head are never mixed with those of the Keras model (e.g. in a shared cache)
+        self._file_version = _sha256_file(local_model_path)[:16] + ("+serving" if self.serving_module is not None else "")
+        self.model_version = self._file_version
+        if quantization:
+            head_path = quantized_head_path(local_model_path, quantization)
+            if os.path.isfile(head_path):
+                self.load_quantized_head(head_path)
+            else:
+                logger.warning(f"No {quantization} quantized head found at {head_path}; using the float head.")
+        self.load_timings["deserialize"] = time.perf_counter() - started
+        return config
+
     def _load_config(self, config: Optional[Union[str, Config]]) -> None:
         """
         Loads the configuration from a file path or a Config object.
@@ -380,7 +981,16 @@ class IntentClassifier:
         :raises ValueError: If the model's output size doesn't match the number of codes
                             in the config, indicating an invalid model-config mismatch.
         """
+        if self.quantized_head is not None and self.quantized_head.n_outputs != len(self.config.codes or []):
+            raise ValueError(f"Model-config mismatch detected: the quantized head outputs "
+                             f"{self.quantized_head.n_outputs} categories, but the config specifies "
+                             f"{len(self.config.codes or [])} categories (codes: {self.config.codes}).")
         if self.model is None:
+            if self.serving_module is not None:
+                exported_codes = [c.decode("utf-8") for c in self.serving_module.codes.numpy()]
+                if exported_codes != list(self.config.codes or []):
+                    raise ValueError(f"Model-config mismatch detected: the serving model was exported with "
+                                     f"codes {exported_codes}, but the config specifies {self.config.codes}.")
             return
         # Get the model's output layer size (number of classes the model was trained with)
         model_output_size = self.model.output_shape[-1]
@@ -398,7 +1008,7 @@ class IntentClassifier:
             )
             raise ValueError(error_msg)
     
-    def _setup_onehot_encoder(self) -> OneHotEncoder:
+    def _setup_onehot_encoder(self) -> 'OneHotEncoder':
         """
         Initializes and fits the OneHotEncoder based on the loaded intent codes.
 
@@ -406,6 +1016,7 @@ class IntentClassifier:
         :rtype: OneHotEncoder
         """
         assert self.codes is not None, "codes must be set before setting up the encoder."
+        from sklearn.preprocessing import OneHotEncoder
         self.onehot_encoder = OneHotEncoder(categories=[self.codes],)\
                                   .fit(np.array(self.codes).reshape(-1, 1))
         return self.onehot_encoder
@@ -413,40 +1024,12 @@ class IntentClassifier:
     def _get_callbacks(self) -> list:
         """
         Constructs a list of Keras callbacks based on the configuration.
-
-        Includes EarlyStopping and WandbMetricsLogger if configured.
-        Also includes an ExponentialDecay learning rate scheduler.
+        See `make_callbacks`.
 
         :return: A list of Keras Callback instances.
         :rtype: list
         """
-        callbacks = []
-        if self.config.callback_patience > 0:
-            callbacks.append(
-                tf.keras.callbacks.EarlyStopping(monitor='val_f1_score',
-                    patience=self.config.callback_patience,
-                    restore_best_weights=True)
-            )
-        if self.wandb_project:
-            callbacks.append(WandbMetricsLogger())
-        
-        # Configure ExponentialDecay
-        if self.config.learning_rate is not None and not isinstance(self.config.learning_rate, str):
-            lr_schedule = tf.keras.optimizers.schedules.ExponentialDecay(
-                initial_learning_rate=self.config.learning_rate,
-                decay_steps=1000,
-                decay_rate=0.96,
-                staircase=False
-            )
-            
-            # Modified learning rate scheduler to properly handle epoch parameter
-            def lr_scheduler(epoch, lr):
-                """Internal LR scheduler function."""
-                return lr_schedule(epoch).numpy().astype(float)
-            
-            lr_scheduler_callback = tf.keras.callbacks.LearningRateScheduler(lr_scheduler)
-            callbacks.append(lr_scheduler_callback)
-        return callbacks
+        return make_callbacks(self.config, self.wandb_project)
     
     def finish_wandb(self):
         """
@@ -464,83 +1047,137 @@ class IntentClassifier:
         2. Stopword removal (if configured).
         3. Padding with "<>" tokens if text is shorter than `min_words`.
 
+        This is a convenience wrapper around `preprocess_batch`, which should be
+        preferred whenever there is more than one text to process.
+
         :param text: A 0-D string tensor (scalar) containing the raw text.
         :type text: tf.Tensor
         :return: A 0-D string tensor (scalar) containing the preprocessed text.
         :rtype: tf.Tensor
         """
-        text = tf.strings.lower(text)
-        if self.stop_words:
-            words = tf.strings.split(text)
-            # Create a mask for words that are NOT in stopwords
-            words = tf.boolean_mask(words, tf.reduce_all(tf.not_equal(words[:, None], tf.constant(self.stop_words)), axis=1))
-            text = tf.strings.reduce_join(words, separator=' ')
-        
-        if self.config.min_words:
-            # Remove punctuation before counting words
-            words = tf.strings.split(text)
-            words = tf.boolean_mask(words, tf.reduce_all(tf.not_equal(words[:, None], tf.constant(["?", ".", ",", "!"])), axis=1))
-            num_words = tf.shape(words)[0]
-            
-            # Check if num_words is less than or equal to min_words
-            if tf.less_equal(num_words, self.config.min_words):
-                # Create padding
-                padding = tf.strings.join(["<>"] * (self.config.min_words + 1), separator=' ')
-                text = padding
+        return self.preprocess_batch(tf.reshape(text, [1]))[0]
 
-        # Iterate on text and replace punctuation with "PUNCTUATION" (it helps some sentence encoders that do not parse punctuation, like Universal Sentence Encoder)
+    def preprocess_batch(self, texts: Union[List[str], np.ndarray, tf.Tensor]) -> tf.Tensor:
+        """
+        Applies the preprocessing steps of `preprocess_text` to a whole batch of raw texts at once.
+
+        Words are handled as ragged tensors and stop words/punctuation are looked up in
+        hash tables, inside a `tf.function` compiled once per classifier.
+
+        :param texts: A list of strings, an array of strings or a 1-D string tensor.
+        :type texts: list[str] or np.ndarray or tf.Tensor
+        :return: A 1-D string tensor with the preprocessed texts.
+        :rtype: tf.Tensor
+        """
+        if getattr(self, "_preprocess_batch_fn", None) is None:
+            with self._lazy_init_lock:
+                if getattr(self, "_preprocess_batch_fn", None) is None:
+                    self._setup_preprocessing()
+        return self._preprocess_batch_fn(tf.convert_to_tensor(texts, dtype=tf.string))
+
+    def _setup_preprocessing(self) -> None:
+        """
+        Builds the lookup tables and compiles the graph used by `preprocess_batch`.
+        """
+        def make_table(keys: List[str]) -> tf.lookup.StaticHashTable:
+            keys = list(dict.fromkeys(keys))
+            return tf.lookup.StaticHashTable(
+                tf.lookup.KeyValueTensorInitializer(tf.constant(keys, dtype=tf.string),
+                                                    tf.ones(len(keys), dtype=tf.int64)),
+                default_value=0)
+
+        self._stop_words_table = make_table(self.stop_words) if self.stop_words else None
+        self._punctuation_table = make_table(["?", ".", ",", "!"])
+        self._preprocess_batch_fn = tf.function(
+            self._preprocess_batch_graph,
+            input_signature=[tf.TensorSpec(shape=[None], dtype=tf.string)])
+
+    def _preprocess_batch_graph(self, texts: tf.Tensor) -> tf.Tensor:
+        """
+        Graph implementation of `preprocess_batch`.
+
+        :param texts: A 1-D string tensor containing the raw texts.
+        :type texts: tf.Tensor
+        :return: A 1-D string tensor containing the preprocessed texts.
+        :rtype: tf.Tensor
+        """
+        texts = tf.strings.lower(texts)
+        if self._stop_words_table is not None:
+            words = tf.strings.split(texts)
+            # Keep only the words that are NOT in stopwords
+            is_stop_word = tf.ragged.map_flat_values(self._stop_words_table.lookup, words) > 0
+            words = tf.ragged.boolean_mask(words, tf.logical_not(is_stop_word))
+            texts = tf.strings.reduce_join(words, axis=-1, separator=' ')
+
+        if self.config.min_words:
+            # Punctuation tokens do not count as words
+            words = tf.strings.split(texts)
+            is_punctuation = tf.ragged.map_flat_values(self._punctuation_table.lookup, words) > 0
+            num_words = tf.reduce_sum(tf.cast(tf.logical_not(is_punctuation), tf.int32), axis=-1)
+            # Texts with num_words <= min_words are replaced by padding
+            padding = tf.strings.join(["<>"] * (self.config.min_words + 1), separator=' ')
+            texts = tf.where(num_words <= self.config.min_words, padding, texts)
+
+        # Replace punctuation with "PUNCTUATION" (it helps some sentence encoders that do not parse punctuation, like Universal Sentence Encoder)
         for p, t in {"?": "QUESTION_MARK", ".": "PERIOD", ",": "COMMA", "!": "EXCLAMATION_MARK"}.items():
-            espaped_p = re.escape(p)
-            text = tf.strings.regex_replace(text, espaped_p, f" {t} ")
-        text = tf.strings.regex_replace(text, r"\s+", " ")
-        text = tf.strings.strip(text)
-        
-        # Ensure output is always a 0-D tensor (scalar)
-        return tf.strings.as_string(text)
+            texts = tf.strings.regex_replace(texts, re.escape(p), f" {t} ")
+        texts = tf.strings.regex_replace(texts, r"\s+", " ")
+        return tf.strings.strip(texts)
+
+    def embed_texts(self, preprocessed_texts: Union[np.ndarray, tf.Tensor],
+                    model: Optional[tf.keras.Model] = None, batch_size: int = 256) -> np.ndarray:
+        """
+        Computes the sentence embeddings of preprocessed texts with the (frozen) encoder.
+
+        Each distinct text is embedded once. If `config.embedding_cache_dir` is set, the
+        embeddings are persisted there, keyed by the encoder URL and the set of texts,
+        so later runs on the same data skip the encoder entirely.
+
+        :param preprocessed_texts: A 1-D array or tensor of texts already passed through `preprocess_batch`.
+        :type preprocessed_texts: np.ndarray or tf.Tensor
+        :param model: The model whose `sent_encoder` layer is used. Defaults to `self.model`.
+        :type model: tf.keras.Model, optional
+        :param batch_size: Number of texts sent to the encoder at once.
+        :type batch_size: int, optional
+        :return: A 2-D float array of shape (n_texts, embedding_dim), in the input order.
+        :rtype: np.ndarray
+        """
+        texts = np.asarray(preprocessed_texts.numpy() if isinstance(preprocessed_texts, tf.Tensor)
+                           else preprocessed_texts).astype(bytes)
+        unique_texts, inverse = np.unique(texts, return_inverse=True)
+
+        cache_file = None
+        if self.config.embedding_cache_dir:
+            encoder_key = hashlib.sha256(str(self.config.embedding_model).encode("utf-8")).hexdigest()[:16]
+            texts_key = hashlib.sha256(b"\n".join(unique_texts.tolist())).hexdigest()
+            cache_file = Path(self.config.embedding_cache_dir) / encoder_key / f"{texts_key}.npy"
+            if cache_file.exists():
+                print(f"Loaded cached embeddings from {cache_file}.")
+                return np.load(cache_file)[inverse]
+
+        encoder = (model or self.model).get_layer("sent_encoder")
+        unique_embeddings = np.concatenate([
+            encoder(tf.constant(unique_texts[i:i + batch_size])).numpy()
+            for i in range(0, len(unique_texts), batch_size)
+        ]).astype(np.float32)
+
+        if cache_file is not None:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            np.save(cache_file, unique_embeddings)
+            print(f"Saved embeddings cache to {cache_file}.")
+        return unique_embeddings[inverse]
 
     def make_model(self, config: Config) -> tf.keras.Model:
         """
         Builds and returns a new Keras model based on the provided configuration.
-
-        The architecture consists of:
-        1. An input layer for string tensors.
-        2. A `HubLayer` for text embedding.
-        3. A Dense hidden layer with BatchNormalization, ReLU activation, and Dropout.
-        4. A final Dense output layer with softmax activation for classification.
+        See `build_model`.
 
         :param config: The configuration object specifying model hyperparameters.
         :type config: Config
-        :return: A compiled Keras model.
+        :return: A Keras model.
         :rtype: tf.keras.Model
         """
-        # Set the random seed for reproducibility
-        seed = 42
-        tf.random.set_seed(seed)  # Assuming you have a random_seed in your config
-        # Extract config values
-        sent_hl_units, sent_dropout = config.sent_hl_units, config.sent_dropout
-        l1_reg, l2_reg = config.l1_reg, config.l2_reg
-        output_size = len(self.codes)
-        # Build model
-        initializer = tf.keras.initializers.GlorotUniform(seed=seed)  # Set seed in initializer
-        text_input = tf.keras.layers.Input(shape=(), dtype=tf.string, name="inputs")
-        # Sentence encoder
-        encoder = HubLayer(config.embedding_model, trainable=False, name="sent_encoder")(text_input)
-        # Hidden layer
-        sent_hl = tf.keras.layers.Dense(sent_hl_units,
-                                        kernel_initializer=initializer,
-                                        kernel_regularizer=regularizers.l1_l2(l1=l1_reg, l2=l2_reg),
-                                        activation=None,  # No activation here yet
-                                        name='sent_hl')(encoder)
-        sent_hl_norm = tf.keras.layers.BatchNormalization()(sent_hl)  # Add batch normalization
-        sent_hl_activation = tf.keras.layers.Activation('relu')(sent_hl_norm)  # Activation after batch normalization
-        sent_hl_dropout = tf.keras.layers.Dropout(sent_dropout, seed=seed)(sent_hl_activation)  # Set seed in dropout
-        # Output layer
-        sent_output = tf.keras.layers.Dense(output_size,
-                                            kernel_initializer=initializer,
-                                            activation='softmax',
-                                            name="sent_output")(sent_hl_dropout)
-        model = tf.keras.Model(inputs=text_input, outputs=sent_output)
-        return model
+        return build_model(config)
 
     def train(self, save_model: Optional[str] = None, tf_verbosity: int = 1) -> tf.keras.Model:
         """
@@ -563,6 +1200,7 @@ class IntentClassifier:
         # Update task config parameter
         self.config.task = "train"
         assert self.training_data is not None, "training_data must be provided when the IntentClassifier was created."
+        from sklearn.model_selection import train_test_split
         
         # Extract one-hot encoded labels
         labels_ohe = self.onehot_encoder\
@@ -576,19 +1214,23 @@ class IntentClassifier:
             random_state=42           # For reproducibility
         )
         # Now apply preprocessing using preprocess_text *after* splitting:
-        X_train = tf.map_fn(self.preprocess_text, tf.constant(X_train_text), dtype=tf.string)
-        X_val = tf.map_fn(self.preprocess_text, tf.constant(X_val_text), dtype=tf.string)
+        X_train = self.preprocess_batch(X_train_text)
+        X_val = self.preprocess_batch(X_val_text)
 
         # Extract config values
         epochs = self.config.epochs
         # New model from scratch
         self.model = self.make_model(self.config)
-        self.model.compile(
-            loss='categorical_crossentropy',
-            optimizer=tf.keras.optimizers.Adam(), # LR is handled by callback
-            metrics=[tf.keras.metrics.F1Score(average='macro')])
+        self.model_version = self._file_version = None
+        fit_model = self.model
+        if self.config.cache_embeddings:
+            # The encoder is frozen: embed the texts once and train only the head,
+            # whose layers (and weights) are shared with self.model
+            X_train, X_val = self.embed_texts(X_train), self.embed_texts(X_val)
+            fit_model = self._get_head()
+        compile_model(fit_model)
         # Train the model
-        self.model.fit(
+        fit_model.fit(
             X_train, y_train,
             validation_data=(X_val, y_val),
             # batch_size=16,
@@ -602,16 +1244,24 @@ class IntentClassifier:
             self.save_model(path=save_model)
         return self.model
 
-    def save_model(self, path: str):
+    def save_model(self, path: str, export_serving: bool = True, quantize: Union[str, List[str]] = ()):
         """
         Saves the current model and its configuration file.
 
         The model is saved in Keras format (`.keras`).
         The config is saved as a YAML file with `_config.yml` suffix.
+        Unless `export_serving` is False, a serving SavedModel is also exported to a
+        `_serving` directory (see `export_serving_model`), and a quantized head is
+        exported for each mode in `quantize` (see `export_quantized_head`).
         If W&B is configured, the model is also logged as an artifact.
 
         :param path: The base path to save the model (e.g., "models/my_model.keras").
         :type path: str
+        :param export_serving: Whether to also export the serving SavedModel.
+        :type export_serving: bool, optional
+        :param quantize: Quantization modes (or a comma-separated string) of the heads to export.
+                         "int8" is calibrated on the training examples.
+        :type quantize: str or list[str], optional
         """
         Path(os.path.dirname(path)).mkdir(parents=True, exist_ok=True)
         # Save model in SavedModel format
@@ -625,7 +1275,12 @@ class IntentClassifier:
         with open(config_path, 'w') as f:
             f.write(yaml.dump(self.config.__dict__))
         print(f"Model saved to {path}.")
+        serving_dir = self.export_serving_model(serving_dir_for(path)) if export_serving else None
+        if isinstance(quantize, str):
+            quantize = [mode.strip() for mode in quantize.split(',') if mode.strip()]
+        head_paths = [self.export_quantized_head(quantized_head_path(path, mode), mode) for mode in quantize]
         if self.wandb_project:
+            import wandb
             # Crie e envie o artifact
             artifact = wandb.Artifact(
                 name=f"{self.config.dataset_name}-clf",
@@ -634,21 +1289,160 @@ class IntentClassifier:
             )
             artifact.add_file(path)
             artifact.add_file(config_path) # Also add the config file
+            if serving_dir:
+                artifact.add_dir(serving_dir, name=Path(serving_dir).name)
+            for head_path in head_paths:
+                artifact.add_file(head_path)
             self.wandb_run.log_artifact(artifact)
             self.finish_wandb() # Finish the run after saving
 
+    def export_serving_model(self, path: str) -> str:
+        """
+        Exports a SavedModel for serving, with the preprocessing and the classification
+        head in frozen graphs:
+
+        - signature "preprocess": raw texts (1-D string tensor) -> preprocessed texts;
+        - signature "head": sentence embeddings -> class probabilities;
+        - variable `codes`: the intent codes, in output order.
+
+        The sentence encoder is not exported: at load time (see `for_inference`) it is
+        resolved with `load_hub_module(config.embedding_model)`, so models built on the
+        same encoder share a single copy of its weights in memory. Loading needs neither
+        Keras nor the custom `HubLayer`. TFLite is not used because the multilingual
+        encoder relies on SentencePiece ops that TFLite does not support.
+
+        :param path: The output directory (e.g., "models/my_model_serving").
+        :type path: str
+        :return: The output directory.
+        :rtype: str
+        """
+        fns = self._get_serving_fns()
+        module = tf.Module()
+        # Track every resource the graphs capture, so they are saved with them
+        module.head_model = self._get_head()
+        module.tables = [table for table in (self._stop_words_table, self._punctuation_table) if table is not None]
+        module.codes = tf.Variable(list(self.codes), dtype=tf.string, trainable=False)
+        module.preprocess, module.head = self._preprocess_batch_fn, fns["head"]
+        tf.saved_model.save(module, path, signatures={"preprocess": self._preprocess_batch_fn,
+                                                      "head": fns["head"]})
+        print(f"Serving model exported to {path}.")
+        return path
+
+    def _load_serving_model(self, path: str) -> bool:
+        """
+        Loads a SavedModel written by `export_serving_model`; its graphs are used as the
+        serving functions (with the shared sentence encoder, see `_get_serving_fns`).
+        `self.model` stays None: no Keras model is built.
+
+        :param path: The SavedModel directory.
+        :type path: str
+        :return: False if the directory is not in the current export format (nothing is loaded).
+        :rtype: bool
+        """
+        module = tf.saved_model.load(path)
+        if not hasattr(module, "preprocess"):
+            # Older exports embedded their own copy of the encoder
+            return False
+        self.serving_module = module
+        self.model = None
+        self._serving_fns = None
+        self._serving_of = None
+        return True
+
+    def export_quantized_head(self, path: str, mode: str = "dynamic",
+                              calibration_texts: Optional[List[str]] = None,
+                              max_calibration_samples: int = 500) -> str:
+        """
+        Converts the classification head to TensorFlow Lite with post-training quantization:
+
+        - "dynamic": int8 weights, float activations (no calibration needed);
+        - "int8": int8 weights and activations, calibrated on the embeddings of
+          `calibration_texts` (float inputs and outputs are kept);
+        - "float16": float16 weights.
+
+        Only the head is converted: the multilingual encoder relies on SentencePiece ops
+        that TFLite does not support, so embeddings are still computed by TensorFlow.
+
+        :param path: The output `.tflite` file (see `quantized_head_path`).
+        :type path: str
+        :param mode: One of `QUANTIZATION_MODES`.
+        :type mode: str, optional
+        :param calibration_texts: Raw texts used to calibrate "int8". Defaults to the training examples.
+        :type calibration_texts: list[str], optional
+        :param max_calibration_samples: Maximum number of texts used for calibration.
+        :type max_calibration_samples: int, optional
+        :return: The output file.
+        :rtype: str
+        :raises ValueError: If the mode is unknown, if no Keras model is loaded, or if "int8"
+                            has no calibration texts.
+        """
+        if mode not in QUANTIZATION_MODES:
+            raise ValueError(f"Unknown quantization mode '{mode}'. Choose one of {QUANTIZATION_MODES}.")
+        if self.model is None:
+            raise ValueError("Quantization needs the Keras model: load it with prefer_serving=False.")
+        converter = tf.lite.TFLiteConverter.from_keras_model(self._get_head())
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        if mode == "float16":
+            converter.target_spec.supported_types = [tf.float16]
+        elif mode == "int8":
+            if calibration_texts is None and getattr(self, "input_text", None) is not None:
+                calibration_texts = [t.decode("utf-8") for t in self.input_text.numpy()]
+            if not calibration_texts:
+                raise ValueError("int8 quantization needs calibration texts.")
+            embeddings = self.encode(self.preprocess_batch(list(calibration_texts)[:max_calibration_samples])).numpy()
+            converter.representative_dataset = lambda: ([row[np.newaxis]] for row in embeddings)
+        Path(os.path.dirname(os.path.abspath(path))).mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(converter.convert())
+        print(f"Quantized ({mode}) head exported to {path}.")
+        return path
+
+    def load_quantized_head(self, path: str) -> None:
+        """
+        Runs the classification head with a TFLite head written by `export_quantized_head`.
+        The encoder and the preprocessing are unchanged.
+
+        The head's mode (from the file name, see `quantized_head_path`) and file hash are
+        added to `model_version`.
+
+        :param path: The `.tflite` file.
+        :type path: str
+        """
+        self.quantized_head = TFLiteHead(path)
+        if self._file_version is not None:
+            match = re.search(r"_head_(\w+)\.tflite$", path)
+            mode = match.group(1) if match else "tflite"
+            self.model_version = f"{self._file_version}+{mode}.{_sha256_file(path)[:8]}"
+
     def predict(self, input_text: Union[str, List[str]],
                 true_labels: Optional[List[str]] = None,
-                log_to_wandb: bool = False) -> Union[Tuple[str, Dict[str, float]], List[Tuple[str, Dict[str, float]]]]:
+                log_to_wandb: bool = False,
+                fast: bool = True,
+                preprocessed: bool = False) -> Union[Tuple[str, Dict[str, float]], List[Tuple[str, Dict[str, float]]]]:
         """
         Predicts the intent for a given text or list of texts.
 
+        By default, preprocessing and the model run in a single compiled `tf.function`
+        called directly (see `_get_serving_fns`), without the data adapter, step loop
+        and progress bar of `model.predict`. Nothing is printed per call. A `stage_observer`
+        is told the time of the "inference" (everything up to the probabilities) and "format"
+        stages; for a `stage_sample_rate` fraction of the calls, preprocessing, encoding and
+        the head run as separate calls, and "preprocess" and "encode" are reported too.
+        With a quantized head loaded, it is used on every path: preprocessing and encoding
+        run in one compiled call and the TFLite head runs on the embeddings.
+
         :param input_text: A single text string or a list of text strings to classify.
         :type input_text: str or list[str]
         :param true_labels: A list of true labels, corresponding to `input_text`. Used for logging to W&B.
         :type true_labels: list[str], optional
         :param log_to_wandb: If True, logs the inputs, predictions, and true labels (if provided) to W&B.
         :type log_to_wandb: bool, optional
+        :param fast: If False, uses `model.predict` (quietly) instead of the compiled fast path
+                     (ignored with a quantized head).
+        :type fast: bool, optional
+        :param preprocessed: If True, `input_text` is already the output of `preprocess_batch`
+                             and is not preprocessed again.
+        :type preprocessed: bool, optional
         :return: If `input_text` is a string: a tuple `(top_intent, all_probabilities)`.
                  If `input_text` is a list: a list of tuples `[(top_intent, all_probabilities), ...]`.
                  `all_probabilities` is a dict mapping intent codes to their predicted probabilities.
@@ -661,25 +1455,15 @@ class IntentClassifier:
         else:
             input_text_list = input_text
         
-        # Preprocess each string in the list and stack them
-        preprocessed_texts = tf.map_fn(self.preprocess_text, tf.constant(input_text_list), dtype=tf.string)
-
-        # Predict probabilities for all strings at once
-        all_probs = self.model.predict(preprocessed_texts)
-        results = []
-        predicted_labels_for_log = []
-        for i in range(all_probs.shape[0]):
-            current_probs = all_probs[i] # Probabilities for the i-th input text
-            # Determine the intent name with the highest probability
-            highest_prob_idx = np.argmax(current_probs)
-            highest_prob_intent_name = self.codes[highest_prob_idx]
-            predicted_labels_for_log.append(highest_prob_intent_name)
-            # Create a dictionary of probabilities for each intent name
-            probs_dict = {code: float(current_probs[j]) for j, code in enumerate(self.codes)}
-            results.append((highest_prob_intent_name, probs_dict))
+        # Preprocess and predict probabilities for all strings at once
+        all_probs, started = self._predict_proba(input_text_list, fast, preprocessed)
+        results = self._format_predictions(all_probs)
+        self._observe_stage("format", started)
+        predicted_labels_for_log = [top_intent for top_intent, _ in results]
         
         # Log to Wandb if requested
         if log_to_wandb and self.wandb_project:
+            import wandb
             # Get the current run ID if it exists, otherwise start a new run
             run_id = wandb.run.id if wandb.run else wandb.util.generate_id()
             # Initialize wandb with the run ID
@@ -695,7 +1479,210 @@ class IntentClassifier:
             return results[0]
         return results
 
-    def cross_validation(self, n_splits: int = 3) -> List[Dict[str, Any]]:
+    def predict_batch(self, input_text: List[str], fast: bool = True, preprocessed: bool = False) -> BatchPredictions:
+        """
+        Predicts the intents of a list of texts and returns them in compact form: the
+        codes plus the probability matrix, with the top intents computed over the whole
+        matrix at once. Cheaper than `predict` for large batches, since no per-row
+        dict is built unless `BatchPredictions.rows` is called.
+
+        :param input_text: A list of text strings to classify.
+        :type input_text: list[str]
+        :param fast: If False, uses `model.predict` (quietly) instead of the compiled fast path
+                     (ignored with a quantized head).
+        :type fast: bool, optional
+        :param preprocessed: If True, `input_text` is already the output of `preprocess_batch`.
+        :type preprocessed: bool, optional
+        :return: The compact predictions, one row per text.
+        :rtype: BatchPredictions
+        """
+        self.config.task = "predict"
+        all_probs, started = self._predict_proba(list(input_text), fast, preprocessed)
+        predictions = BatchPredictions(self.codes, all_probs)
+        self._observe_stage("format", started)
+        return predictions
+
+    def _predict_proba(self, input_text_list: List[str], fast: bool = True,
+                       preprocessed: bool = False) -> Tuple[np.ndarray, float]:
+        """
+        Runs preprocessing (unless `preprocessed`) and the model on a list of texts (see `predict`).
+
+        :return: The class probabilities, of shape (n_texts, n_codes), and the end time of the
+                 "inference" stage (`time.perf_counter()`).
+        :rtype: tuple(np.ndarray, float)
+        """
+        started = time.perf_counter()
+        texts = tf.convert_to_tensor(input_text_list, dtype=tf.string)
+        # The fused call is the fastest path: with only a `stage_observer`, its total is reported as
+        # "inference", and just a sampled fraction of the calls (`stage_sample_rate`) runs stage by stage
+        staged = self.stage_observer is not None and self.stage_sample_rate > 0 and random.random() < self.stage_sample_rate
+        if staged and (fast or self.model is None or self.quantized_head is not None):
+            # Stage by stage, so that each one can be timed
+            preprocessed_texts = texts
+            if not preprocessed:
+                preprocessed_texts = self.preprocess_batch(texts)
+                started = self._observe_stage("preprocess", started)
+            embeddings = self.encode(preprocessed_texts)
+            started = self._observe_stage("encode", started)
+            all_probs = self.predict_proba_from_embeddings(embeddings)
+        elif self.quantized_head is not None:
+            # The TFLite head cannot join the compiled graph: preprocessing and encoding run fused,
+            # then the quantized head (whatever `fast` is, the float head never runs)
+            fns = self._get_serving_fns()
+            embeddings = fns["encode"](texts) if preprocessed else fns["embed"](texts)
+            all_probs = self.predict_proba_from_embeddings(embeddings)
+        elif fast or self.model is None:
+            all_probs = self._get_serving_fns()["classify" if preprocessed else "predict"](texts).numpy()
+        else:
+            preprocessed_texts = texts if preprocessed else self.preprocess_batch(texts)
+            all_probs = self.model.predict(preprocessed_texts, verbose=0)
+        return all_probs, self._observe_stage("inference", started)
+
+    def _format_predictions(self, all_probs: np.ndarray) -> List[Tuple[str, Dict[str, float]]]:
+        """
+        Converts a matrix of class probabilities into `(top_intent, all_probabilities)` tuples.
+        The argmax runs over the whole matrix and the matrix is converted to Python floats
+        in a single call (see `BatchPredictions.rows`).
+
+        :param all_probs: A 2-D array of shape (n_texts, n_codes).
+        :type all_probs: np.ndarray
+        :return: A list of tuples `[(top_intent, all_probabilities), ...]`, one per row.
+        :rtype: list[tuple(str, dict(str, float))]
+        """
+        return BatchPredictions(self.codes, all_probs).rows()
+
+    def encode(self, preprocessed_texts: tf.Tensor) -> tf.Tensor:
+        """
+        Computes sentence embeddings with the model's `sent_encoder` layer.
+
+        :param preprocessed_texts: A 1-D string tensor already passed through `preprocess_batch`.
+        :type preprocessed_texts: tf.Tensor
+        :return: A 2-D float tensor of shape (n_texts, embedding_dim).
+        :rtype: tf.Tensor
+        """
+        return self._get_serving_fns()["encode"](tf.convert_to_tensor(preprocessed_texts, dtype=tf.string))
+
+    def _get_head(self) -> tf.keras.Model:
+        """
+        Returns the classification head of the model (`sent_hl` -> BN -> `sent_output`),
+        i.e. the sub-model that maps sentence embeddings to class probabilities.
+
+        :return: A Keras model that takes embeddings as input.
+        :rtype: tf.keras.Model
+        """
+        with self._lazy_init_lock:
+            if getattr(self, "_head", None) is None or self._head_of is not self.model:
+                self._head = build_head(self.model)
+                self._head_of = self.model
+            return self._head
+
+    def _get_serving_fns(self) -> Dict[str, Any]:
+        """
+        Returns the compiled inference functions of the current model, each traced once
+        with a fixed input signature and called directly:
+
+        - "predict": raw texts (1-D string tensor) -> class probabilities, preprocessing included;
+        - "classify": preprocessed texts -> class probabilities;
+        - "embed": raw texts -> sentence embeddings, preprocessing included;
+        - "encode": preprocessed texts -> sentence embeddings;
+        - "head": sentence embeddings (float32) -> class probabilities.
+
+        :return: A dict mapping the names above to `tf.function`s.
+        :rtype: dict(str, tf.types.experimental.GenericFunction)
+        """
+        # `_serving_of` is read first: it is only set after the matching `_serving_fns`
+        if getattr(self, "_serving_of", None) is self.model and getattr(self, "_serving_fns", None) is not None:
+            return self._serving_fns
+        with self._lazy_init_lock:
+            if getattr(self, "_serving_fns", None) is None or self._serving_of is not self.model:
+                if self.serving_module is not None:
+                    self._serving_fns = self._get_exported_serving_fns()
+                    self._serving_of = self.model
+                    return self._serving_fns
+                if getattr(self, "_preprocess_batch_fn", None) is None:
+                    self._setup_preprocessing()
+                model, head = self.model, self._get_head()
+                encoder = model.get_layer("sent_encoder")
+                text_spec = tf.TensorSpec(shape=[None], dtype=tf.string)
+                embedding_spec = tf.TensorSpec(shape=[None, head.inputs[0].shape[-1]], dtype=tf.float32)
+                self._serving_fns = {
+                    "predict": tf.function(lambda texts: model(self._preprocess_batch_graph(texts), training=False),
+                                           input_signature=[text_spec]),
+                    "classify": tf.function(lambda texts: model(texts, training=False), input_signature=[text_spec]),
+                    "embed": tf.function(lambda texts: encoder(self._preprocess_batch_graph(texts)),
+                                         input_signature=[text_spec]),
+                    "encode": tf.function(lambda texts: encoder(texts), input_signature=[text_spec]),
+                    "head": tf.function(lambda embeddings: head(embeddings, training=False),
+                                        input_signature=[embedding_spec]),
+                }
+                self._serving_of = self.model
+            return self._serving_fns
+
+    def _get_exported_serving_fns(self) -> Dict[str, Any]:
+        """
+        Serving functions of a loaded serving SavedModel (see `_get_serving_fns`): its
+        preprocessing and head graphs around the sentence encoder shared by every model
+        with the same `embedding_model` (see `load_hub_module`).
+
+        :rtype: dict(str, tf.types.experimental.GenericFunction)
+        """
+        preprocess, head = self.serving_module.preprocess, self.serving_module.head
+        encoder = load_hub_module(self.config.embedding_model)
+        text_spec = tf.TensorSpec(shape=[None], dtype=tf.string)
+        return {
+            "predict": tf.function(lambda texts: head(encoder(preprocess(texts))), input_signature=[text_spec]),
+            "classify": tf.function(lambda texts: head(encoder(texts)), input_signature=[text_spec]),
+            "embed": tf.function(lambda texts: encoder(preprocess(texts)), input_signature=[text_spec]),
+            "encode": tf.function(lambda texts: encoder(texts), input_signature=[text_spec]),
+            "head": head,
+        }
+
+    def predict_from_embeddings(self, embeddings: tf.Tensor) -> List[Tuple[str, Dict[str, float]]]:
+        """
+        Predicts intents from precomputed sentence embeddings, running only the
+        classification head. The embeddings must come from the same `embedding_model`.
+
+        :param embeddings: A 2-D float tensor of shape (n_texts, embedding_dim).
+        :type embeddings: tf.Tensor
+        :return: A list of tuples `[(top_intent, all_probabilities), ...]`.
+        :rtype: list[tuple(str, dict(str, float))]
+        """
+        self.config.task = "predict"
+        started = time.perf_counter()
+        all_probs = self.predict_proba_from_embeddings(embeddings)
+        started = self._observe_stage("inference", started)
+        results = self._format_predictions(all_probs)
+        self._observe_stage("format", started)
+        return results
+
+    def predict_proba_from_embeddings(self, embeddings: tf.Tensor) -> np.ndarray:
+        """
+        Runs only the classification head (the quantized one, if loaded) on precomputed
+        sentence embeddings.
+
+        :param embeddings: A 2-D float tensor of shape (n_texts, embedding_dim).
+        :type embeddings: tf.Tensor
+        :return: The class probabilities, of shape (n_texts, n_codes), in `self.codes` order.
+        :rtype: np.ndarray
+        """
+        if self.quantized_head is not None:
+            return self.quantized_head(np.asarray(embeddings, dtype=np.float32))
+        return self._get_serving_fns()["head"](tf.convert_to_tensor(embeddings, dtype=tf.float32)).numpy()
+
+    def _observe_stage(self, stage: str, started: float) -> float:
+        """
+        Tells `stage_observer` (if any) how long `stage` took since `started`.
+
+        :return: The current `time.perf_counter()`, i.e. the start of the next stage.
+        :rtype: float
+        """
+        now = time.perf_counter()
+        if self.stage_observer is not None:
+            self.stage_observer(stage, now - started)
+        return now
+
+    def cross_validation(self, n_splits: int = 3, n_jobs: int = 1,
+                         tf_threads: Optional[int] = None) -> List[Dict[str, Any]]:
         """
         Performs stratified K-fold cross-validation.
 
@@ -705,61 +1692,50 @@ class IntentClassifier:
 
         :param n_splits: The number of folds to use for cross-validation.
         :type n_splits: int, optional
+        :param n_jobs: Number of worker processes running folds in parallel. With 1, folds run
+                       one after another in this process.
+        :type n_jobs: int, optional
+        :param tf_threads: TensorFlow intra-op threads per worker process. Defaults to the
+                           number of CPUs divided by `n_jobs`.
+        :type tf_threads: int, optional
         :return: A list of dictionaries, where each dictionary is the classification
-                 report (from `sklearn.metrics.classification_report`) for a fold.
+                 report (from `sklearn.metrics.classification_report`) for a fold,
+                 in fold order.
         :rtype: list[dict(str, Any)]
         :raises AssertionError: If `training_data` was not provided during initialization.
         """
         assert self.training_data is not None, "training_data must be provided when the IntentClassifier was created."
         # Update task config parameter
         self.config.task = "cross_validation"
+        import wandb
+        from sklearn.model_selection import StratifiedKFold
         kf = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=42)
         
         # Preprocess the entire dataset once
-        preprocessed_input_text = tf.map_fn(self.preprocess_text, self.input_text, dtype=tf.string)
+        preprocessed_input_text = self.preprocess_batch(self.input_text)
         
         # Get one-hot encoded labels before the loop
         labels_ohe = self.onehot_encoder.transform(self.labels.reshape(-1, 1)).toarray()
-        
-        results = []
-        
-        for i, (train_index, test_index) in enumerate(kf.split(preprocessed_input_text.numpy(), self.labels)):
-            print(f"Fold {i+1}/{n_splits}")
-            # Create and log a new Wandb run for each fold
-            run_name = f"cv_fold_{i+1}"
-            with wandb.init(project=self.wandb_project, config=self.config.__dict__, 
-                            group="cross_validation", name=run_name, reinit=True, 
-                            job_type=f"fold_{i+1}"):
-                
-                # Create a new model for each fold
-                model = self.make_model(self.config)
-                model.compile(
-                    loss='categorical_crossentropy',
-                    optimizer=tf.keras.optimizers.Adam(), # LR handled by callback
-                    metrics=[tf.keras.metrics.F1Score(average='macro')])
-                
-                # Get train/test splits for this fold
-                X_train, X_test = preprocessed_input_text[train_index], preprocessed_input_text[test_index]
-                y_train_ohe, y_test_ohe = labels_ohe[train_index], labels_ohe[test_index]
-
-                # Train the model on the current fold
-                model.fit(X_train, y_train_ohe,
-                          epochs=self.config.epochs, verbose=0,
-                          validation_data=(X_test, y_test_ohe), # Use test fold as validation
-                          callbacks=self._get_callbacks()) # WandbMetricsLogger is already added in _get_callbacks()
-                
-                # Predict on the test set for the current fold
-                preds_probs = model.predict(X_test)
-                preds = self.onehot_encoder.inverse_transform(preds_probs)
-                labels = self.onehot_encoder.inverse_transform(y_test_ohe)
-                
-                # Evaluate the model and store the results
-                res = classification_report(labels, preds, output_dict=True, zero_division=0)
-                res['kappa'] = cohen_kappa_score(labels, preds)
-                results.append(res)
-                
-                # Log fold-specific metrics
-                wandb.log({"fold_results": res, "val_f1_macro": res["macro avg"]["f1-score"], "val_kappa": res['kappa']})
+
+        # With a frozen encoder, the whole dataset is embedded once and every fold trains only the head
+        fold_inputs = preprocessed_input_text.numpy()
+        if self.config.cache_embeddings:
+            fold_inputs = self.embed_texts(fold_inputs, model=self.make_model(self.config))
+
+        folds = [
+            dict(config=self.config, wandb_project=self.wandb_project, fold=i, n_splits=n_splits,
+                 X_train=fold_inputs[train_index], y_train_ohe=labels_ohe[train_index],
+                 X_test=fold_inputs[test_index], y_test_ohe=labels_ohe[test_index])
+            for i, (train_index, test_index) in enumerate(kf.split(fold_inputs, self.labels))
+        ]
+        if n_jobs > 1:
+            tf_threads = tf_threads or max(1, (os.cpu_count() or 1) // n_jobs)
+            # "spawn" gives each worker a fresh TensorFlow runtime with its own thread budget
+            with ProcessPoolExecutor(max_workers=n_jobs, mp_context=multiprocessing.get_context("spawn")) as pool:
+                futures = [pool.submit(run_cross_validation_fold, tf_threads=tf_threads, **fold) for fold in folds]
+                results = [future.result() for future in futures]
+        else:
+            results = [run_cross_validation_fold(**fold) for fold in folds]
         
         # Calculate and print average metrics
         avg_f1 = np.mean([r['macro avg']['f1-score'] for r in results])
@@ -777,6 +1753,241 @@ class IntentClassifier:
         return results
 
 
+def run_cross_validation_fold(config: Config, wandb_project: Optional[str], fold: int, n_splits: int,
+                              X_train: np.ndarray, y_train_ohe: np.ndarray,
+                              X_test: np.ndarray, y_test_ohe: np.ndarray,
+                              tf_threads: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Trains and evaluates a fresh model on one cross-validation fold.
+
+    It only depends on its arguments, so it can run either in the calling process or
+    in a worker process of `IntentClassifier.cross_validation(n_jobs > 1)`.
+
+    :param config: The configuration used to build the model (`config.codes` must be set).
+    :type config: Config
+    :param wandb_project: The W&B project where the fold run is logged (group "cross_validation").
+    :type wandb_project: str, optional
+    :param fold: The zero-based fold index.
+    :type fold: int
+    :param n_splits: The total number of folds.
+    :type n_splits: int
+    :param X_train: Preprocessed texts (or cached embeddings) used for training.
+    :type X_train: np.ndarray
+    :param y_train_ohe: One-hot encoded training labels.
+    :type y_train_ohe: np.ndarray
+    :param X_test: Preprocessed texts (or cached embeddings) used for evaluation.
+    :type X_test: np.ndarray
+    :param y_test_ohe: One-hot encoded evaluation labels.
+    :type y_test_ohe: np.ndarray
+    :param tf_threads: If set, limits TensorFlow intra-op threads (call it before any TF op runs).
+    :type tf_threads: int, optional
+    :return: The classification report for the fold, with an extra 'kappa' key.
+    :rtype: dict(str, Any)
+    """
+    if tf_threads:
+        tf.config.threading.set_intra_op_parallelism_threads(tf_threads)
+        tf.config.threading.set_inter_op_parallelism_threads(1)
+    print(f"Fold {fold+1}/{n_splits}")
+    import wandb
+    from sklearn.metrics import classification_report, cohen_kappa_score
+    # Create and log a new Wandb run for each fold
+    run_name = f"cv_fold_{fold+1}"
+    with wandb.init(project=wandb_project, config=config.__dict__, 
+                    group="cross_validation", name=run_name, reinit=True, 
+                    job_type=f"fold_{fold+1}"):
+        
+        # Create a new model for each fold
+        model = build_model(config)
+        if config.cache_embeddings:
+            model = build_head(model)
+        else:
+            X_train, X_test = tf.constant(X_train, dtype=tf.string), tf.constant(X_test, dtype=tf.string)
+        compile_model(model)
+
+        # Train the model on the current fold
+        model.fit(X_train, y_train_ohe,
+                  epochs=config.epochs, verbose=0,
+                  validation_data=(X_test, y_test_ohe), # Use test fold as validation
+                  callbacks=make_callbacks(config, wandb_project)) # WandbMetricsLogger is already added in make_callbacks()
+        
+        # Predict on the test set for the current fold
+        preds_probs = model.predict(X_test, verbose=0)
+        codes = np.array(config.codes)
+        preds = codes[np.argmax(preds_probs, axis=1)]
+        labels = codes[np.argmax(y_test_ohe, axis=1)]
+        
+        # Evaluate the model and store the results
+        res = classification_report(labels, preds, output_dict=True, zero_division=0)
+        res['kappa'] = cohen_kappa_score(labels, preds)
+        
+        # Log fold-specific metrics
+        wandb.log({"fold_results": res, "val_f1_macro": res["macro avg"]["f1-score"], "val_kappa": res['kappa']})
+    return res
+
+
+def group_by_encoder(classifiers: Dict[str, IntentClassifier]) -> List[List[str]]:
+    """
+    Groups classifier names by the sentence encoder (`embedding_model`) they were built on.
+
+    :param classifiers: A dict mapping model names to loaded classifiers.
+    :type classifiers: dict(str, IntentClassifier)
+    :return: A list of groups of model names, in the order the models first appear.
+    :rtype: list[list[str]]
+    """
+    groups: Dict[str, List[str]] = {}
+    for name, classifier in classifiers.items():
+        groups.setdefault(str(classifier.config.embedding_model), []).append(name)
+    return list(groups.values())
+
+
+def predict_with_shared_encoder(classifiers: Dict[str, IntentClassifier],
+                                input_text: Union[str, List[str]],
+                                compact: bool = False,
+                                preprocessed: Optional[Dict[str, List[str]]] = None) -> Dict[str, Any]:
+    """
+    Predicts with several classifiers that share the same sentence encoder, embedding
+    each distinct preprocessed text only once and running only each model's head on it.
+
+    :param classifiers: A dict mapping model names to classifiers with the same `embedding_model`.
+    :type classifiers: dict(str, IntentClassifier)
+    :param input_text: A single text string or a list of text strings to classify.
+    :type input_text: str or list[str]
+    :param compact: If True, returns `BatchPredictions` (as `IntentClassifier.predict_batch`) instead.
+    :type compact: bool, optional
+    :param preprocessed: The texts already preprocessed by each classifier (`preprocess_batch`, decoded),
+                         one list per model name; computed here if None.
+    :type preprocessed: dict(str, list[str]), optional
+    :return: A dict mapping each model name to the same output `IntentClassifier.predict` returns.
+    :rtype: dict(str, tuple or list[tuple] or BatchPredictions)
+    :raises ValueError: If the classifiers do not share the same `embedding_model`.
+    """
+    if len(group_by_encoder(classifiers)) > 1:
+        raise ValueError("All classifiers must share the same embedding_model.")
+    original_input_is_string = isinstance(input_text, str)
+    input_text_list = [input_text] if original_input_is_string else list(input_text)
+
+    # Each model may preprocess differently (stop words, min_words), so the texts are
+    # deduplicated after preprocessing and each distinct one is embedded once.
+    if preprocessed is None:
+        preprocessed = {}
+        for name, clf in classifiers.items():
+            started = time.perf_counter()
+            preprocessed[name] = [t.decode("utf-8") for t in clf.preprocess_batch(input_text_list).numpy()]
+            clf._observe_stage("preprocess", started)
+    unique_texts = list(dict.fromkeys(t for texts in preprocessed.values() for t in texts))
+    index = {t: i for i, t in enumerate(unique_texts)}
+    # The shared encoding is reported by the classifier whose encoder runs
+    encoder_owner = next(iter(classifiers.values()))
+    started = time.perf_counter()
+    embeddings = encoder_owner.encode(tf.constant(unique_texts))
+    encoder_owner._observe_stage("encode", started)
+
+    results = {}
+    for name, clf in classifiers.items():
+        rows = tf.gather(embeddings, [index[t] for t in preprocessed[name]])
+        if compact:
+            clf.config.task = "predict"
+            started = time.perf_counter()
+            all_probs = clf.predict_proba_from_embeddings(rows)
+            started = clf._observe_stage("inference", started)
+            results[name] = BatchPredictions(clf.codes, all_probs)
+            clf._observe_stage("format", started)
+            continue
+        predictions = clf.predict_from_embeddings(rows)
+        results[name] = predictions[0] if original_input_is_string else predictions
+    return results
+
+
+def _median_ms(fn, repeat: int) -> float:
+    """Runs `fn` once to warm it up, then returns the median of `repeat` timed runs, in milliseconds."""
+    fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return float(np.median(samples))
+
+
+def evaluate_quantization(load_model: str, config: Optional[Union[str, Config]] = None,
+                          modes: Union[str, List[str]] = ("dynamic", "int8"),
+                          calibration_data: Union[str, List[str]] = os.path.join(DATA_DIR, "*.yml"),
+                          test_data: Optional[str] = None, output_dir: Optional[str] = None,
+                          repeat: int = 20) -> Dict[str, Any]:
+    """
+    Exports a quantized head for each mode and compares it with the float model on a
+    labelled test CSV (columns "utterance" and "intent"): accuracy and its delta, agreement
+    with the float predictions, head size and latency. Test rows whose intent is not one of
+    the model codes are skipped.
+
+    :param load_model: A path to a saved Keras model (`.keras` file) or a W&B artifact URL.
+    :type load_model: str
+    :param config: A path to a YAML config file or a Config object (for local model files).
+    :type config: str, Config, optional
+    :param modes: Quantization modes (or a comma-separated string) to evaluate.
+    :type modes: str or list[str], optional
+    :param calibration_data: YAML examples files used to calibrate "int8" (see `load_example_texts`).
+    :type calibration_data: str or list[str], optional
+    :param test_data: The test CSV. Defaults to `data/test_data/<dataset_name>_intents_test_data.csv`.
+    :type test_data: str, optional
+    :param output_dir: Where the `.tflite` heads are written. Defaults to the model's directory.
+    :type output_dir: str, optional
+    :param repeat: Number of timed runs behind each latency.
+    :type repeat: int, optional
+    :return: A report with one entry per mode in "results" (the first one is the float model).
+    :rtype: dict
+    """
+    if isinstance(modes, str):
+        modes = [mode.strip() for mode in modes.split(',') if mode.strip()]
+    classifier = IntentClassifier.for_inference(load_model, config=config, prefer_serving=False)
+    test_data = test_data or os.path.join(DATA_DIR, "test_data", f"{classifier.config.dataset_name}_intents_test_data.csv")
+    with open(test_data, newline='', encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    test_rows = [row for row in rows if row["intent"] in classifier.codes]
+    texts, labels = [row["utterance"] for row in test_rows], np.array([row["intent"] for row in test_rows])
+    embeddings = classifier.encode(classifier.preprocess_batch(texts)).numpy()
+    float_probs = classifier.predict_from_embeddings(embeddings)
+    float_labels = np.array([intent for intent, _ in float_probs])
+    float_matrix = np.array([list(probs.values()) for _, probs in float_probs])
+    float_accuracy = float(np.mean(float_labels == labels))
+
+    def measure(mode: str, head_bytes: int, path: Optional[str] = None) -> Dict[str, Any]:
+        predictions = classifier.predict_from_embeddings(embeddings)
+        predicted = np.array([intent for intent, _ in predictions])
+        accuracy = float(np.mean(predicted == labels))
+        return {
+            "mode": mode,
+            "accuracy": accuracy,
+            "accuracy_delta": accuracy - float_accuracy,
+            "agreement": float(np.mean(predicted == float_labels)),
+            "max_prob_diff": float(np.abs(np.array([list(p.values()) for _, p in predictions]) - float_matrix).max()),
+            "head_bytes": head_bytes,
+            "head_ms": _median_ms(lambda: classifier.predict_from_embeddings(embeddings), repeat),
+            "predict_ms": _median_ms(lambda: classifier.predict(texts[0]), repeat),
+            "path": path,
+        }
+
+    # Size of the float head: its weights, in float32
+    results = [measure("float32", sum(int(np.prod(w.shape)) * 4 for w in classifier._get_head().weights))]
+    base_path = os.path.join(output_dir or os.path.dirname(classifier.model_path), Path(classifier.model_path).name)
+    calibration_texts = load_example_texts(calibration_data) if "int8" in modes else None
+    for mode in modes:
+        path = classifier.export_quantized_head(quantized_head_path(base_path, mode), mode,
+                                                calibration_texts=calibration_texts)
+        classifier.load_quantized_head(path)
+        results.append(measure(mode, classifier.quantized_head.size_bytes, path))
+        classifier.quantized_head = None
+    return {
+        "model": load_model,
+        "test_data": test_data,
+        "n_test": len(test_rows),
+        "n_skipped": len(rows) - len(test_rows),
+        # The encoder is shared by all modes: it is not quantized
+        "encode_ms": _median_ms(lambda: classifier.encode(classifier.preprocess_batch(texts[:1])), repeat),
+        "results": results,
+    }
+
+
 # This script works as a module and as a CLI tool
 if __name__ == "__main__":
     import fire
@@ -815,7 +2026,7 @@ if __name__ == "__main__":
         predictions = classifier.predict(input_text)
         print(f"Predictions: {predictions}")
 
-    def cross_validation(config: str, training_data: str, n_splits: int = 3, wandb_project: str = None):
+    def cross_validation(config: str, training_data: str, n_splits: int = 3, n_jobs: int = 1, wandb_project: str = None):
         """
         Run cross-validation on the model.
 
@@ -825,16 +2036,68 @@ if __name__ == "__main__":
         :type training_data: str
         :param n_splits: The number of folds to use.
         :type n_splits: int, optional
+        :param n_jobs: Number of folds run in parallel worker processes.
+        :type n_jobs: int, optional
         :param wandb_project: Name of the Weights & Biases project to log to.
         :type wandb_project: str
         """
         classifier = IntentClassifier(config=config, training_data=training_data, wandb_project=wandb_project)
-        results = classifier.cross_validation(n_splits=n_splits)
+        results = classifier.cross_validation(n_splits=n_splits, n_jobs=n_jobs)
         print("Cross-validation completed successfully!")
         pprint(results)
 
+    def warm_cache(models: str):
+        """
+        Pre-populate the local artifact cache (e.g. at image build time).
+
+        :param models: Comma-separated W&B artifact full names (e.g. "entity/project/confusion-clf:v1,...").
+        :type models: str
+        """
+        if isinstance(models, str):
+            models = models.split(',')
+        for model_full_name in [m.strip() for m in models if m.strip()]:
+            model_file, config_file = fetch_artifact_from_wandb(model_full_name)
+            print(f"Cached '{model_full_name}': {model_file}, {config_file}")
+
+    def quantize(load_model: str, config: str = None, modes: str = "dynamic,int8",
+                 calibration_data: str = os.path.join(DATA_DIR, "*.yml"), test_data: str = None,
+                 output_dir: str = None, output: str = None):
+        """
+        Export quantized heads and compare accuracy, size and latency with the float model.
+
+        :param load_model: Path to the saved Keras model file or W&B URL.
+        :type load_model: str
+        :param config: Path to the YAML configuration file (for local model files).
+        :type config: str
+        :param modes: Comma-separated quantization modes ("dynamic", "int8", "float16").
+        :type modes: str
+        :param calibration_data: YAML examples files used to calibrate "int8".
+        :type calibration_data: str
+        :param test_data: Labelled test CSV. Defaults to the model's `data/test_data` file.
+        :type test_data: str
+        :param output_dir: Where the `.tflite` heads are written. Defaults to the model's directory.
+        :type output_dir: str
+        :param output: File where the JSON report is also written.
+        :type output: str
+        """
+        if isinstance(modes, (tuple, list)):
+            modes = ','.join(modes)
+        report = evaluate_quantization(load_model, config=config, modes=modes, calibration_data=calibration_data,
+                                       test_data=test_data, output_dir=output_dir)
+        print(f"{'mode':<10}{'accuracy':>10}{'delta':>8}{'agree':>8}{'bytes':>10}{'head ms':>10}{'predict ms':>12}")
+        for r in report["results"]:
+            print(f"{r['mode']:<10}{r['accuracy']:>10.3f}{r['accuracy_delta']:>+8.3f}{r['agreement']:>8.3f}"
+                  f"{r['head_bytes']:>10}{r['head_ms']:>10.3f}{r['predict_ms']:>12.3f}")
+        print(f"Encoder: {report['encode_ms']:.3f} ms per text; "
+              f"{report['n_test']} test texts ({report['n_skipped']} skipped).")
+        if output:
+            with open(output, "w") as f:
+                json.dump(report, f, indent=2)
+
     fire.Fire({
         'train': train,
         'predict': predict,
-        'cross_validation': cross_validation
+        'cross_validation': cross_validation,
+        'warm_cache': warm_cache,
+        'quantize': quantize
     }, serialize=False)
\ No newline at end of file
@@ -9,8 +9,21 @@ sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")
 
 from fastapi.testclient import TestClient
 from fastapi import HTTPException
+import asyncio
+import threading
 from app.app import app
-from intent_classifier import IntentClassifier, Config
+from app import services
+from app.executor import InferenceExecutor, ExecutorSaturatedError
+from app.batcher import MicroBatcher
+from app.metrics import MetricsRegistry
+from app.schema import BATCH_MAX_TEXTS, PredictionResponse
+from db import engine
+import time
+from intent_classifier import IntentClassifier, Config, BatchPredictions
+
+# References to the real loader and warm-up, before the autouse fixture replaces them with mocks
+load_all_classifiers = services.load_all_classifiers
+warm_up_classifiers = services.warm_up_classifiers
 
 # --- Fixtures ---
 
@@ -35,6 +48,7 @@ def mock_app_dependencies(monkeypatch, request):
     # Mock the function that loads models during app startup
     mock_load = MagicMock(return_value={"mock-model": mock_model})
     monkeypatch.setattr("app.services.load_all_classifiers", mock_load)
+    monkeypatch.setattr("app.services.warm_up_classifiers", MagicMock(return_value={}))
 
     mock_verify_token = MagicMock(return_value="mock_prod_user")
     monkeypatch.setattr("db.auth.verify_token", mock_verify_token)
@@ -107,6 +121,391 @@ def test_predict_no_models_loaded(client, monkeypatch, mock_app_dependencies):
     mock_collection.insert_one.assert_called_once()
 
 
+def test_predict_returns_503_when_executor_saturated(client, monkeypatch):
+    """Tests that /predict sheds load with 503 when the inference executor is full."""
+    monkeypatch.setattr("app.app.ENV", "dev")
+    monkeypatch.setattr("app.app.INFERENCE_EXECUTOR", InferenceExecutor(max_workers=1, max_queue=0))
+    monkeypatch.setattr("app.app.INFERENCE_EXECUTOR._pending", 1)
+
+    response = client.post("/predict", params={"text": "busy"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+def test_inference_executor_bounds_queue():
+    """Tests that the executor runs work off the event loop and rejects tasks beyond its capacity."""
+    executor = InferenceExecutor(max_workers=1, max_queue=1)
+    release = threading.Event()
+
+    async def scenario():
+        first = asyncio.ensure_future(executor.run(release.wait, 5))
+        second = asyncio.ensure_future(executor.run(lambda: "queued"))
+        await asyncio.sleep(0.05)
+        assert executor.in_flight == 2 and executor.queue_depth == 1
+        with pytest.raises(ExecutorSaturatedError):
+            await executor.run(lambda: "rejected")
+        release.set()
+        return await first, await second
+
+    assert asyncio.run(scenario()) == (True, "queued")
+    assert executor.in_flight == 0
+    executor.shutdown()
+
+
+def test_micro_batcher_groups_concurrent_requests():
+    """Tests that concurrent submissions are grouped into batches and results fan back out in order."""
+    batches = []
+    def process_batch(items):
+        batches.append(list(items))
+        return [item * 10 for item in items]
+
+    executor = InferenceExecutor(max_workers=1, max_queue=8)
+    batcher = MicroBatcher(process_batch, executor, max_batch_size=4, max_wait_ms=50)
+    observed_before = batcher.batch_size.count
+
+    async def scenario():
+        results = await asyncio.gather(*[batcher.submit(i) for i in range(6)])
+        await batcher.stop()
+        return results
+
+    assert asyncio.run(scenario()) == [0, 10, 20, 30, 40, 50]
+    assert [len(b) for b in batches] == [4, 2]
+    assert batcher.batch_size.count - observed_before == 2
+    executor.shutdown()
+
+def test_micro_batcher_rejects_texts_beyond_capacity():
+    """Tests that the batcher queue is bounded by what the executor accepts and rejects the overflow right away."""
+    release = threading.Event()
+    def process_batch(items):
+        release.wait(5)
+        return list(items)
+
+    executor = InferenceExecutor(max_workers=1, max_queue=0)
+    batcher = MicroBatcher(process_batch, executor, max_batch_size=2, max_wait_ms=10)
+    assert batcher.max_queue_size == 2
+
+    async def scenario():
+        # All three are enqueued before the collector runs: the third one finds the queue full
+        results = asyncio.gather(*[batcher.submit(i) for i in range(3)], return_exceptions=True)
+        await asyncio.sleep(0.1)
+        # The first batch holds the only worker: new texts are rejected without being enqueued
+        with pytest.raises(ExecutorSaturatedError):
+            await batcher.submit(3)
+        release.set()
+        results = await results
+        await batcher.stop()
+        return results
+
+    first, second, third = asyncio.run(scenario())
+    assert (first, second) == (0, 1) and isinstance(third, ExecutorSaturatedError)
+    executor.shutdown()
+
+def test_predict_returns_503_when_micro_batcher_is_full(client, monkeypatch):
+    """Tests that /predict answers 503 at enqueue time when micro-batching is on and the executor is full."""
+    monkeypatch.setattr("app.app.ENV", "dev")
+    executor = InferenceExecutor(max_workers=1, max_queue=0)
+    executor._pending = 1
+    monkeypatch.setattr("app.app.BATCHER", MicroBatcher(lambda texts: texts, executor, max_batch_size=8))
+
+    response = client.post("/predict", params={"text": "busy"})
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+def test_predict_with_micro_batching(client, monkeypatch, mock_app_dependencies):
+    """Tests POST /predict when micro-batching is enabled: the model receives a list of texts."""
+    monkeypatch.setattr("app.app.ENV", "dev")
+    mock_collection, mock_model, _ = mock_app_dependencies
+    mock_model.predict.side_effect = lambda texts: [("mock_intent", {"mock_intent": 0.9, "other": 0.1})] * len(texts)
+    monkeypatch.setattr("app.app.BATCHER.max_batch_size", 8)
+
+    response = client.post("/predict", params={"text": "batched"})
+    assert response.status_code == 200
+    assert response.json()["predictions"]["mock-model"]["top_intent"] == "mock_intent"
+    mock_model.predict.assert_called_once_with(["batched"])
+    mock_collection.insert_one.assert_called_once()
+    assert client.get("/stats").json()["micro_batch_size"]["count"] >= 1
+
+
+def test_predict_batch(client, monkeypatch, mock_app_dependencies):
+    """Tests POST /predict/batch: one vectorized predict per model and one insert_many."""
+    monkeypatch.setattr("db.auth.ENV", "dev")
+    mock_collection, mock_model, _ = mock_app_dependencies
+    mock_model.predict.side_effect = lambda texts: [("mock_intent", {"mock_intent": 0.9, "other": 0.1})] * len(texts)
+    mock_collection.insert_many.return_value.inserted_ids = ["id-1", "id-2", "id-3"]
+
+    texts = ["um", "dois", "três"]
+    response = client.post("/predict/batch", json={"texts": texts})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert [item["text"] for item in data] == texts
+    assert [item["id"] for item in data] == ["id-1", "id-2", "id-3"]
+    assert all(item["predictions"]["mock-model"]["top_intent"] == "mock_intent" for item in data)
+    mock_model.predict.assert_called_once_with(texts)
+    mock_collection.insert_many.assert_called_once()
+    mock_collection.insert_one.assert_not_called()
+
+def test_predict_batch_compact(client, monkeypatch, mock_app_dependencies):
+    """Tests POST /predict/batch with compact output: codes, top intents and the probability matrix per model."""
+    monkeypatch.setattr("db.auth.ENV", "dev")
+    mock_collection, mock_model, _ = mock_app_dependencies
+    mock_model.predict_batch.side_effect = lambda texts: BatchPredictions(
+        ["mock_intent", "other"], [[0.9, 0.1], [0.25, 0.75]][:len(texts)])
+    mock_collection.insert_many.return_value.inserted_ids = ["id-1", "id-2"]
+
+    response = client.post("/predict/batch", json={"texts": ["um", "dois"], "compact": True, "top_k": 1})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["ids"] == ["id-1", "id-2"] and data["owner"] == "dev_user"
+    predictions = data["predictions"]["mock-model"]
+    assert predictions["codes"] == ["mock_intent", "other"]
+    assert predictions["top_intents"] == ["mock_intent", "other"]
+    assert predictions["probs"] == [[0.9, 0.1], [0.25, 0.75]]
+    assert predictions["top_k"]["intents"] == [["mock_intent"], ["other"]]
+    mock_model.predict.assert_not_called()
+    # Only the response is compact: the log documents keep the PredictionResponse schema
+    logged = mock_collection.insert_many.call_args[0][0]
+    assert logged[1] == PredictionResponse(
+        id=logged[1]["id"], text="dois", owner="dev_user", timestamp=data["timestamp"],
+        predictions={"mock-model": {"top_intent": "other", "all_probs": {"mock_intent": 0.25, "other": 0.75}}},
+    ).model_dump()
+
+def test_predict_batch_rejects_too_many_texts(client, monkeypatch, mock_app_dependencies):
+    """Tests that /predict/batch validates the maximum number of texts per request."""
+    monkeypatch.setattr("db.auth.ENV", "dev")
+    response = client.post("/predict/batch", json={"texts": ["x"] * (BATCH_MAX_TEXTS + 1)})
+    assert response.status_code == 422
+    assert client.post("/predict/batch", json={"texts": []}).status_code == 422
+
+
+def test_mongo_client_is_shared(monkeypatch):
+    """Tests that every collection lookup reuses one pooled MongoClient until it is closed."""
+    mock_client_cls = MagicMock()
+    monkeypatch.setattr("db.engine.MongoClient", mock_client_cls)
+    monkeypatch.setattr("db.engine.MONGO_URI", "mongodb://localhost")
+    monkeypatch.setattr("db.engine.MONGO_DB", "test_db")
+    monkeypatch.setattr("db.engine._client", None)
+
+    first = engine.get_mongo_client()
+    engine.get_mongo_collection("api_tokens")
+    assert engine.get_mongo_client() is first
+    mock_client_cls.assert_called_once()
+    assert mock_client_cls.call_args.kwargs["maxPoolSize"] == engine.MONGO_MAX_POOL_SIZE
+
+    engine.close_mongo_client()
+    first.close.assert_called_once()
+    assert engine._client is None
+
+
+def test_load_all_classifiers_in_parallel(monkeypatch):
+    """Tests that models load concurrently, keep the URL order and report per-phase timings."""
+    # Each load only returns once all three are in progress: a serial loader breaks the barrier
+    barrier = threading.Barrier(3)
+
+    def slow_load(url):
+        barrier.wait(timeout=10)
+        model = MagicMock(spec=IntentClassifier)
+        model.load_timings = {"download": 0.1, "deserialize": 0.2, "warm_up": 0.0}
+        return model
+    monkeypatch.setattr("app.services.load_classifier", slow_load)
+    monkeypatch.setattr("app.services.LOAD_TIMINGS", {})
+
+    models = load_all_classifiers("e/p/confusion-clf:v1, e/p/clair-clf:v1, e/p/other-clf:v2")
+    assert list(models) == ["confusion-clf", "clair-clf", "other-clf"]
+    assert services.LOAD_TIMINGS["clair-clf"] == {"download": 0.1, "deserialize": 0.2, "warm_up": 0.0}
+
+
+def test_load_all_classifiers_fails_if_any_model_fails(monkeypatch):
+    """Tests that a failure loading any model aborts the startup."""
+    def failing_load(url):
+        if "clair" in url:
+            raise ValueError("artifact not found")
+        return MagicMock(spec=IntentClassifier, load_timings={})
+    monkeypatch.setattr("app.services.load_classifier", failing_load)
+
+    with pytest.raises(Exception, match="clair-clf:v1"):
+        load_all_classifiers("e/p/confusion-clf:v1,e/p/clair-clf:v1")
+
+def test_ready_only_after_warm_up(client, monkeypatch):
+    """Tests that startup warms up the loaded models and /ready then reports them."""
+    from app import app as app_module
+    services.warm_up_classifiers.assert_called_once()
+    models, batch_sizes = services.warm_up_classifiers.call_args.args
+    assert list(models) == ["mock-model"]
+    assert 1 in batch_sizes
+
+    response = client.get("/ready")
+    assert response.status_code == 200
+    assert response.json() == {"status": "ready", "models": ["mock-model"]}
+
+    monkeypatch.setattr(app_module, "READY", False)
+    assert client.get("/ready").status_code == 503
+
+
+def test_not_ready_when_warm_up_fails(monkeypatch, mock_app_dependencies):
+    """Tests that a failed warm-up keeps /ready at 503 instead of reporting an unwarmed app as ready."""
+    monkeypatch.setattr("app.services.warm_up_classifiers", MagicMock(side_effect=RuntimeError("OOM")))
+    with TestClient(app) as client:
+        response = client.get("/ready")
+        assert response.status_code == 503
+        assert response.json()["status"] == "warm_up_failed"
+        assert "OOM" in response.json()["error"]
+
+
+def test_warm_up_runs_each_batch_size(monkeypatch):
+    """Tests that warm-up runs the CSV utterances through the models at every batch size."""
+    monkeypatch.setattr("app.services.LOAD_TIMINGS", {})
+    model = MagicMock(spec=IntentClassifier)
+    model.predict.side_effect = lambda texts: (("a", {"a": 1.0}) if isinstance(texts, str)
+                                               else [("a", {"a": 1.0})] * len(texts))
+
+    texts = services.load_warm_up_texts()
+    assert len(texts) > 8
+    timings = warm_up_classifiers({"m": model}, [1, 8])
+
+    assert isinstance(model.predict.call_args_list[0].args[0], str)
+    assert model.predict.call_args_list[1].args[0] == texts[:8]
+    assert set(timings) == {"batch_1", "batch_8"}
+    assert services.LOAD_TIMINGS["warm_up"] == timings
+
+
+def test_admin_reload_swaps_model_and_rolls_back(client, monkeypatch, mock_app_dependencies):
+    """Tests hot reload of a new model version and instant rollback, without mutating the old models dict."""
+    from app import app as app_module
+    monkeypatch.setattr("db.auth.ENV", "dev")
+    _, mock_model, _ = mock_app_dependencies
+    monkeypatch.setattr("app.services.LOAD_TIMINGS", {})
+    new_model = MagicMock(spec=IntentClassifier, load_timings={})
+    new_model.predict.return_value = ("new_intent", {"new_intent": 1.0})
+    monkeypatch.setattr("app.services.load_classifier", lambda url: new_model)
+    models_before = app_module.MODELS
+
+    response = client.post("/admin/models/reload", json={"url": "e/p/mock-model:v2", "wait": True})
+    assert response.status_code == 200
+    assert response.json()["models"]["mock-model"]["url"] == "e/p/mock-model:v2"
+    assert models_before["mock-model"] is mock_model  # in-flight requests keep the old dict
+    assert client.post("/predict", params={"text": "oi"}).json()["predictions"]["mock-model"]["top_intent"] == "new_intent"
+
+    mock_model.load_timings = {"download": 0.3}
+    assert client.post("/admin/models/mock-model/rollback").status_code == 200
+    assert client.post("/predict", params={"text": "oi"}).json()["predictions"]["mock-model"]["top_intent"] == "mock_intent"
+    status = client.get("/admin/models").json()
+    assert status["models"]["mock-model"]["previous"]["url"] == "e/p/mock-model:v2"
+    # The rollback updates the same bookkeeping as a reload
+    assert status["last_reload"]["rollback"] and status["last_reload"]["status"] == "done"
+    assert status["last_reload"]["url"] == status["models"]["mock-model"]["url"]
+    assert services.LOAD_TIMINGS["mock-model"] == {"download": 0.3}
+
+
+def test_admin_reload_keeps_startup_warm_up_and_rejects_concurrent_reloads(client, monkeypatch, mock_app_dependencies):
+    """Tests that a reload records its warm-up under the model's own timings and that a second reload gets 409 right away."""
+    from app import app as app_module
+    monkeypatch.setattr("db.auth.ENV", "dev")
+    monkeypatch.setattr("app.services.LOAD_TIMINGS", {"warm_up": {"batch_1": 1.0}})
+    monkeypatch.setattr("app.services.warm_up_classifiers", MagicMock(return_value={"batch_1": 0.25, "batch_8": 0.5}))
+    monkeypatch.setattr("app.services.load_classifier",
+                        lambda url: MagicMock(spec=IntentClassifier, load_timings={"download": 0.1}))
+
+    assert client.post("/admin/models/reload", json={"url": "e/p/mock-model:v2", "wait": True}).status_code == 200
+    assert services.warm_up_classifiers.call_args.kwargs["record"] is False
+    assert services.LOAD_TIMINGS["warm_up"] == {"batch_1": 1.0}
+    assert services.LOAD_TIMINGS["mock-model"] == {"download": 0.1, "warm_up": 0.75}
+
+    app_module.MODEL_REGISTRY.begin_reload()
+    try:
+        assert client.post("/admin/models/reload", json={"url": "e/p/mock-model:v3"}).status_code == 409
+    finally:
+        app_module.MODEL_REGISTRY._reload_lock.release()
+
+
+def test_admin_reload_failure_keeps_current_model(client, monkeypatch, mock_app_dependencies):
+    """Tests that a failed reload (e.g. missing artifact) leaves the current version serving."""
+    monkeypatch.setattr("db.auth.ENV", "dev")
+    def failing_load(url):
+        raise ValueError("artifact not found")
+    monkeypatch.setattr("app.services.load_classifier", failing_load)
+
+    response = client.post("/admin/models/reload", json={"url": "e/p/mock-model:v9", "wait": True})
+    assert response.status_code == 500
+    assert client.get("/admin/models").json()["last_reload"]["status"] == "failed"
+    assert client.post("/predict", params={"text": "oi"}).json()["predictions"]["mock-model"]["top_intent"] == "mock_intent"
+    assert client.post("/admin/models/reload", json={"url": "e/p/unknown-clf:v1"}).status_code == 404
+    assert client.post("/admin/models/mock-model/rollback").status_code == 404
+
+
+def test_admin_routes_require_admin_token(client, monkeypatch):
+    """Tests that admin routes are disabled in prod without ADMIN_TOKEN and check it when set."""
+    monkeypatch.setattr("db.auth.ENV", "prod")
+    monkeypatch.setattr("db.auth.ADMIN_TOKEN", None)
+    assert client.get("/admin/models").status_code == 403
+
+    monkeypatch.setattr("db.auth.ADMIN_TOKEN", "secret")
+    assert client.get("/admin/models", headers={"Authorization": "Bearer wrong"}).status_code == 403
+    assert client.get("/admin/models", headers={"Authorization": "Bearer secret"}).status_code == 200
+
+
+def test_metrics_registry_renders_prometheus_text():
+    """Tests labeled series, histogram buckets and collectors in the Prometheus text format."""
+    registry = MetricsRegistry()
+    registry.counter("requests_total", "Requests.", labels={"path": "/predict"}).inc(2)
+    registry.counter("requests_total", "Requests.", labels={"path": '/a"b'}).inc()
+    with registry.histogram("latency_seconds", buckets=[0.1, 1.0]).time():
+        pass
+    registry.gauge("in_flight", collect=lambda: 3)
+    registry.register_collector("cache", lambda: {"hits": 5, "models": {"a": 1}, "name": "x"})
+
+    text = registry.render_prometheus()
+
+    assert "# TYPE requests_total counter" in text
+    assert text.count("# TYPE requests_total") == 1
+    assert 'requests_total{path="/predict"} 2.0' in text
+    assert 'requests_total{path="/a\\"b"} 1.0' in text
+    assert 'latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{le="+Inf"} 1' in text
+    assert "latency_seconds_count 1" in text
+    assert "in_flight 3.0" in text
+    assert "cache_hits 5.0" in text
+    assert "cache_models" not in text and "cache_name" not in text
+    assert registry.snapshot()['requests_total{path="/predict"}']["value"] == 2
+
+
+def test_metrics_endpoint_exposes_request_and_stage_metrics(client, monkeypatch, mock_app_dependencies):
+    """Tests that /metrics reports HTTP, per-stage and per-model prediction metrics."""
+    monkeypatch.setattr("db.auth.ENV", "dev")
+    assert client.post("/predict", params={"text": "hello metrics"}).status_code == 200
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    text = response.text
+    assert 'http_requests_total{method="POST",path="/predict",status="200"}' in text
+    assert 'http_request_duration_seconds_bucket{method="POST",path="/predict",le="+Inf"}' in text
+    assert 'predictions_total{model="mock-model",owner="dev_user"}' in text
+    for stage in ("auth", "inference", "format", "log"):
+        assert f'prediction_stage_seconds_count{{stage="{stage}"}}' in text
+    assert "inference_in_flight" in text
+
+
+def test_admin_profiling_samples_predictions(client, monkeypatch, mock_app_dependencies, tmp_path):
+    """Tests that the admin endpoint turns on sampled profiling and that /predict writes a profile."""
+    from app.profiling import PROFILER
+    monkeypatch.setattr("db.auth.ENV", "dev")
+    monkeypatch.setattr(PROFILER, "output_dir", str(tmp_path))
+    monkeypatch.setattr(PROFILER, "sample_rate", 0.0)
+    mock_collection, mock_model, _ = mock_app_dependencies
+
+    response = client.post("/admin/profiling", json={"sample_rate": 1.0})
+    assert response.status_code == 200 and response.json()["enabled"]
+    assert client.post("/predict", params={"text": "profile me"}).status_code == 200
+    assert client.post("/admin/profiling", json={"sample_rate": 2}).status_code == 422
+
+    (sample_dir,) = tmp_path.iterdir()
+    assert (sample_dir / "profile.prof").exists()
+    assert client.get("/admin/profiling").json()["recent"][-1]["endpoint"] == "/predict"
+    mock_model.predict.assert_called_once_with("profile me")
+
+
 # --- Integration Test ---
 
 @pytest.mark.integration
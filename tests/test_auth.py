@@ -0,0 +1,77 @@
+import os
+import sys
+import pytest
+from unittest.mock import MagicMock
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from fastapi import HTTPException
+from db import auth
+
+# --- Fixtures ---
+
+@pytest.fixture
+def token_collections(monkeypatch):
+    """Mocks the api_tokens/api_tokens_meta collections and gives each test an empty token cache."""
+    collections = {"api_tokens": MagicMock(), auth.TOKENS_META_COLLECTION: MagicMock()}
+    collections[auth.TOKENS_META_COLLECTION].find_one.return_value = {"_id": "version", "value": 1}
+    monkeypatch.setattr("db.auth.get_mongo_collection", lambda name: collections[name])
+    monkeypatch.setattr("db.auth.TOKEN_CACHE", auth.TokenCache(max_size=2, ttl_seconds=60, version_check_seconds=0))
+    return collections
+
+def make_request(token):
+    request = MagicMock()
+    request.headers = {"Authorization": f"Bearer {token}"}
+    return request
+
+# --- Unit Tests ---
+
+def test_verify_token_uses_cache(token_collections):
+    """A cached token is verified without a second find_one."""
+    tokens = token_collections["api_tokens"]
+    tokens.find_one.return_value = {"token": "t1", "owner": "alice", "expires_at": datetime.utcnow() + timedelta(days=1)}
+
+    assert auth.verify_token(make_request("t1")) == "alice"
+    assert auth.verify_token(make_request("t1")) == "alice"
+    tokens.find_one.assert_called_once()
+
+def test_verify_token_cache_honours_expiry(token_collections):
+    """A cached token that has expired since it was cached is rejected."""
+    tokens = token_collections["api_tokens"]
+    tokens.find_one.return_value = {"token": "t1", "owner": "alice", "expires_at": datetime.utcnow() + timedelta(days=1)}
+    auth.verify_token(make_request("t1"))
+    auth.TOKEN_CACHE.set("t1", {"owner": "alice", "expires_at": datetime.utcnow() - timedelta(seconds=1)})
+
+    with pytest.raises(HTTPException, match="Token expired"):
+        auth.verify_token(make_request("t1"))
+
+def test_verify_token_cache_invalidated_by_version_stamp(token_collections):
+    """A change in the tokens version stamp (e.g. a token deactivated elsewhere) empties the cache."""
+    tokens = token_collections["api_tokens"]
+    tokens.find_one.return_value = {"token": "t1", "owner": "alice", "expires_at": datetime.utcnow() + timedelta(days=1)}
+    auth.verify_token(make_request("t1"))
+
+    token_collections[auth.TOKENS_META_COLLECTION].find_one.return_value = {"_id": "version", "value": 2}
+    tokens.find_one.return_value = None
+    with pytest.raises(HTTPException, match="Invalid or inactive token"):
+        auth.verify_token(make_request("t1"))
+
+def test_token_manager_deactivate_bumps_version(token_collections):
+    """Deactivating a token bumps the version stamp and clears the local cache."""
+    auth.TOKEN_CACHE.set("t1", {"owner": "alice", "expires_at": datetime.utcnow() + timedelta(days=1)})
+    auth.TokenManager().deactivate("t1")
+
+    token_collections["api_tokens"].update_one.assert_called_once_with({"token": "t1"}, {"$set": {"active": False}})
+    token_collections[auth.TOKENS_META_COLLECTION].update_one.assert_called_once()
+    assert auth.TOKEN_CACHE.get("t1") is None
+
+def test_token_cache_is_bounded():
+    """The least recently used token is evicted when the cache is full."""
+    cache = auth.TokenCache(max_size=2, ttl_seconds=60)
+    cache.set("a", {"owner": "a"})
+    cache.set("b", {"owner": "b"})
+    cache.get("a")
+    cache.set("c", {"owner": "c"})
+    assert cache.get("b") is None
+    assert cache.get("a") == {"owner": "a"} and cache.get("c") == {"owner": "c"}
@@ -0,0 +1,173 @@
+import os
+import sys
+import pytest
+import numpy as np
+import tensorflow as tf
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app import services
+from app.registry import ModelRegistry
+from app.cache import PredictionCache, LocalLRUBackend, RedisBackend, make_key
+from intent_classifier import BatchPredictions
+
+# --- Fixtures ---
+
+class FakeRedis:
+    """Stand-in local para um cliente Redis (apenas os comandos usados pelo cache)."""
+    def __init__(self):
+        self.data = {}
+
+    def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value.encode("utf-8") if isinstance(value, str) else value
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def scan_iter(self, match):
+        return [key for key in list(self.data) if key.startswith(match.rstrip("*"))]
+
+class FakeClassifier:
+    """Classificador mínimo: pré-processamento em minúsculas e contagem das inferências."""
+    def __init__(self, model_version="v1"):
+        self.model_version = model_version
+        self.codes = ["ping"]
+        self.load_timings = {}
+        self.calls = []
+        self.preprocessed = []
+
+    def preprocess_batch(self, texts):
+        self.preprocessed.append(list(texts))
+        return tf.constant([t.lower() for t in texts])
+
+    def predict(self, input_text, preprocessed=False):
+        if not preprocessed:
+            texts = [input_text] if isinstance(input_text, str) else input_text
+            texts = [t.decode("utf-8") for t in self.preprocess_batch(texts).numpy()]
+            input_text = texts[0] if isinstance(input_text, str) else texts
+        self.calls.append(input_text)
+        texts = [input_text] if isinstance(input_text, str) else input_text
+        results = [("ping", {"ping": 1.0}) for _ in texts]
+        return results[0] if isinstance(input_text, str) else results
+
+    def predict_batch(self, texts, preprocessed=False):
+        if not preprocessed:
+            texts = [t.decode("utf-8") for t in self.preprocess_batch(texts).numpy()]
+        self.calls.append(list(texts))
+        return BatchPredictions(["ping"], np.ones((len(texts), 1), dtype=np.float32))
+
+@pytest.fixture(params=["local", "redis"])
+def cache(request, monkeypatch):
+    backend = LocalLRUBackend(max_bytes=1 << 20) if request.param == "local" else RedisBackend(FakeRedis())
+    prediction_cache = PredictionCache(backend)
+    monkeypatch.setattr("app.services.PREDICTION_CACHE", prediction_cache)
+    monkeypatch.setattr("app.services.SHARED_ENCODER", False)
+    return prediction_cache
+
+def make_probs(n_codes=4):
+    return np.full(n_codes, 1 / n_codes, dtype=np.float32)
+
+# --- Unit Tests ---
+
+def test_cache_hit_skips_inference(cache):
+    """Um texto repetido (após o pré-processamento) é respondido pelo cache, sem inferência."""
+    model = FakeClassifier()
+    hits, misses = cache.hits.value, cache.misses.value
+
+    first = services.predict_intents("Oi", {"m": model})
+    second = services.predict_intents("oi", {"m": model})
+    assert model.calls == ["oi"]
+    assert second == first
+    assert cache.hits.value - hits == 1 and cache.misses.value - misses == 1
+
+def test_cache_batch_runs_only_missing_texts(cache):
+    """Num lote, só os textos que não estão no cache passam pelos modelos, e a ordem é mantida."""
+    model = FakeClassifier()
+    services.predict_intents("ping", {"m": model})
+    results = services.predict_intents(["ping", "Are you there?"], {"m": model})
+    assert model.calls == ["ping", ["are you there?"]]
+    assert len(results) == 2
+    # Os textos fora do cache vão para a inferência já pré-processados (uma vez por requisição)
+    assert model.preprocessed == [["ping"], ["ping", "Are you there?"]]
+
+def test_compact_predictions_use_the_same_cache(cache):
+    """A versão compacta lê e grava as mesmas entradas do cache que `predict_intents`."""
+    model = FakeClassifier()
+    services.predict_intents("ping", {"m": model})
+    results = services.predict_intents_compact(["Ping", "are you there?"], {"m": model})
+    assert model.calls == ["ping", ["are you there?"]]
+    assert results["m"].top_intents == ["ping", "ping"]
+    assert results["m"].probs.tolist() == [[1.0], [1.0]]
+
+    services.predict_intents("are you there?", {"m": model})
+    assert len(model.calls) == 2
+    assert len(model.preprocessed) == 3
+
+def test_loading_models_keeps_the_shared_cache(cache, monkeypatch):
+    """O startup não limpa o cache (compartilhado entre réplicas no Redis): as chaves já levam a versão."""
+    model = FakeClassifier()
+    services.predict_intents("oi", {"m": model})
+    monkeypatch.setattr("app.services.load_classifier", lambda url: FakeClassifier())
+    models = services.load_all_classifiers("e/p/m:v1")
+
+    services.predict_intents("oi", models)
+    assert models["m"].calls == []
+
+def test_cache_keyed_by_model_version_and_cleared(cache):
+    """Outra versão do modelo não lê resultados antigos, e `clear` invalida as entradas."""
+    services.predict_intents("oi", {"m": FakeClassifier("v1")})
+    reloaded = FakeClassifier("v2")
+    services.predict_intents("oi", {"m": reloaded})
+    assert reloaded.calls == ["oi"]
+
+    cache.clear("m")
+    services.predict_intents("oi", {"m": reloaded})
+    assert reloaded.calls == ["oi", "oi"]
+
+def test_models_without_version_are_not_cached(cache):
+    """Modelos sem versão (ex.: treinados no próprio processo) sempre executam a inferência."""
+    model = FakeClassifier(model_version=None)
+    services.predict_intents("oi", {"m": model})
+    services.predict_intents("oi", {"m": model})
+    assert model.calls == ["oi", "oi"]
+
+def test_model_swap_keeps_the_shared_cache(cache):
+    """Trocar e voltar a versão de um modelo não limpa o cache: a versão restaurada reaproveita as suas entradas."""
+    registry = ModelRegistry()
+    current = FakeClassifier("v1")
+    registry.publish({"m": current}, {"m": "e/p/m:v1"})
+    services.predict_intents("oi", registry.models)
+
+    registry.reload("e/p/m:v2", [], load=lambda url: FakeClassifier("v2"))
+    services.predict_intents("oi", registry.models)
+    assert registry.models["m"].calls == ["oi"]
+    registry.rollback("m")
+    services.predict_intents("oi", registry.models)
+    assert current.calls == ["oi"]
+
+def test_local_lru_respects_memory_cap():
+    """O LRU local descarta as entradas menos usadas quando passa do limite de memória."""
+    entry_size = len(make_key("m", "v1", "a")) + make_probs().nbytes
+    backend = LocalLRUBackend(max_bytes=2 * entry_size)
+    backend.set_many({make_key("m", "v1", "a"): make_probs()})
+    backend.set_many({make_key("m", "v1", "b"): make_probs()})
+    backend.get_many([make_key("m", "v1", "a")])
+    backend.set_many({make_key("m", "v1", "c"): make_probs()})
+
+    assert set(backend.get_many([make_key("m", "v1", k) for k in "abc"])) == {make_key("m", "v1", "a"), make_key("m", "v1", "c")}
+    assert backend.stats()["bytes"] <= backend.max_bytes
+    assert backend.stats()["evictions"] == 1
+
+def test_cache_stores_probability_rows(cache):
+    """O cache guarda a linha de probabilidades (float32) de cada texto, não um dict por código."""
+    model = FakeClassifier()
+    services.predict_intents_compact(["oi"], {"m": model})
+    key = make_key("m", "v1", "oi")
+    assert cache.get_many([key])[key].tolist() == [1.0]
+    # O caminho por texto remonta o SinglePrediction a partir da linha
+    assert services.predict_intents("oi", {"m": model})["m"].all_probs == {"ping": 1.0}
+    assert model.calls == [["oi"]]
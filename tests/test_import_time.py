@@ -0,0 +1,18 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from benchmarks.import_time import measure_import, FORBIDDEN_MODULES
+
+# --- Unit Tests ---
+
+def test_api_import_does_not_load_training_dependencies():
+    """Importing the API (in a fresh process) must not load W&B or tensorflow_text."""
+    result = measure_import("app.app", watched=FORBIDDEN_MODULES)
+    assert result["loaded"] == []
+
+def test_intent_classifier_import_does_not_load_training_dependencies():
+    """The classifier module loads its training dependencies only when they are used."""
+    result = measure_import("intent_classifier", watched=FORBIDDEN_MODULES)
+    assert result["loaded"] == []
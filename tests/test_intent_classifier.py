@@ -1,16 +1,22 @@
 import os
 import sys
+import time
+import threading
 import yaml
 import pytest
 import numpy as np
 import pandas as pd
 import tensorflow as tf
+from unittest.mock import MagicMock
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from intent_classifier import IntentClassifier, Config
+from intent_classifier import IntentClassifier, Config, BatchPredictions, predict_with_shared_encoder, load_hub_module, ArtifactCache, fetch_artifact_from_wandb, serving_model_path, quantized_head_path, evaluate_quantization
 from sklearn.metrics import classification_report, confusion_matrix
 
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
+EXAMPLES_PATH = os.path.join(os.path.dirname(__file__), "..", "intent_classifier", "data", "confusion_intents.yml")
+
 # --- Fixtures (Contextos de Teste) ---
 @pytest.fixture(scope="session")
 def paths():
@@ -112,6 +118,41 @@ def clf_with_stopwords(tmp_path):
     )
     return IntentClassifier(config=config)
 
+@pytest.fixture(scope="session")
+def stub_encoder(tmp_path_factory):
+    """Sentence encoder local (SavedModel) que substitui o USE nos testes offline."""
+    class StubEncoder(tf.Module):
+        @tf.function(input_signature=[tf.TensorSpec([None], tf.string)])
+        def __call__(self, texts):
+            return tf.one_hot(tf.strings.to_hash_bucket_fast(texts, 16), 16)
+
+    encoder_path = str(tmp_path_factory.mktemp("stub_encoder"))
+    tf.saved_model.save(StubEncoder(), encoder_path)
+    return encoder_path
+
+@pytest.fixture(scope="session")
+def stub_encoder_with_variable(tmp_path_factory):
+    """Encoder substituto com pesos (`tf.Variable`), para verificar que o encoder fica congelado no treino."""
+    class StubEncoderWithVariable(tf.Module):
+        def __init__(self):
+            super().__init__()
+            self.projection = tf.Variable(tf.random.stateless_normal((16, 16), seed=(1, 2)), name="projection")
+
+        @tf.function(input_signature=[tf.TensorSpec([None], tf.string)])
+        def __call__(self, texts):
+            return tf.matmul(tf.one_hot(tf.strings.to_hash_bucket_fast(texts, 16), 16), self.projection)
+
+    encoder_path = str(tmp_path_factory.mktemp("stub_encoder_with_variable"))
+    tf.saved_model.save(StubEncoderWithVariable(), encoder_path)
+    return encoder_path
+
+def make_untrained_classifier(embedding_model, codes, **config_kwargs):
+    """Cria um classificador com pesos aleatórios sobre o encoder informado (sem treino)."""
+    config = Config(embedding_model=embedding_model, codes=codes, **config_kwargs)
+    classifier = IntentClassifier(config=config)
+    classifier.model = classifier.make_model(config)
+    return classifier
+
 # --- Testes de Unidade (Rápidos) ---
 
 def test_init_fails_without_config_or_model(monkeypatch):
@@ -128,7 +169,326 @@ def test_preprocess_text_stopwords(clf_with_stopwords):
     result_tensor = clf_with_stopwords.preprocess_text("uma frase de teste")
     assert result_tensor.numpy() == b'frase teste'
 
+# Saídas de referência do pré-processamento original (tf.map_fn + preprocess_text escalar)
+PREPROCESS_INPUTS = ["Oi", "oi?", "Uma frase de TESTE!", "what??  is,this. thing", "de", "  espaços   extras  ", "Olá, tudo bem?", ""]
+
+@pytest.mark.parametrize("min_words, with_stop_words, expected", [
+    (1, False, ["<> <>", "<> <>", "uma frase de teste EXCLAMATION_MARK",
+                "what QUESTION_MARK QUESTION_MARK is COMMA this PERIOD thing",
+                "<> <>", "espaços extras", "olá COMMA tudo bem QUESTION_MARK", "<> <>"]),
+    (0, False, ["oi", "oi QUESTION_MARK", "uma frase de teste EXCLAMATION_MARK",
+                "what QUESTION_MARK QUESTION_MARK is COMMA this PERIOD thing",
+                "de", "espaços extras", "olá COMMA tudo bem QUESTION_MARK", ""]),
+    (1, True, ["<> <>", "<> <>", "frase teste EXCLAMATION_MARK",
+               "what QUESTION_MARK QUESTION_MARK is COMMA this PERIOD thing",
+               "<> <>", "espaços extras", "olá COMMA tudo bem QUESTION_MARK", "<> <>"]),
+    (3, True, ["<> <> <> <>"] * 8),
+])
+def test_preprocess_batch_matches_reference(tmp_path, min_words, with_stop_words, expected):
+    """O pré-processamento em lote produz exatamente as saídas do pré-processamento original."""
+    stop_words_file = None
+    if with_stop_words:
+        stop_words_file = tmp_path / "stopwords.txt"
+        stop_words_file.write_text("um\numa\nde\ndo")
+    clf = IntentClassifier(config=Config(codes=["intent_a"], min_words=min_words,
+                                         stop_words_file=str(stop_words_file) if stop_words_file else None))
+
+    batch = [t.decode("utf-8") for t in clf.preprocess_batch(PREPROCESS_INPUTS).numpy()]
+    assert batch == expected
+    assert [clf.preprocess_text(t).numpy().decode("utf-8") for t in PREPROCESS_INPUTS] == expected
+
+def test_shared_encoder_matches_individual_predictions(stub_encoder):
+    """Modelos com o mesmo encoder compartilham o módulo e produzem as mesmas predições."""
+    clf_a = make_untrained_classifier(stub_encoder, ["a1", "a2"], sent_hl_units=4)
+    clf_b = make_untrained_classifier(stub_encoder, ["b1", "b2", "b3"], sent_hl_units=4, min_words=0)
+    assert clf_a.model.get_layer("sent_encoder").hub_module is clf_b.model.get_layer("sent_encoder").hub_module
+
+    texts = ["oi tudo bem?", "clair, are you there?", "oi tudo bem?"]
+    shared = predict_with_shared_encoder({"a": clf_a, "b": clf_b}, texts)
+    for name, clf in {"a": clf_a, "b": clf_b}.items():
+        for (shared_intent, shared_probs), (intent, probs) in zip(shared[name], clf.predict(texts)):
+            assert shared_intent == intent
+            assert shared_probs == pytest.approx(probs, abs=1e-6)
+
+    top_intent, probs = predict_with_shared_encoder({"a": clf_a, "b": clf_b}, "oi")["b"]
+    assert top_intent in clf_b.codes
+    # Textos já pré-processados por cada modelo não são pré-processados de novo
+    preprocessed = {name: [t.decode("utf-8") for t in clf.preprocess_batch(texts).numpy()]
+                    for name, clf in {"a": clf_a, "b": clf_b}.items()}
+    assert predict_with_shared_encoder({"a": clf_a, "b": clf_b}, texts, preprocessed=preprocessed) == shared
+
+def test_train_with_cached_embeddings(stub_encoder_with_variable, tmp_path):
+    """Com cache_embeddings, só a cabeça é treinada e os embeddings são persistidos em disco."""
+    config = Config(dataset_name="cached", embedding_model=stub_encoder_with_variable, epochs=2,
+                    callback_patience=1, sent_hl_units=4, cache_embeddings=True,
+                    embedding_cache_dir=str(tmp_path))
+    clf = IntentClassifier(config=config, training_data=EXAMPLES_PATH)
+    # O modelo do treino usa o mesmo módulo do encoder (um por URL, ver `load_hub_module`)
+    encoder = load_hub_module(stub_encoder_with_variable)
+    encoder_weights = encoder.projection.numpy().copy()
+    clf.train(tf_verbosity=0)
+
+    assert len(list(tmp_path.rglob("*.npy"))) == 2  # treino e validação
+    trained_encoder = clf.model.get_layer("sent_encoder").hub_module
+    assert trained_encoder is encoder
+    np.testing.assert_array_equal(trained_encoder.projection.numpy(), encoder_weights)
+    top_intent, probs = clf.predict("oi como vai")
+    assert top_intent in clf.codes
+    assert sum(probs.values()) == pytest.approx(1.0)
+
+    texts = clf.preprocess_batch(["oi", "tudo bem?", "oi"])
+    cached = clf.embed_texts(texts)
+    assert cached.shape == (3, 16)
+    assert np.array_equal(cached[0], cached[2])
+    assert np.array_equal(clf.embed_texts(texts), cached)
+
+def test_artifact_cache_roundtrip_and_checksum(tmp_path):
+    """O cache devolve os arquivos guardados e trata um arquivo corrompido como cache miss."""
+    model_file, config_file = tmp_path / "clf-v1.keras", tmp_path / "clf-v1_config.yml"
+    model_file.write_bytes(b"pesos")
+    config_file.write_text("dataset_name: clf\n")
+    cache = ArtifactCache(root=str(tmp_path / "cache"))
+
+    assert cache.get("ent/proj/clf:v1") is None
+    cached_model, cached_config = cache.put("ent/proj/clf:v1", str(model_file), str(config_file))
+    assert cache.get("ent/proj/clf:v1") == (cached_model, cached_config)
+    assert open(cached_config).read() == "dataset_name: clf\n"
+    assert ArtifactCache.is_pinned("ent/proj/clf:v1") and not ArtifactCache.is_pinned("ent/proj/clf:latest")
+
+    with open(cached_model, "wb") as f:
+        f.write(b"corrompido")
+    assert cache.get("ent/proj/clf:v1") is None
+
+def test_fetch_artifact_pinned_version_skips_wandb(tmp_path, monkeypatch):
+    """Uma versão fixa que já está no cache é carregada sem chamar a API do W&B."""
+    model_file, config_file = tmp_path / "clf-v1.keras", tmp_path / "clf-v1_config.yml"
+    model_file.write_bytes(b"pesos")
+    config_file.write_text("dataset_name: clf\n")
+    monkeypatch.setenv("ARTIFACT_CACHE_DIR", str(tmp_path / "cache"))
+    expected = ArtifactCache().put("ent/proj/clf:v1", str(model_file), str(config_file))
+
+    def no_network():
+        raise AssertionError("wandb.Api não deveria ser chamado")
+    monkeypatch.setattr("wandb.Api", no_network)
+    assert fetch_artifact_from_wandb("ent/proj/clf:v1") == expected
+
+def test_load_hub_module_once_per_url(monkeypatch):
+    """Carregamentos concorrentes do mesmo encoder executam o hub.load uma única vez."""
+    calls = []
+    def slow_hub_load(url):
+        calls.append(url)
+        time.sleep(0.1)
+        return object()
+    monkeypatch.setattr("intent_classifier.intent_classifier.hub.load", slow_hub_load)
+    monkeypatch.setattr("intent_classifier.intent_classifier._HUB_MODULES", {})
+
+    urls = ["enc/a", "enc/a", "enc/b", "enc/a"]
+    with ThreadPoolExecutor(max_workers=len(urls)) as pool:
+        modules = list(pool.map(load_hub_module, urls))
+    assert sorted(calls) == ["enc/a", "enc/b"]
+    assert modules[0] is modules[1] is modules[3] and modules[2] is not modules[0]
+
+def test_for_inference_has_no_wandb_or_training_objects(stub_encoder, tmp_path, monkeypatch):
+    """O modo de inferência carrega modelo, códigos e pré-processamento sem W&B nem OneHotEncoder."""
+    clf = make_untrained_classifier(stub_encoder, ["a", "b"], dataset_name="inference")
+    clf.wandb_project = None
+    clf.save_model(str(tmp_path / "inference.keras"))
+
+    def fail(*args, **kwargs):
+        raise AssertionError("não deveria ser chamado no modo de inferência")
+    monkeypatch.setattr("wandb.login", fail)
+    monkeypatch.setattr("wandb.init", fail)
+    monkeypatch.setattr("sklearn.preprocessing.OneHotEncoder", fail)
+    predictor = IntentClassifier.for_inference(str(tmp_path / "inference.keras"),
+                                               config=str(tmp_path / "inference_config.yml"))
+
+    assert predictor.wandb_run is None and predictor.onehot_encoder is None
+    assert predictor.codes == ["a", "b"]
+    # Os dois caminhos de construção têm os mesmos atributos públicos (ver `_init_inference_state`)
+    public = lambda obj: {name for name in vars(obj) if not name.startswith("_")}
+    assert public(clf) == public(predictor)
+    top_intent, probs = predictor.predict("oi como vai")
+    expected_intent, expected_probs = clf.predict("oi como vai")
+    assert top_intent == expected_intent
+    assert probs == pytest.approx(expected_probs, abs=1e-6)
+
+def test_serving_model_export_matches_keras_model(stub_encoder_with_variable, tmp_path):
+    """O SavedModel de serving é salvo junto do modelo, carregado sem Keras e dá as mesmas probabilidades."""
+    clf = make_untrained_classifier(stub_encoder_with_variable, ["a", "b", "c"], dataset_name="serving")
+    clf.wandb_project = None
+    model_path = str(tmp_path / "serving.keras")
+    clf.save_model(model_path)
+    assert serving_model_path(model_path) == str(tmp_path / "serving_serving")
+
+    config_path = str(tmp_path / "serving_config.yml")
+    predictor = IntentClassifier.for_inference(model_path, config=config_path)
+    assert predictor.model is None and predictor.serving_module is not None
+    # A variante carregada faz parte da versão (ex.: chaves do cache de predições não são compartilhadas)
+    keras_version = IntentClassifier.for_inference(model_path, config=config_path, prefer_serving=False).model_version
+    assert predictor.model_version == f"{keras_version}+serving"
+    texts = ["oi como vai", "não entendi nada", "oi"]
+    for (intent, probs), (expected_intent, expected_probs) in zip(predictor.predict(texts), clf.predict(texts)):
+        assert intent == expected_intent
+        assert probs == pytest.approx(expected_probs, abs=1e-6)
+    preprocessed = [t.decode("utf-8") for t in predictor.preprocess_batch(texts).numpy()]
+    assert predictor.predict_batch(preprocessed, preprocessed=True).probs == pytest.approx(predictor.predict_batch(texts).probs)
+    shared = predict_with_shared_encoder({"serving": predictor}, texts)["serving"]
+    assert [intent for intent, _ in shared] == [intent for intent, _ in clf.predict(texts)]
+    # O encoder não vai no SavedModel: todos os modelos usam o mesmo módulo, carregado uma vez por URL
+    saved_variables = tf.train.list_variables(str(tmp_path / "serving_serving" / "variables" / "variables"))
+    assert not any("projection" in name for name, _ in saved_variables)
+    encoder = load_hub_module(stub_encoder_with_variable)
+    assert predictor.encode(tf.constant(["oi"])).numpy() == pytest.approx(encoder(tf.constant(["oi"])).numpy())
+
+    # Os arquivos do SavedModel também vão para o cache de artefatos
+    cached_model, _ = ArtifactCache(root=str(tmp_path / "cache")).put("ent/proj/serving:v1", model_path, config_path)
+    assert serving_model_path(cached_model) is not None
+
+def test_quantized_head_export_load_and_report(stub_encoder, tmp_path):
+    """As cabeças quantizadas são exportadas, carregadas pelo for_inference e comparadas com o modelo float."""
+    clf = make_untrained_classifier(stub_encoder, ["a", "b", "c"], dataset_name="quantized")
+    clf.wandb_project = None
+    model_path = str(tmp_path / "quantized.keras")
+    config_path = str(tmp_path / "quantized_config.yml")
+    clf.save_model(model_path, export_serving=False, quantize="dynamic")
+    assert os.path.isfile(quantized_head_path(model_path, "dynamic"))
+    with pytest.raises(ValueError):
+        clf.export_quantized_head(str(tmp_path / "head.tflite"), mode="int4")
+
+    predictor = IntentClassifier.for_inference(model_path, config=config_path, quantization="dynamic")
+    assert predictor.quantized_head is not None
+    keras_version = IntentClassifier.for_inference(model_path, config=config_path).model_version
+    assert predictor.model_version.startswith(f"{keras_version}+dynamic.")
+    texts = ["oi como vai", "não entendi nada", "oi"]
+    for (_, probs), (_, expected_probs) in zip(predictor.predict(texts), clf.predict(texts)):
+        assert probs == pytest.approx(expected_probs, abs=1e-2)
+    assert predictor.predict([]) == []
+    # A cabeça quantizada é usada em todos os caminhos, inclusive com `fast=False` e o modelo Keras carregado
+    assert predictor.model is not None
+    predictor.quantized_head = MagicMock(wraps=predictor.quantized_head)
+    for (_, probs), (_, expected_probs) in zip(predictor.predict(texts, fast=False), predictor.predict(texts)):
+        assert probs == pytest.approx(expected_probs, abs=1e-6)
+    assert predictor.quantized_head.call_count == 2
+
+    test_csv = tmp_path / "test.csv"
+    test_csv.write_text("utterance,intent\noi como vai,a\nnão entendi,b\ntchau,desconhecida\n")
+    report = evaluate_quantization(model_path, config=config_path, modes="dynamic,int8",
+                                   calibration_data=EXAMPLES_PATH, test_data=str(test_csv), repeat=2)
+    assert report["n_test"] == 2 and report["n_skipped"] == 1
+    assert [r["mode"] for r in report["results"]] == ["float32", "dynamic", "int8"]
+    assert all(r["agreement"] >= 0.5 and r["head_bytes"] > 0 for r in report["results"])
+    assert os.path.isfile(quantized_head_path(model_path, "int8"))
+
+def test_fast_predict_matches_keras_predict_and_is_quiet(stub_encoder, capsys):
+    """O caminho rápido (tf.function chamada diretamente) dá as mesmas probabilidades do model.predict, sem imprimir nada."""
+    clf = make_untrained_classifier(stub_encoder, ["a", "b", "c"])
+    texts = ["oi como vai", "não entendi", "oi como vai"]
+    expected = clf.predict(texts, fast=False)
+    capsys.readouterr()
+
+    results = clf.predict(texts)
+    assert capsys.readouterr().out == ""
+    for (intent, probs), (expected_intent, expected_probs) in zip(results, expected):
+        assert intent == expected_intent
+        assert probs == pytest.approx(expected_probs, abs=1e-6)
+    assert clf.predict("oi como vai") == results[0]
+    preprocessed = [t.decode("utf-8") for t in clf.preprocess_batch(texts).numpy()]
+    assert clf.predict(preprocessed, preprocessed=True) == results
+    assert clf.predict(preprocessed, preprocessed=True, fast=False) == pytest.approx(expected)
+    # Assinatura fixa: tamanhos de batch diferentes não criam novos traçados
+    assert clf._get_serving_fns()["predict"].experimental_get_tracing_count() == 1
+
+def test_lazy_inference_setup_is_thread_safe(stub_encoder):
+    """Na primeira predição vinda de várias threads, o pré-processamento e as funções de serving são montados uma única vez."""
+    clf = make_untrained_classifier(stub_encoder, ["a", "b"])
+    setup = clf._setup_preprocessing
+    setups = []
+    def slow_setup():
+        setups.append(1)
+        time.sleep(0.05)
+        setup()
+    clf._setup_preprocessing = slow_setup
+    barrier = threading.Barrier(4)
+    serving_fns = []
+    def first_call():
+        barrier.wait(timeout=10)
+        clf.preprocess_batch(["oi"])
+        serving_fns.append(clf._get_serving_fns())
+
+    threads = [threading.Thread(target=first_call) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(setups) == 1
+    assert len(serving_fns) == 4 and all(fns is serving_fns[0] for fns in serving_fns)
+
+def test_batch_predictions_vectorized_postprocessing(clf_minimal):
+    """O pós-processamento vetorizado dá as mesmas tuplas do laço por linha, e o top-k vem ordenado."""
+    probs = np.random.default_rng(0).dirichlet(np.ones(4), size=64).astype(np.float32)
+    codes = ["w", "x", "y", "z"]
+    batch = BatchPredictions(codes, probs)
+
+    expected = [(codes[int(np.argmax(row))], {code: float(row[j]) for j, code in enumerate(codes)}) for row in probs]
+    assert batch.rows() == expected
+    assert batch.top_intents == [intent for intent, _ in expected]
+    indices, top_probs = batch.top_k(2)
+    assert indices.shape == (64, 2) and (indices[:, 0] == batch.top_indices).all()
+    assert (top_probs[:, 0] >= top_probs[:, 1]).all()
+    compact = batch.to_dict(top_k=2)
+    assert compact["probs"] == probs.tolist() and compact["top_k"]["intents"][0][0] == expected[0][0]
+    assert BatchPredictions(codes, np.zeros((0, 4))).rows() == []
+    assert clf_minimal._format_predictions(probs[:, :2]) == BatchPredictions(["intent_a", "intent_b"], probs[:, :2]).rows()
+
+def test_predict_batch_matches_predict(stub_encoder):
+    """`predict_batch` (individual e com encoder compartilhado) tem as mesmas probabilidades do `predict`."""
+    clf_a = make_untrained_classifier(stub_encoder, ["a1", "a2"], sent_hl_units=4)
+    clf_b = make_untrained_classifier(stub_encoder, ["b1", "b2", "b3"], sent_hl_units=4)
+    texts = ["oi tudo bem?", "não entendi", "oi tudo bem?"]
+
+    shared = predict_with_shared_encoder({"a": clf_a, "b": clf_b}, texts, compact=True)
+    for name, clf in {"a": clf_a, "b": clf_b}.items():
+        expected = clf.predict(texts)
+        for batch in (clf.predict_batch(texts), shared[name]):
+            assert isinstance(batch, BatchPredictions) and len(batch) == len(texts)
+            assert batch.top_intents == [intent for intent, _ in expected]
+            for (_, probs), (_, expected_probs) in zip(batch.rows(), expected):
+                assert probs == pytest.approx(expected_probs, abs=1e-6)
+
+def test_stage_observer_keeps_fused_fast_path(stub_encoder):
+    """Com `stage_observer`, o predict continua na chamada única e só as amostras rodam estágio a estágio."""
+    clf = make_untrained_classifier(stub_encoder, ["a", "b"])
+    expected = clf.predict(["oi como vai", "não entendi"])
+    stages = []
+    clf.stage_observer = lambda stage, seconds: stages.append(stage)
+
+    fused = clf._get_serving_fns()["predict"]
+    tracing_count = fused.experimental_get_tracing_count()
+    assert clf.predict(["oi como vai", "não entendi"]) == expected
+    assert stages == ["inference", "format"]
+
+    stages.clear()
+    clf.stage_sample_rate = 1.0
+    for (intent, probs), (expected_intent, expected_probs) in zip(clf.predict(["oi como vai", "não entendi"]), expected):
+        assert intent == expected_intent and probs == pytest.approx(expected_probs, abs=1e-6)
+    assert stages == ["preprocess", "encode", "inference", "format"]
+    assert fused.experimental_get_tracing_count() == tracing_count
+
 # --- Testes de Sanidade Local (Médios) ---
+def test_cross_validation_parallel_folds_keep_order(stub_encoder):
+    """Com n_jobs > 1, os folds rodam em processos separados e os resultados mantêm a ordem dos folds."""
+    config = Config(dataset_name="cv_parallel", embedding_model=stub_encoder, epochs=1, callback_patience=0,
+                    sent_hl_units=4, cache_embeddings=True)
+    reports = {}
+    for n_jobs in (1, 2):
+        np.random.seed(0)  # mesmo embaralhamento dos dados nas duas execuções
+        clf = IntentClassifier(config=Config(**config.__dict__), training_data=EXAMPLES_PATH)
+        reports[n_jobs] = clf.cross_validation(n_splits=2, n_jobs=n_jobs, tf_threads=1)
+
+    assert len(reports[2]) == 2
+    assert [r["weighted avg"]["support"] for r in reports[2]] == [r["weighted avg"]["support"] for r in reports[1]]
+    assert all("kappa" in r for r in reports[2])
+
 def test_local_train_model_created(clf_local_trained):
     """Verifica se o modelo local foi treinado e atribuído."""
     assert clf_local_trained.model is not None
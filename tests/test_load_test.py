@@ -0,0 +1,30 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from benchmarks.load_test import benchmark, build_corpus, find_regressions
+
+# --- Unit Tests ---
+
+def test_in_process_sweep_reports_latency_and_throughput():
+    """A small in-process sweep over stand-in models returns one error-free scenario per (concurrency, batch size)."""
+    report = benchmark(mode="inprocess", concurrency=[1, 2], batch_size=[1, 3], requests=6)
+    assert report["corpus_size"] == len(build_corpus())
+    assert [(r["concurrency"], r["batch_size"]) for r in report["results"]] == [(1, 1), (2, 1), (1, 3), (2, 3)]
+    for result in report["results"]:
+        assert result["errors"] == {}
+        assert result["texts_per_second"] > 0
+        assert 0 < result["latency_ms"]["p50"] <= result["latency_ms"]["p95"] <= result["latency_ms"]["p99"]
+        assert result["memory"]["max_rss_mb"] > 0
+
+def test_find_regressions_flags_slower_scenarios():
+    """Only scenarios whose p95 grew or whose throughput dropped beyond the tolerance are flagged."""
+    def scenario(batch_size, p95, texts_per_second):
+        return {"mode": "inprocess", "concurrency": 4, "batch_size": batch_size, "errors": {},
+                "latency_ms": {"p95": p95}, "texts_per_second": texts_per_second}
+    baseline = {"results": [scenario(1, 10.0, 100.0), scenario(8, 20.0, 400.0)]}
+    assert find_regressions([scenario(1, 11.0, 95.0), scenario(8, 19.0, 410.0)], baseline, tolerance=0.2) == []
+    regressions = find_regressions([scenario(1, 15.0, 100.0), scenario(8, 20.0, 200.0)], baseline, tolerance=0.2)
+    assert len(regressions) == 2
+    assert regressions[0].startswith("inprocess:c4:b1: p95") and regressions[1].startswith("inprocess:c4:b8:")
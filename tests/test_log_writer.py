@@ -0,0 +1,84 @@
+import os
+import sys
+import json
+import pytest
+from unittest.mock import MagicMock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from bson import ObjectId
+from db import engine
+from db.log_writer import PredictionLogWriter
+from app.schema import PredictionResponse, SinglePrediction
+
+# --- Fixtures ---
+
+@pytest.fixture
+def collection():
+    return MagicMock()
+
+@pytest.fixture
+def writer(collection, tmp_path):
+    """Writer com flush rápido e arquivo de spill temporário."""
+    log_writer = PredictionLogWriter(lambda: collection, max_queue=2, flush_size=2,
+                                     flush_interval_seconds=0.05,
+                                     spill_file=str(tmp_path / "spill.jsonl"))
+    yield log_writer
+    log_writer.stop()
+
+def make_document(text):
+    return PredictionResponse(text=text, owner="tester", timestamp=0,
+                              predictions={"m": SinglePrediction(top_intent="a", all_probs={"a": 1.0})})
+
+# --- Unit Tests ---
+
+def test_writer_flushes_with_insert_many(writer, collection):
+    """Documentos enfileirados são gravados em lote no shutdown."""
+    writer.enqueue({"text": "a"})
+    writer.enqueue({"text": "b"})
+    writer.start()
+    writer.stop()
+
+    inserted = [doc for call in collection.insert_many.call_args_list for doc in call.args[0]]
+    assert inserted == [{"text": "a"}, {"text": "b"}]
+    assert writer.stats()["written"] == 2
+    assert writer.stats()["queue_depth"] == 0
+
+def test_writer_spills_when_mongo_is_down_and_replays(writer, collection):
+    """Se o MongoDB falhar, os documentos vão para o JSONL e são reenviados depois."""
+    collection.insert_many.side_effect = Exception("mongo down")
+    document_id = ObjectId()
+    writer.enqueue({"_id": document_id, "text": "a"})
+    writer.start()
+    writer.stop()
+
+    assert writer.stats()["spilled"] == 1
+    with open(writer.spill_file) as f:
+        assert json.loads(f.readline())["text"] == "a"
+
+    collection.insert_many.side_effect = None
+    assert writer.replay_spill() == 1
+    assert collection.insert_many.call_args.args[0] == [{"_id": document_id, "text": "a"}]
+    assert not writer.spill_file.exists()
+
+def test_writer_spills_when_queue_is_full(writer):
+    """Com a fila cheia, o documento vai direto para o arquivo de spill."""
+    assert writer.enqueue({"text": "1"})
+    assert writer.enqueue({"text": "2"})
+    assert not writer.enqueue({"text": "3"})
+    assert writer.stats()["spilled"] == 1
+    assert writer.stats()["queue_depth"] == 2
+
+def test_log_prediction_async_mode(monkeypatch, writer, collection):
+    """No modo assíncrono, o log retorna com o ID gerado no cliente, sem insert_one."""
+    monkeypatch.setattr("db.engine._log_writer", writer)
+    monkeypatch.setattr("db.engine.get_mongo_collection", lambda name: collection)
+
+    result = engine.log_prediction(make_document("oi"))
+    assert ObjectId.is_valid(result["id"])
+    assert result["_id"] == ObjectId(result["id"])
+    collection.insert_one.assert_not_called()
+    assert writer.stats()["queue_depth"] == 1
+
+    results = engine.log_predictions([make_document("a"), make_document("b")])
+    assert len({r["id"] for r in results}) == 2
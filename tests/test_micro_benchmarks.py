@@ -0,0 +1,26 @@
+import os
+import sys
+import json
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from benchmarks.micro import benchmark, find_regressions
+
+# --- Unit Tests ---
+
+def test_micro_benchmarks_run_offline_and_are_json_serializable(tmp_path):
+    """Every hot path is measured for each batch size with the stand-in encoder, and the results serialize to JSON."""
+    results = benchmark(batch_sizes=[1, 4], repeat=1, work_dir=str(tmp_path))
+    for batch_size in (1, 4):
+        for name in ("preprocess_text_scalar", "preprocess_batch", "model_predict", "predict_fast", "postprocess",
+                     "postprocess_compact", "predict_batch", "predict_and_log", "predict_and_log_compact",
+                     "predict_and_log_cached", "predict_and_log_compact_cached"):
+            assert results[f"{name}[{batch_size}]"]["median_ms"] > 0
+    assert {"onehot_encoder_setup", "keras_load_model", "for_inference_serving"} <= set(results)
+    assert json.loads(json.dumps(results)) == results
+
+def test_micro_find_regressions_compares_medians():
+    """A measure is flagged only when its median exceeds the baseline median beyond the tolerance."""
+    baseline = {"results": {"postprocess[1]": {"median_ms": 1.0}, "preprocess_batch[1]": {"median_ms": 2.0}}}
+    results = {"postprocess[1]": {"median_ms": 1.5}, "preprocess_batch[1]": {"median_ms": 2.1}, "new[1]": {"median_ms": 9.0}}
+    assert find_regressions(results, baseline, tolerance=0.25) == ["postprocess[1]: 1.500ms (baseline 1.000ms)"]
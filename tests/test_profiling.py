@@ -0,0 +1,93 @@
+import os
+import sys
+import json
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.profiling import RequestProfiler, request_metadata
+
+
+def busy_work(n):
+    return sum(i * i for i in range(n))
+
+
+def test_profiler_writes_profile_and_metadata(tmp_path):
+    """Uma requisição amostrada grava o profile (binário e texto) e os metadados, sem o texto."""
+    profiler = RequestProfiler(sample_rate=1.0, output_dir=str(tmp_path))
+    metadata = request_metadata("/predict", "dev_user", 1, {})
+
+    assert profiler.should_sample()
+    assert profiler.run(busy_work, metadata, 1000) == busy_work(1000)
+
+    (sample_dir,) = tmp_path.iterdir()
+    assert {"profile.prof", "profile.txt", "metadata.json"} <= set(os.listdir(sample_dir))
+    assert "busy_work" in (sample_dir / "profile.txt").read_text()
+    saved = json.loads((sample_dir / "metadata.json").read_text())
+    assert saved["endpoint"] == "/predict" and saved["owner"] == "dev_user"
+    assert saved["duration_ms"] > 0 and saved["error"] is None
+    assert profiler.status()["recent"][0]["id"] == sample_dir.name
+
+
+def test_profiler_disabled_by_default_and_configurable(tmp_path):
+    """Com `sample_rate` 0 nada é sorteado; `configure` liga o profiling e valida a fração."""
+    profiler = RequestProfiler(sample_rate=0, output_dir=str(tmp_path))
+    assert not profiler.enabled and not profiler.should_sample()
+
+    profiler.configure(sample_rate=1.0)
+    assert profiler.should_sample()
+    with pytest.raises(ValueError):
+        profiler.configure(sample_rate=2)
+
+
+def test_profiler_records_errors_and_prunes_old_samples(tmp_path):
+    """Exceções são propagadas (e anotadas nos metadados) e só as amostras mais novas ficam em disco."""
+    profiler = RequestProfiler(sample_rate=1.0, output_dir=str(tmp_path), max_samples=2)
+
+    def fail():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        profiler.run(fail, {})
+    for _ in range(3):
+        profiler.run(busy_work, {}, 10)
+
+    assert len(os.listdir(tmp_path)) == 2
+    assert "RuntimeError" in profiler.recent[0]["error"]
+    # As amostras mantidas são as duas últimas gravadas
+    assert sorted(os.listdir(tmp_path)) == sorted(entry["id"] for entry in profiler.recent[-2:])
+
+
+def test_profiler_prune_keeps_unrelated_directories(tmp_path):
+    """Pastas sem `metadata.json` em `output_dir` (ex.: PROFILE_DIR mal configurado) nunca são apagadas."""
+    (tmp_path / "logs").mkdir()
+    (tmp_path / "000_not_a_sample").mkdir()
+    profiler = RequestProfiler(sample_rate=1.0, output_dir=str(tmp_path), max_samples=1)
+
+    for _ in range(3):
+        profiler.run(busy_work, {}, 10)
+
+    names = set(os.listdir(tmp_path))
+    assert {"logs", "000_not_a_sample", profiler.recent[-1]["id"]} == names
+
+
+def test_profiler_skips_concurrent_samples(tmp_path):
+    """Enquanto uma requisição é perfilada, outra amostra roda sem profiler."""
+    profiler = RequestProfiler(sample_rate=1.0, output_dir=str(tmp_path))
+    started, release = threading.Event(), threading.Event()
+
+    def slow():
+        started.set()
+        release.wait(5)
+
+    thread = threading.Thread(target=profiler.run, args=(slow, {}))
+    thread.start()
+    started.wait(5)
+    assert profiler.run(busy_work, {}, 10) == busy_work(10)
+    release.set()
+    thread.join()
+
+    assert len(os.listdir(tmp_path)) == 1
+    assert profiler.status()["skipped"] >= 1